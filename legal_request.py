@@ -3,7 +3,8 @@
 
 Типичный сценарий:
   1. import_md — импорт запросов из markdown в legal_requests.json
-  2. batch — обработка через pravo_app.graph, сохранение в legal_process_*.json
+  2. batch — параллельная обработка через pravo_app.graph с журналом legal_process.jsonl
+     (возобновляется после сбоя), сохранение в legal_process_*.json
   3. print — сборка legal_process_*.json в единый legal_process.md
 """
 import os
@@ -11,7 +12,14 @@ import json
 import glob
 import re
 
+from pravo_app.batch import run_batch
 from pravo_app.graph import graph
+from pravo_app.cache import make_key
+from pravo_app.cassette import use_cassette
+from pravo_app.checkpoint import resume_input, thread_config
+from pravo_app.config import CASSETTE_DIR, CASSETTE_MODE, METRICS_PORT
+from pravo_app.llm import set_rate_limit
+from pravo_app.metrics import serve_metrics, summarize
 
 # Справочник категорий: ключ (кат1..кат9) → краткое и полное наименование
 CATEGORY_CATALOG = {
@@ -169,17 +177,61 @@ def load_requests_from_md(path: str = "Генерация запросов к а
     return result
 
 
+def _process_request(item: dict) -> dict:
+    """Прогоняет один запрос через pravo_app.graph и формирует запись legal_process."""
+    request_no = item.get("порядковый_номер")
+    query_preview = item["запрос"][:20]
+    print(f"[{request_no}] {item['категория']} | {item['тема']} | {query_preview}")
+    state = {
+        "query": item["запрос"],
+        "batch_mode": True,
+        "verbose": False,
+    }
+    # Сессия запроса: при PRAVO_CHECKPOINT_DB прерванный сбоем запрос продолжается с последнего завершённого узла
+    config = thread_config(f"request-{request_no}-{make_key(item['запрос'])[:12]}")
+    graph_input = resume_input(graph, state, config)
+    if CASSETTE_DIR:
+        # Отдельная кассета на запрос: запись ответов GigaChat и поиска или их воспроизведение
+        with use_cassette(os.path.join(CASSETTE_DIR, f"request_{request_no}.jsonl.gz"), CASSETTE_MODE):
+            final_state = graph.invoke(graph_input, config)
+    else:
+        final_state = graph.invoke(graph_input, config)  # вызов LangGraph-агента
+    if graph.checkpointer is not None:
+        # Результат попадает в журнал пакета — контрольные точки запроса больше не нужны
+        graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+
+    return {
+        "порядковый_номер": request_no,
+        "категория": item["категория"],
+        "тема": item["тема"],
+        "запрос": item["запрос"],
+        "ответ": final_state.get("final_answer"),
+        "сгенерированный вопрос": final_state.get("clarification"),
+        "сгенерированный ответ": final_state.get("clarification_answer"),
+        "метрики": final_state.get("metrics_summary") or summarize(final_state.get("metrics", [])),
+    }
+
+
 def process_requests_batch(
     input_path: str = "legal_requests.json",
     output_path: str = "legal_process.json",
     limit: int | None = None,
     start_index: int = 1,
+    workers: int = 4,
+    rate_limit: float | None = None,
+    journal_path: str | None = None,
 ) -> list:
     """
     Пакетная обработка запросов через pravo_app.graph и сохранение в legal_process_N-M.json.
 
-    Через limit и start_index задаётся срез запросов. Имя выходного файла формируется
-    автоматически по диапазону номеров (например, legal_process_1-10.json).
+    Запросы обрабатываются параллельно в workers потоках; rate_limit задаёт общий лимит
+    запросов к GigaChat в секунду (None — значение PRAVO_LLM_RATE_LIMIT). Каждый готовый
+    результат сразу дописывается в журнал journal_path (по умолчанию legal_process.jsonl
+    рядом с output_path). Повторный запуск пропускает порядковые номера из журнала,
+    поэтому после сбоя достаточно запустить пакет ещё раз.
+
+    limit и start_index по-прежнему позволяют ограничить срез запросов. Имя выходного
+    файла формируется автоматически по диапазону номеров (например, legal_process_1-135.json).
     """
     requests = load_requests_json(input_path)
     if start_index < 1:
@@ -189,40 +241,35 @@ def process_requests_batch(
         requests = requests[start_pos : start_pos + limit]
     else:
         requests = requests[start_pos:]
-    results = []
-
-    if requests:
-        # Формируем имя вида legal_process_1-10.json
-        start_no = requests[0].get("порядковый_номер", start_index)
-        end_no = requests[-1].get("порядковый_номер", start_index + len(requests) - 1)
-        base, ext = os.path.splitext(output_path)
-        if not ext:
-            ext = ".json"
-        output_path = f"{base}_{start_no}-{end_no}{ext}"
-
-    for idx, item in enumerate(requests, start=1):
-        query_preview = item["запрос"][:20]
-        request_no = item.get("порядковый_номер", idx)
-        print(f"[{request_no}] {item['категория']} | {item['тема']} | {query_preview}")
-        state = {
-            "query": item["запрос"],
-            "batch_mode": True,
-            "verbose": False,
-        }
-        final_state = graph.invoke(state)  # вызов LangGraph-агента
-
-        results.append(
-            {
-                "порядковый_номер": item.get("порядковый_номер", request_no),
-                "категория": item["категория"],
-                "тема": item["тема"],
-                "запрос": item["запрос"],
-                "ответ": final_state.get("final_answer"),
-                "сгенерированный вопрос": final_state.get("clarification"),
-                "сгенерированный ответ": final_state.get("clarification_answer"),
-            }
-        )
-
+    # Порядковый номер — ключ журнала; для записей без номера берём позицию в файле
+    requests = [
+        {**item, "порядковый_номер": item.get("порядковый_номер", start_index + pos)}
+        for pos, item in enumerate(requests)
+    ]
+    if not requests:
+        return []
+
+    base, ext = os.path.splitext(output_path)
+    if not ext:
+        ext = ".json"
+    if journal_path is None:
+        journal_path = f"{base}.jsonl"
+    if rate_limit is not None:
+        set_rate_limit(rate_limit)
+
+    results = run_batch(
+        requests,
+        _process_request,
+        journal_path,
+        key=lambda item: item["порядковый_номер"],
+        record_key="порядковый_номер",
+        workers=workers,
+    )
+
+    # Формируем имя вида legal_process_1-135.json
+    start_no = requests[0]["порядковый_номер"]
+    end_no = requests[-1]["порядковый_номер"]
+    output_path = f"{base}_{start_no}-{end_no}{ext}"
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
 
@@ -236,8 +283,8 @@ if __name__ == "__main__":
     MD_INPUT_PATH = "legal requests/Генерация запросов к агенту.md"
     JSON_INPUT_PATH = "legal requests/legal_requests.json"
     JSON_OUTPUT_PATH = "legal_process.json"
-    BATCH_LIMIT = 1
-    START_INDEX = 135
+    BATCH_WORKERS = 4  # число параллельно обрабатываемых запросов
+    LLM_RATE_LIMIT = 2.0  # общий лимит запросов к GigaChat в секунду
 
     if ACTION == "print":
         legal_process_print()
@@ -250,10 +297,14 @@ if __name__ == "__main__":
     elif ACTION == "batch":
         REQUEST_LIST = load_requests_json(JSON_INPUT_PATH)
         print(f"Загружено {len(REQUEST_LIST)} запросов")
+        if METRICS_PORT:
+            serve_metrics(METRICS_PORT)  # счётчики пакета: http://127.0.0.1:PORT/metrics
+        # Обработанные номера берутся из журнала legal_process.jsonl — повторный запуск
+        # продолжает пакет с места сбоя
         results = process_requests_batch(
             JSON_INPUT_PATH,
             JSON_OUTPUT_PATH,
-            limit=BATCH_LIMIT,
-            start_index=START_INDEX,
+            workers=BATCH_WORKERS,
+            rate_limit=LLM_RATE_LIMIT,
         )
         print(f"Обработано {len(results)} запросов")
@@ -1,13 +1,32 @@
 import os
 
+from langgraph.types import Command
+
+from pravo_app.checkpoint import resume_input, thread_config
+from pravo_app.config import METRICS_PORT
 from pravo_app.graph import graph
+from pravo_app.metrics import serve_metrics
 from pravo_app.run import run_graph
 
 
 def main() -> None:
     state = {"query": os.getenv("PRAVO_QUERY", " Во время работ по замене крыши (в рамках капремонта) рабочие повредили мой кондиционер, установленный на фасаде. Подрядчик отказывается платить, УК ссылается на него. С кого взыскивать ущерб?")}
     mode = os.getenv("PRAVO_RUN_MODE", "debug")
-    run_graph(graph, state, mode=mode)
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    config = thread_config(os.getenv("PRAVO_THREAD_ID"))
+    if graph.checkpointer is not None:
+        # По этому id сессию можно продолжить после перезапуска: PRAVO_THREAD_ID=<id>
+        print(f"Сессия: {config['configurable']['thread_id']}")
+    graph_input = resume_input(graph, state, config)
+    while True:
+        run_graph(graph, graph_input, mode=mode, config=config)
+        if graph.checkpointer is None:
+            break
+        # Граф остановился на interrupt() — спрашиваем пользователя и продолжаем сессию
+        graph_input = resume_input(graph, state, config)
+        if not isinstance(graph_input, Command):
+            break
 
 
 if __name__ == "__main__":
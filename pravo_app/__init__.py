@@ -3,7 +3,33 @@
 
 Реализует Recursive RAG-архитектуру для ответов на правовые вопросы с использованием
 LangGraph в качестве графа состояний. Экспортирует скомпилированный граф для запуска.
+
+Граф импортируется лениво, при первом обращении к pravo_app.graph: модули без
+LangGraph и клиентов API (formatters, decisions, text и т.д.) импортируются быстро.
 """
-from .graph import graph
+import importlib
+import sys
+import types
 
 __all__ = ["graph"]
+
+
+class _Package(types.ModuleType):
+    """Модуль пакета: атрибут graph — всегда скомпилированный граф, а не подмодуль pravo_app.graph."""
+
+    def __setattr__(self, name: str, value) -> None:
+        # Импорт подмодуля (import pravo_app.graph) записывает в атрибут graph сам модуль — заменяем его графом
+        if name == "graph" and isinstance(value, types.ModuleType):
+            value = value.graph
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name: str):
+    if name == "graph":
+        # Импорт подмодуля записывает скомпилированный граф в атрибут graph (_Package.__setattr__)
+        importlib.import_module(".graph", __name__)
+        return globals()["graph"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
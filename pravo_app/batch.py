@@ -0,0 +1,90 @@
+"""
+Параллельная пакетная обработка запросов с журналом и возобновлением.
+
+run_batch() прогоняет элементы через функцию обработки в пуле потоков.
+Каждый готовый результат сразу дописывается в JSONL-журнал, поэтому сбой
+посреди пакета не теряет уже обработанные запросы: при повторном запуске
+элементы, ключи которых есть в журнале, пропускаются.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Hashable, Iterable, List
+
+
+class BatchJournal:
+    """JSONL-журнал результатов: одна строка — одна обработанная запись."""
+
+    def __init__(self, path: str, key: str) -> None:
+        self.path = path
+        self.key = key  # поле записи, однозначно идентифицирующее элемент
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Читает все записи журнала. Повреждённая последняя строка (обрыв записи) игнорируется."""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Пропущена повреждённая строка журнала {self.path}")
+        return records
+
+    def done_keys(self) -> set:
+        """Ключи уже обработанных элементов."""
+        return {r.get(self.key) for r in self.load()}
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Дописывает запись и сбрасывает её на диск."""
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def run_batch(
+    items: Iterable[Dict[str, Any]],
+    process: Callable[[Dict[str, Any]], Dict[str, Any]],
+    journal_path: str,
+    key: Callable[[Dict[str, Any]], Hashable],
+    record_key: str,
+    workers: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Обрабатывает items в workers потоках и возвращает записи журнала по этим элементам.
+
+    process(item) → запись для журнала; key(item) — ключ элемента, совпадающий
+    со значением поля record_key в записи. Элементы, уже присутствующие в журнале,
+    не обрабатываются повторно. Ошибка обработки элемента не прерывает пакет:
+    элемент не попадает в журнал и будет обработан при следующем запуске.
+    """
+    journal = BatchJournal(journal_path, record_key)
+    done = journal.done_keys()
+    items = list(items)
+    pending = [item for item in items if key(item) not in done]
+    if len(pending) < len(items):
+        print(f"Журнал {journal_path}: пропущено {len(items) - len(pending)} обработанных запросов")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pravo-batch") as executor:
+        futures = {executor.submit(process, item): item for item in pending}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"[{key(item)}] Ошибка обработки: {e}")
+                continue
+            journal.append(record)
+
+    wanted = {key(item) for item in items}
+    records = {r.get(record_key): r for r in journal.load() if r.get(record_key) in wanted}
+    return [records[k] for k in (key(item) for item in items) if k in records]
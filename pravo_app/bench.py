@@ -0,0 +1,501 @@
+"""
+Бенчмарк графа на корпусе legal_requests без GigaChat и без сети (GIGACHAT_API_KEY не нужен).
+
+Клиент GigaChat подменяется ReplayGigaChat: тип промпта определяется по шаблону
+из prompts.py, ответ берётся из записанного пакета (batch_08022026/legal_process_*.json):
+уточняющий вопрос, автоответ пакетного режима, черновой и итоговый ответы. Поиск
+подменяется BenchSearchProvider, возвращающим документы из тех же записей. Задержки
+обоих стендов — логнормальные с заданной медианой и разбросом, генератор с seed,
+поэтому прогон воспроизводим.
+
+Отчёт: p50/p95/p99 по узлам (из событий metrics), сквозная задержка и пропускная
+способность при N одновременных сессиях, пиковый RSS процесса. С --baseline
+сравнивает p95 с сохранённым отчётом и завершается с кодом 1 при регрессии — для CI:
+
+    python -m pravo_app.bench --sessions 1,8 --llm-latency 0 --output bench.json
+    python -m pravo_app.bench --sessions 1,8 --llm-latency 0 --baseline bench.json
+
+С --imports вместо прогона графа измеряется время холодного импорта модулей пакета
+(в отдельных процессах, без GIGACHAT_API_KEY) и сравнивается с IMPORT_BUDGETS.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Dict, List, Sequence
+
+from . import prompts
+from .checkpoint import thread_config
+from .graph import graph
+from .llm import set_client, set_rate_limit
+from .search import set_search_provider
+from .state import Doc
+from .text import estimate_tokens
+
+REQUESTS_PATH = "legal requests/legal_requests.json"
+RECORDS_MASK = "batch_08022026/legal_process_*.json"
+# Перцентили отчёта
+PERCENTILES = (50, 95, 99)
+# Сколько фрагментов отдаёт потоковый ответ стенда
+STREAM_CHUNKS = 20
+
+
+class Latency:
+    """Логнормальная задержка: median — медиана (сек.), sigma — разброс. median=0 — без задержки."""
+
+    def __init__(self, median: float, sigma: float = 0.5) -> None:
+        self.median = median
+        self.sigma = sigma
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """Из строки «медиана[:sigma]», например «0.8:0.4»."""
+        median, _, sigma = spec.partition(":")
+        return cls(float(median), float(sigma) if sigma else 0.5)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+def _template_prefix(template: Any) -> str:
+    return template.template.split("{", 1)[0]
+
+
+# Тип промпта → статическое начало шаблона (более длинные префиксы проверяются первыми)
+PROMPT_KINDS = sorted(
+    {
+        "clarify": _template_prefix(prompts.clarification_prompt),
+        "batch_clarify": _template_prefix(prompts.clarification_prompt_batch),
+        "query_concat": _template_prefix(prompts.query_concat_prompt),
+        "rewrite": _template_prefix(prompts.query_rewrite_prompt),
+        "rewrite_classify": _template_prefix(prompts.query_rewrite_classify_prompt),
+        "classify": _template_prefix(prompts.classification_prompt),
+        "answer": _template_prefix(prompts.rag_prompt_only_link),
+        "reflect": _template_prefix(prompts.reflection_prompt),
+        "reflect_classify": _template_prefix(prompts.reflection_classify_prompt),
+        "final_answer": _template_prefix(prompts.final_answer_prompt),
+    }.items(),
+    key=lambda item: -len(item[1]),
+)
+
+
+def prompt_kind(prompt: str) -> str | None:
+    """Тип промпта по шаблону из prompts.py; None — промпт не из шаблонов."""
+    for kind, prefix in PROMPT_KINDS:
+        if prompt.startswith(prefix):
+            return kind
+    return None
+
+
+class Corpus:
+    """Запросы корпуса и записанные ответы агента, с поиском записи по тексту промпта."""
+
+    def __init__(self, requests: List[Dict[str, Any]], records: List[Dict[str, Any]]) -> None:
+        by_no = {r["порядковый_номер"]: r for r in records}
+        self.items = [{**item, **by_no.get(item["порядковый_номер"], {})} for item in requests]
+        # Темы — по убыванию длины, чтобы более точная тема находилась раньше
+        self._by_topic = sorted(self.items, key=lambda item: -len(item["тема"]))
+
+    @classmethod
+    def load(cls, requests_path: str = REQUESTS_PATH, records_mask: str = RECORDS_MASK) -> "Corpus":
+        with open(requests_path, encoding="utf-8") as f:
+            requests = json.load(f)
+        records = []
+        for path in sorted(glob.glob(records_mask)):
+            with open(path, encoding="utf-8") as f:
+                records.extend(json.load(f))
+        return cls(requests, records)
+
+    def find(self, text: str) -> Dict[str, Any]:
+        """Запись, чей запрос или тема встречается в тексте (иначе — первая запись корпуса)."""
+        for item in self.items:
+            if item["запрос"] in text:
+                return item
+        for item in self._by_topic:
+            if item["тема"] in text:
+                return item
+        return self.items[0]
+
+
+class ReplayGigaChat:
+    """Стенд клиента GigaChat: ответы из записанного пакета, задержка по распределению latency.
+
+    re_search_rate — доля запросов, для которых самопроверка запрашивает повторный поиск.
+    """
+
+    def __init__(self, corpus: Corpus, latency: Latency, re_search_rate: float = 0.2, seed: int = 0) -> None:
+        self.corpus = corpus
+        self.latency = latency
+        self.re_search_rate = re_search_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency.sample(self._rng)
+
+    def _needs_re_search(self, item: Dict[str, Any]) -> bool:
+        return (item["порядковый_номер"] * 7919) % 100 < self.re_search_rate * 100
+
+    @staticmethod
+    def _question(prompt: str) -> str:
+        """Часть промпта с вопросом: в RAG-промптах и самопроверке — между «[Вопрос]:» и следующим блоком."""
+        _, marker, rest = prompt.partition("[Вопрос]:")
+        return rest.split("\n[", 1)[0] if marker else prompt
+
+    @staticmethod
+    def _category(text: str) -> str:
+        return "Судебное" if "суд" in text.lower() else "НПА"
+
+    def reply(self, prompt: str) -> str:
+        """Ответ на промпт по записи корпуса."""
+        kind = prompt_kind(prompt)
+        question = self._question(prompt)
+        item = self.corpus.find(question)
+        if kind == "clarify":
+            return item.get("сгенерированный вопрос") or "ок"
+        if kind == "batch_clarify":
+            return item.get("сгенерированный ответ") or "ок"
+        if kind == "query_concat":
+            return item["запрос"]
+        if kind == "rewrite":
+            return item["тема"]
+        if kind == "rewrite_classify":
+            return json.dumps({"search_query": item["тема"], "category": self._category(item["тема"])}, ensure_ascii=False)
+        if kind == "classify":
+            return self._category(item["тема"])
+        if kind in {"reflect", "reflect_classify"}:
+            query = None
+            if self._needs_re_search(item) and "судебная практика" not in question:
+                query = f"{item['тема']} судебная практика"
+            if kind == "reflect":
+                return query or "ок"
+            verdict = {"verdict": "поиск", "search_query": query, "category": "Судебное"} if query else {
+                "verdict": "ок", "search_query": "", "category": ""
+            }
+            return json.dumps(verdict, ensure_ascii=False)
+        if kind in {"answer", "final_answer"}:
+            return item.get("ответ") or "ок"
+        return "ок"
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> SimpleNamespace:
+        return SimpleNamespace(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(text))
+
+    def _response(self, prompt: str, text: str) -> SimpleNamespace:
+        data = {"choices": [{"message": {"content": text}}]}
+        return SimpleNamespace(usage=self._usage(prompt, text), model_dump=lambda: data)
+
+    def _chunks(self, prompt: str, text: str) -> List[SimpleNamespace]:
+        size = max(1, math.ceil(len(text) / STREAM_CHUNKS))
+        chunks = [
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i : i + size]))], usage=None)
+            for i in range(0, len(text), size)
+        ]
+        chunks.append(SimpleNamespace(choices=[], usage=self._usage(prompt, text)))
+        return chunks
+
+    @staticmethod
+    def _prompt(payload: Any) -> str:
+        return payload.messages[-1].content
+
+    def chat(self, payload: Any) -> SimpleNamespace:
+        prompt = self._prompt(payload)
+        time.sleep(self._delay())
+        return self._response(prompt, self.reply(prompt))
+
+    async def achat(self, payload: Any) -> SimpleNamespace:
+        prompt = self._prompt(payload)
+        await asyncio.sleep(self._delay())
+        return self._response(prompt, self.reply(prompt))
+
+    def stream(self, payload: Any):
+        prompt = self._prompt(payload)
+        chunks = self._chunks(prompt, self.reply(prompt))
+        # Треть задержки — до первого фрагмента, остальное распределено по фрагментам
+        delay = self._delay()
+        time.sleep(delay / 3)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(delay * 2 / 3 / len(chunks))
+
+    async def astream(self, payload: Any):
+        prompt = self._prompt(payload)
+        chunks = self._chunks(prompt, self.reply(prompt))
+        delay = self._delay()
+        await asyncio.sleep(delay / 3)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(delay * 2 / 3 / len(chunks))
+
+    def embeddings(self, texts: List[str], model: str | None = None) -> SimpleNamespace:
+        data = [SimpleNamespace(index=i, embedding=[float(len(t) % 7), 1.0]) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=data)
+
+
+class BenchSearchProvider:
+    """Стенд поиска: документы — записанные ответы найденной записи и её соседей по корпусу."""
+
+    supports_site_filter = True
+
+    def __init__(self, corpus: Corpus, latency: Latency, seed: int = 0) -> None:
+        self.corpus = corpus
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency.sample(self._rng)
+
+    def _docs(self, query: str, max_results: int) -> List[Doc]:
+        item = self.corpus.find(query)
+        pos = self.corpus.items.index(item)
+        docs: List[Doc] = []
+        for i in range(max_results):
+            source = self.corpus.items[(pos + i) % len(self.corpus.items)]
+            docs.append(
+                {
+                    "title": source["тема"],
+                    "href": f"https://bench.local/{source['порядковый_номер']}/{i}",
+                    "doc_text": source.get("ответ") or source["запрос"],
+                }
+            )
+        return docs
+
+    def search(self, query: str, max_results: int = 3) -> List[Doc]:
+        time.sleep(self._delay())
+        return self._docs(query, max_results)
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Doc]:
+        await asyncio.sleep(self._delay())
+        return self._docs(query, max_results)
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99 (по ближайшему рангу) и число значений."""
+    ordered = sorted(values)
+    result: Dict[str, float] = {"count": len(ordered)}
+    for p in PERCENTILES:
+        result[f"p{p}"] = round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 4) if ordered else 0.0
+    return result
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса, МБ (ru_maxrss — КБ в Linux, байты в macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _state(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {"query": item["запрос"], "batch_mode": True, "verbose": False}
+
+
+def _run_sync(items: List[Dict[str, Any]], sessions: int) -> List[tuple]:
+    def run(item: Dict[str, Any]) -> tuple:
+        started = time.perf_counter()
+        final_state = graph.invoke(_state(item), thread_config())
+        return time.perf_counter() - started, final_state.get("metrics", [])
+
+    with ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="pravo-bench") as executor:
+        return list(executor.map(run, items))
+
+
+async def _run_async(items: List[Dict[str, Any]], sessions: int) -> List[tuple]:
+    semaphore = asyncio.Semaphore(sessions)
+
+    async def run(item: Dict[str, Any]) -> tuple:
+        async with semaphore:
+            started = time.perf_counter()
+            final_state = await graph.ainvoke(_state(item), thread_config())
+            return time.perf_counter() - started, final_state.get("metrics", [])
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+def run_benchmark(
+    corpus: Corpus,
+    sessions: int,
+    limit: int | None = None,
+    llm_latency: Latency = Latency(0.05),
+    search_latency: Latency = Latency(0.02),
+    re_search_rate: float = 0.2,
+    use_async: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Прогоняет корпус через граф при sessions одновременных сессиях и возвращает отчёт."""
+    items = corpus.items[:limit] if limit else corpus.items
+    previous_client = set_client(ReplayGigaChat(corpus, llm_latency, re_search_rate, seed))
+    previous_provider = set_search_provider(BenchSearchProvider(corpus, search_latency, seed))
+    set_rate_limit(0)
+    try:
+        started = time.perf_counter()
+        if use_async:
+            runs = asyncio.run(_run_async(items, sessions))
+        else:
+            runs = _run_sync(items, sessions)
+        wall = time.perf_counter() - started
+    finally:
+        set_client(previous_client)
+        set_search_provider(previous_provider)
+
+    by_node: Dict[str, List[float]] = {}
+    llm_calls = 0
+    for _, events in runs:
+        for event in events:
+            if event["kind"] == "node":
+                by_node.setdefault(event["name"], []).append(event["seconds"])
+            elif event["kind"] == "llm":
+                llm_calls += 1
+    return {
+        "sessions": sessions,
+        "requests": len(items),
+        "mode": "async" if use_async else "sync",
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(items) / wall, 3) if wall else 0.0,
+        "llm_calls": llm_calls,
+        "end_to_end": percentiles([seconds for seconds, _ in runs]),
+        "nodes": {name: percentiles(values) for name, values in sorted(by_node.items())},
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Регрессии p95 (сквозной и по узлам) относительно baseline больше чем на долю tolerance."""
+    problems = []
+    previous = {run["sessions"]: run for run in baseline.get("runs", [])}
+    for run in report["runs"]:
+        base = previous.get(run["sessions"])
+        if base is None:
+            continue
+        pairs = [("end_to_end", run["end_to_end"], base["end_to_end"])]
+        pairs += [(name, stats, base["nodes"][name]) for name, stats in run["nodes"].items() if name in base["nodes"]]
+        for name, stats, base_stats in pairs:
+            # Абсолютный допуск 1 мс: микросекундные узлы не должны давать ложных регрессий
+            if stats["p95"] > base_stats["p95"] * (1 + tolerance) + 0.001:
+                problems.append(
+                    f"N={run['sessions']} {name}: p95 {stats['p95']:.4f} с > {base_stats['p95']:.4f} с"
+                )
+    return problems
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    for run in report["runs"]:
+        e2e = run["end_to_end"]
+        lines.append(
+            f"N={run['sessions']} ({run['mode']}): {run['requests']} запросов за {run['wall_seconds']} с, "
+            f"{run['throughput_rps']} запр./с; сквозная p50/p95/p99 = "
+            f"{e2e['p50']}/{e2e['p95']}/{e2e['p99']} с"
+        )
+        for name, stats in run["nodes"].items():
+            lines.append(f"  {name:<20} ×{stats['count']:<4} p50 {stats['p50']:.4f}  p95 {stats['p95']:.4f}  p99 {stats['p99']:.4f}")
+    lines.append(f"Пиковый RSS: {report['peak_rss_mb']} МБ")
+    return "\n".join(lines)
+
+
+# Бюджет времени холодного импорта модулей, сек. (для воркеров и холодного старта):
+# лёгкие модули не должны тянуть LangGraph, SDK GigaChat и библиотеки web-поиска
+IMPORT_BUDGETS = {
+    "pravo_app": 0.1,
+    "pravo_app.formatters": 0.1,
+    "pravo_app.decisions": 0.1,
+    "pravo_app.llm": 0.2,
+    "pravo_app.search": 0.3,
+    "pravo_app.graph": 2.5,
+}
+
+
+def import_time(module: str, repeats: int = 3) -> float:
+    """Медиана времени импорта module в новом интерпретаторе (без запуска самого интерпретатора), сек.
+
+    GIGACHAT_API_KEY убирается из окружения: импорт не должен требовать учётных данных.
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    env = {k: v for k, v in os.environ.items() if k != "GIGACHAT_API_KEY"}
+    samples = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module}: {result.stderr.strip().splitlines()[-1]}")
+        samples.append(float(result.stdout.strip()))
+    return round(statistics.median(samples), 4)
+
+
+def check_imports(budgets: Dict[str, float], repeats: int = 3) -> List[str]:
+    """Печатает время импорта модулей и возвращает список превышений бюджета."""
+    problems = []
+    for module, budget in budgets.items():
+        seconds = import_time(module, repeats)
+        print(f"import {module:<22} {seconds:.3f} с (бюджет {budget} с)")
+        if seconds > budget:
+            problems.append(f"import {module}: {seconds:.3f} с > {budget} с")
+    return problems
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк графа на корпусе legal_requests")
+    parser.add_argument("--sessions", default="1,8", help="число одновременных сессий, через запятую")
+    parser.add_argument("--limit", type=int, default=None, help="сколько запросов корпуса прогнать")
+    parser.add_argument("--llm-latency", default="0.05:0.5", help="задержка LLM: медиана[:sigma], сек.")
+    parser.add_argument("--search-latency", default="0.02:0.5", help="задержка поиска: медиана[:sigma], сек.")
+    parser.add_argument("--re-search-rate", type=float, default=0.2, help="доля запросов с повторным поиском")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="graph.ainvoke вместо потоков")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", default=REQUESTS_PATH)
+    parser.add_argument("--records", default=RECORDS_MASK)
+    parser.add_argument("--output", help="сохранить отчёт в JSON")
+    parser.add_argument("--baseline", help="сравнить с сохранённым отчётом")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост p95 относительно baseline")
+    parser.add_argument("--imports", action="store_true", help="проверить время импорта модулей (IMPORT_BUDGETS)")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        problems = check_imports(IMPORT_BUDGETS)
+        for problem in problems:
+            print(f"Регрессия: {problem}")
+        return 1 if problems else 0
+
+    corpus = Corpus.load(args.requests, args.records)
+    runs = [
+        run_benchmark(
+            corpus,
+            sessions=int(n),
+            limit=args.limit,
+            llm_latency=Latency.parse(args.llm_latency),
+            search_latency=Latency.parse(args.search_latency),
+            re_search_rate=args.re_search_rate,
+            use_async=args.use_async,
+            seed=args.seed,
+        )
+        for n in args.sessions.split(",")
+    ]
+    report = {"runs": runs, "peak_rss_mb": peak_rss_mb()}
+    print(format_report(report))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"Регрессия: {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""
+Внешнее хранилище крупных объектов (blob store).
+
+Сырые HTML-страницы не хранятся в состоянии графа: при PRAVO_KEEP_HTML=1 они
+сохраняются на диск в сжатом виде, а в документе остаётся только ссылка html_ref
+(SHA-256 содержимого). Одинаковые страницы записываются один раз.
+"""
+import gzip
+import hashlib
+import os
+import threading
+
+from .config import CACHE_DIR
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 текста — идентификатор содержимого документа."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """Контентно-адресуемое хранилище строк: файлы <root>/<hh>/<hash>.gz."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.root, ref[:2], f"{ref}.gz")
+
+    def put(self, data: str) -> str:
+        """Сохраняет строку и возвращает ссылку на неё."""
+        ref = content_hash(data)
+        path = self._path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Временный файл свой у каждого потока: одну и ту же страницу могут сохранять параллельные загрузки
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return ref
+
+    def get(self, ref: str) -> str | None:
+        """Строка по ссылке или None, если объект отсутствует."""
+        path = self._path(ref)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+
+
+# Хранилище по умолчанию: PRAVO_CACHE_DIR/blobs
+blob_store = BlobStore(os.path.join(CACHE_DIR, "blobs"))
@@ -0,0 +1,50 @@
+"""
+Автоматический выключатель (circuit breaker) для внешних API.
+
+После failure_threshold ошибок подряд выключатель «размыкается»: вызовы к API не
+выполняются reset_timeout секунд, и провайдер сразу переходит на резервный поиск.
+По истечении таймаута пропускается один пробный вызов: успех замыкает выключатель,
+ошибка снова размыкает его.
+"""
+import threading
+import time
+
+
+class CircuitBreaker:
+    """Счётчик последовательных ошибок с состояниями closed → open → half-open."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial = False  # пробный вызов в состоянии half-open уже выполняется
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """Можно ли выполнить вызов к API."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
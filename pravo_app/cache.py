@@ -0,0 +1,132 @@
+"""
+Локальный дисковый кэш на SQLite.
+
+DiskCache хранит JSON-сериализуемые значения по строковому ключу с вытеснением
+по возрасту (ttl) и по суммарному размеру (max_bytes, LRU — первыми удаляются
+давно не использованные записи). Используется для кэша ответов LLM и результатов
+поиска. Файл базы можно разделять между процессами (режим WAL).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+from .config import CACHE_DIR
+
+# Вытеснение проверяется не на каждой записи, а раз в EVICT_EVERY вставок
+EVICT_EVERY = 100
+
+
+def make_key(*parts: Any) -> str:
+    """Контентный ключ: SHA-256 от JSON-представления частей (промпт, модель, параметры и т.д.)."""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_path(name: str) -> str:
+    """Путь к файлу кэша name в каталоге PRAVO_CACHE_DIR (каталог создаётся при необходимости)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+class DiskCache:
+    """Кэш ключ → JSON-значение в таблице SQLite с TTL, лимитом размера и счётчиками попаданий."""
+
+    def __init__(self, path: str, table: str = "cache", ttl: float | None = None, max_bytes: int | None = None) -> None:
+        self.path = path
+        self.table = table
+        self.ttl = ttl  # сек.; None — без ограничения по возрасту
+        self.max_bytes = max_bytes  # None — без ограничения по размеру
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Any | None:
+        """Значение по ключу или None (нет записи или запись старше ttl)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        """Сохраняет значение; периодически запускает вытеснение."""
+        raw = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, raw, len(raw.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def touch(self, key: str) -> None:
+        """Продлевает срок жизни записи (например, после успешной ревалидации)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(f"UPDATE {self.table} SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def evict(self) -> None:
+        """Удаляет устаревшие записи и, при превышении max_bytes, давно не использованные."""
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,))
+        if self.max_bytes is not None:
+            total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            if total > self.max_bytes:
+                # Удаляем по LRU, пока суммарный размер не опустится ниже лимита
+                excess = total - self.max_bytes
+                freed = 0
+                keys = []
+                for key, size in self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed_at"):
+                    keys.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", keys)
+        self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Счётчики попаданий/промахов текущего процесса и объём кэша."""
+        with self._lock:
+            entries, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
@@ -0,0 +1,291 @@
+"""
+Запись и воспроизведение вызовов GigaChat и поиска («кассеты»).
+
+В режиме record каждый ответ GigaChat (промпт, текст, usage), эмбеддинги и каждый результат
+поиска провайдера дописываются в сжатый JSONL-файл кассеты (gzip). В режиме replay
+ответы берутся из кассеты по ключу запроса — без сети, без задержек API и без учётных
+данных (клиент GigaChat не создаётся); запрос,
+которого нет в кассете, завершается ошибкой CassetteMiss. Повторяющиеся одинаковые
+запросы воспроизводятся в порядке записи.
+
+Кассета процесса задаётся PRAVO_CASSETTE (путь) и PRAVO_CASSETTE_MODE (record | replay);
+use_cassette() задаёт кассету для отдельного прогона (например, одного запроса пакета).
+Подмена прозрачна для узлов: llm.py и search.py оборачивают клиент и провайдер
+через wrap_client() / wrap_provider().
+"""
+import atexit
+import contextvars
+import gzip
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, Iterator, List
+
+from .cache import make_key
+from .config import CASSETTE, CASSETTE_MODE
+from .state import Doc
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """В кассете нет ответа на запрос (режим replay)."""
+
+
+class Cassette:
+    """Файл кассеты: запись новых ответов (record) или выдача записанных (replay)."""
+
+    def __init__(self, path: str, mode: str) -> None:
+        if mode not in MODES:
+            raise ValueError(f"cassette mode must be one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._file = None
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], deque()).append(entry)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+
+    def replay(self, key: str, description: str) -> Dict[str, Any]:
+        """Следующий записанный ответ по ключу; после исчерпания — последний."""
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            if key not in self._last:
+                raise CassetteMiss(f"{description} отсутствует в кассете {self.path}")
+            return self._last[key]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_process_cassette: Cassette | None = None
+_process_lock = threading.Lock()
+_current: contextvars.ContextVar[Cassette | None] = contextvars.ContextVar("pravo_cassette", default=None)
+
+
+def _get_process_cassette() -> Cassette | None:
+    global _process_cassette
+    if not CASSETTE:
+        return None
+    with _process_lock:
+        if _process_cassette is None:
+            _process_cassette = Cassette(CASSETTE, CASSETTE_MODE)
+            atexit.register(_process_cassette.close)
+        return _process_cassette
+
+
+def current_cassette() -> Cassette | None:
+    """Кассета текущего прогона (use_cassette) или кассета процесса (PRAVO_CASSETTE)."""
+    return _current.get() or _get_process_cassette()
+
+
+@contextmanager
+def use_cassette(path: str, mode: str) -> Iterator[Cassette]:
+    """Записывает или воспроизводит вызовы внутри блока через кассету path."""
+    cassette = Cassette(path, mode)
+    token = _current.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _current.reset(token)
+        cassette.close()
+
+
+def _payload_key(payload: Any) -> str:
+    data = payload.model_dump(exclude_none=True) if hasattr(payload, "model_dump") else payload
+    return make_key("llm", data)
+
+
+def _prompt(payload: Any) -> str:
+    return payload.messages[-1].content if hasattr(payload, "messages") else str(payload)
+
+
+def _usage(usage: Any) -> Dict[str, int] | None:
+    if usage is None:
+        return None
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+
+def _response(entry: Dict[str, Any]) -> SimpleNamespace:
+    """Объект ответа в том виде, в каком его читает llm.py (model_dump и usage)."""
+    data = {"choices": [{"message": {"content": entry["text"]}}]}
+    usage = SimpleNamespace(**entry["usage"]) if entry.get("usage") else None
+    return SimpleNamespace(usage=usage, model_dump=lambda: data)
+
+
+def _chunks(entry: Dict[str, Any]) -> List[SimpleNamespace]:
+    usage = SimpleNamespace(**entry["usage"]) if entry.get("usage") else None
+    delta = SimpleNamespace(content=entry["text"])
+    return [
+        SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None),
+        SimpleNamespace(choices=[], usage=usage),
+    ]
+
+
+class CassetteClient:
+    """Обёртка клиента GigaChat: записывает ответы в кассету или отдаёт их из неё.
+
+    В режиме replay client не нужен (None): все ответы берутся из кассеты.
+    """
+
+    def __init__(self, client: Any, cassette: Cassette) -> None:
+        self.client = client
+        self.cassette = cassette
+
+    def _record(self, payload: Any, key: str, text: str, usage: Any) -> None:
+        self.cassette.record(
+            {"kind": "llm", "key": key, "prompt": _prompt(payload), "text": text, "usage": _usage(usage)}
+        )
+
+    def _replay(self, key: str) -> Dict[str, Any]:
+        return self.cassette.replay(key, "Ответ GigaChat")
+
+    def chat(self, payload: Any) -> Any:
+        key = _payload_key(payload)
+        if self.cassette.mode == "replay":
+            return _response(self._replay(key))
+        response = self.client.chat(payload)
+        data = response.model_dump() if hasattr(response, "model_dump") else response.dict()
+        self._record(payload, key, data["choices"][0]["message"]["content"], getattr(response, "usage", None))
+        return response
+
+    async def achat(self, payload: Any) -> Any:
+        key = _payload_key(payload)
+        if self.cassette.mode == "replay":
+            return _response(self._replay(key))
+        response = await self.client.achat(payload)
+        data = response.model_dump() if hasattr(response, "model_dump") else response.dict()
+        self._record(payload, key, data["choices"][0]["message"]["content"], getattr(response, "usage", None))
+        return response
+
+    def stream(self, payload: Any) -> Iterator[Any]:
+        key = _payload_key(payload)
+        if self.cassette.mode == "replay":
+            yield from _chunks(self._replay(key))
+            return
+        parts, usage = [], None
+        for chunk in self.client.stream(payload):
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or "")
+            yield chunk
+        self._record(payload, key, "".join(parts), usage)
+
+    async def astream(self, payload: Any):
+        key = _payload_key(payload)
+        if self.cassette.mode == "replay":
+            for chunk in _chunks(self._replay(key)):
+                yield chunk
+            return
+        parts, usage = [], None
+        async for chunk in self.client.astream(payload):
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or "")
+            yield chunk
+        self._record(payload, key, "".join(parts), usage)
+
+    def embeddings(self, texts: List[str], model: str) -> Any:
+        key = make_key("embeddings", texts, model)
+        if self.cassette.mode == "replay":
+            vectors = self.cassette.replay(key, "Эмбеддинги GigaChat")["embeddings"]
+        else:
+            response = self.client.embeddings(texts, model=model)
+            vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            self.cassette.record({"kind": "embeddings", "key": key, "model": model, "embeddings": vectors})
+        data = [SimpleNamespace(index=i, embedding=vector) for i, vector in enumerate(vectors)]
+        return SimpleNamespace(data=data)
+
+    def __getattr__(self, name: str) -> Any:
+        # Остальные методы — без записи
+        if self.client is None:
+            raise CassetteMiss(f"Метод {name} клиента GigaChat не воспроизводится из кассеты {self.cassette.path}")
+        return getattr(self.client, name)
+
+
+class CassetteSearchProvider:
+    """Обёртка провайдера поиска: результаты search пишутся в кассету или берутся из неё."""
+
+    def __init__(self, provider: Any, cassette: Cassette) -> None:
+        self.provider = provider
+        self.cassette = cassette
+        self.supports_site_filter = getattr(provider, "supports_site_filter", False)
+        self._name = type(provider).__name__
+
+    def _key(self, query: str, max_results: int | None) -> str:
+        # Имя провайдера в ключ не входит: при воспроизведении провайдер может быть любым
+        return make_key("search", query, max_results)
+
+    def _record(self, key: str, query: str, max_results: int | None, results: List[Doc]) -> None:
+        self.cassette.record(
+            {
+                "kind": "search",
+                "key": key,
+                "provider": self._name,
+                "query": query,
+                "max_results": max_results,
+                "results": results,
+            }
+        )
+
+    def search(self, query: str, *args: Any) -> List[Doc]:
+        max_results = args[0] if args else None
+        key = self._key(query, max_results)
+        if self.cassette.mode == "replay":
+            return self.cassette.replay(key, f"Поиск «{query}»")["results"]
+        results = self.provider.search(query, *args)
+        self._record(key, query, max_results, results)
+        return results
+
+    async def asearch(self, query: str, *args: Any) -> List[Doc]:
+        max_results = args[0] if args else None
+        key = self._key(query, max_results)
+        if self.cassette.mode == "replay":
+            return self.cassette.replay(key, f"Поиск «{query}»")["results"]
+        results = await self.provider.asearch(query, *args)
+        self._record(key, query, max_results, results)
+        return results
+
+
+def wrap_client(get_client: Callable[[], Any]) -> Any:
+    """Клиент GigaChat с учётом активной кассеты (без кассеты — get_client()).
+
+    При воспроизведении get_client не вызывается: для replay не нужны ни SDK, ни GIGACHAT_API_KEY.
+    """
+    cassette = current_cassette()
+    if cassette is None:
+        return get_client()
+    if cassette.mode == "replay":
+        return CassetteClient(None, cassette)
+    return CassetteClient(get_client(), cassette)
+
+
+def wrap_provider(provider: Any) -> Any:
+    """Провайдер поиска с учётом активной кассеты (без кассеты — сам provider)."""
+    cassette = current_cassette()
+    return CassetteSearchProvider(provider, cassette) if cassette else provider
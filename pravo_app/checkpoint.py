@@ -0,0 +1,407 @@
+"""
+Долговременный checkpointer графа на SQLite: прерванные сессии продолжаются после перезапуска.
+
+SqliteCheckpointer сохраняет состояние графа после каждого завершённого узла. Значения
+каналов хранятся отдельно от самих контрольных точек по версиям (как в InMemorySaver):
+неизменившийся канал (например, docs на шаге самопроверки) не копируется в каждую
+точку. Сериализация — serde LangGraph (msgpack) со сжатием zlib.
+
+Очистка: у каждой сессии (thread_id) хранятся только последние keep контрольных точек
+(вместе с их записями и больше не нужными значениями каналов), сессии, не обновлявшиеся
+дольше ttl секунд, удаляются при открытии базы.
+
+Граф компилируется с checkpointer, если задан PRAVO_CHECKPOINT_DB; тогда каждый вызов
+graph.invoke/stream требует config с thread_id (thread_config). resume_input решает,
+начинать сессию заново или продолжить её с последнего завершённого узла.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.types import Command
+
+from .config import CHECKPOINT_DB, CHECKPOINT_KEEP, CHECKPOINT_TTL
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "parent_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, metadata_type TEXT NOT NULL, metadata BLOB NOT NULL, "
+    "versions TEXT NOT NULL, created_at REAL NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL, "
+    "type TEXT NOT NULL, value BLOB, PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT NOT NULL, "
+    "value BLOB, task_path TEXT NOT NULL, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+    "CREATE INDEX IF NOT EXISTS checkpoints_created ON checkpoints(created_at)",
+)
+
+
+def _thread_of(config: RunnableConfig) -> Tuple[str, str]:
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class SqliteCheckpointer(BaseCheckpointSaver[str]):
+    """Checkpointer LangGraph в файле SQLite со сжатием и очисткой старых контрольных точек."""
+
+    def __init__(self, path: str, keep: int = CHECKPOINT_KEEP, ttl: float | None = CHECKPOINT_TTL) -> None:
+        super().__init__()
+        self.path = path
+        self.keep = keep  # контрольных точек на сессию; 0 — без ограничения
+        self.ttl = ttl  # сек. без обновлений до удаления сессии; None/0 — без ограничения
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        if ttl:
+            self.delete_expired()
+
+    # --- сериализация ---
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data)
+
+    def _load(self, type_: str, data: bytes | None) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data) if data else b""))
+
+    # --- чтение ---
+
+    def _channel_values(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self._load(*row)
+        return values
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row: tuple) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._load(type_, data)
+        checkpoint["channel_values"] = self._channel_values(thread_id, checkpoint_ns, checkpoint["channel_versions"])
+        writes = self._conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=checkpoint,
+            metadata=self._load(metadata_type, metadata),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self._load(t, v)) for task_id, _, channel, t, v, _ in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Контрольная точка checkpoint_id из config или последняя точка сессии."""
+        thread_id, checkpoint_ns = _thread_of(config)
+        checkpoint_id = get_checkpoint_id(config)
+        query = (
+            "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Контрольные точки от новых к старым с фильтрами LangGraph (thread, ns, before, metadata)."""
+        clauses, params = [], []
+        if config:
+            thread_id, _ = _thread_of(config)
+            clauses.append("thread_id = ?")
+            params.append(thread_id)
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+                f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter and not all(self._load(*row[4:]).get(k) == v for k, v in filter.items()):
+                continue
+            with self._lock:
+                item = self._tuple(thread_id, checkpoint_ns, tuple(row))
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    # --- запись ---
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Сохраняет контрольную точку и новые версии каналов; затем очищает старые точки сессии."""
+        thread_id, checkpoint_ns = _thread_of(config)
+        checkpoint = checkpoint.copy()
+        values = checkpoint.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, data = self._dump(values[channel]) if channel in values else ("empty", None)
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, data))
+        type_, data = self._dump(checkpoint)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    metadata_type,
+                    metadata_data,
+                    json.dumps({k: str(v) for k, v in checkpoint["channel_versions"].items()}),
+                    time.time(),
+                ),
+            )
+            if self.keep:
+                self._prune_thread(thread_id, checkpoint_ns, self.keep)
+            self._conn.commit()
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Сохраняет промежуточные записи задачи (результат узла до следующей контрольной точки)."""
+        thread_id, checkpoint_ns = _thread_of(config)
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append(
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, data, task_path)
+            )
+        # Специальные записи (ошибка, interrupt) перезаписываются, обычные — только первая
+        replace = all(row[4] < 0 for row in rows)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    # --- очистка ---
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str, keep: int) -> None:
+        """Удаляет всё, кроме keep последних точек сессии, и значения каналов, на которые они не ссылаются."""
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, keep),
+        ).fetchall()
+        if not stale:
+            return
+        stale_rows = [(thread_id, checkpoint_ns, checkpoint_id) for (checkpoint_id,) in stale]
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale_rows
+        )
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale_rows
+        )
+        used = set()
+        for (versions,) in self._conn.execute(
+            "SELECT versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ):
+            used.update(json.loads(versions).items())
+        blobs = self._conn.execute(
+            "SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+        ).fetchall()
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in blobs if (channel, version) not in used],
+        )
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        for table in ("checkpoints", "blobs", "writes"):
+            self._conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids])
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Удаляет все контрольные точки, записи и значения каналов сессии."""
+        with self._lock:
+            self._delete_threads([str(thread_id)])
+            self._conn.commit()
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """keep_latest — оставить последнюю точку каждой сессии, delete — удалить сессии."""
+        with self._lock:
+            if strategy == "delete":
+                self._delete_threads([str(t) for t in thread_ids])
+            else:
+                for thread_id in thread_ids:
+                    namespaces = self._conn.execute(
+                        "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (str(thread_id),)
+                    ).fetchall()
+                    for (checkpoint_ns,) in namespaces:
+                        self._prune_thread(str(thread_id), checkpoint_ns, 1)
+            self._conn.commit()
+
+    def delete_expired(self) -> int:
+        """Удаляет сессии без обновлений дольше ttl; возвращает их число."""
+        if not self.ttl:
+            return 0
+        with self._lock:
+            expired = [
+                thread_id
+                for (thread_id,) in self._conn.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?",
+                    (time.time() - self.ttl,),
+                )
+            ]
+            self._delete_threads(expired)
+            self._conn.commit()
+        return len(expired)
+
+    def get_next_version(self, current: str | None, channel: None = None) -> str:
+        # Строковые версии, монотонно возрастающие при сравнении строк (как в InMemorySaver)
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- асинхронные варианты (SQLite вызывается в пуле потоков) ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ):
+        items: List[CheckpointTuple] = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def get_checkpointer() -> SqliteCheckpointer | None:
+    """Checkpointer из PRAVO_CHECKPOINT_DB или None (граф без сохранения состояния)."""
+    return SqliteCheckpointer(CHECKPOINT_DB) if CHECKPOINT_DB else None
+
+
+def thread_config(thread_id: str | None = None) -> RunnableConfig:
+    """config вызова графа для сессии thread_id (по умолчанию — новая сессия со случайным id)."""
+    return {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+
+
+def resume_input(graph, state: Dict[str, Any], config: RunnableConfig, answer=None) -> Any:
+    """Вход graph.invoke/stream для сессии config.
+
+    Нет checkpointer или незавершённой сессии — state (новый прогон; setup_node сбрасывает
+    накопленные поля прошлого прогона того же thread_id). Сессия прервана
+    сбоем — None: граф продолжает с последнего завершённого узла. Сессия ждёт ответа
+    на уточнение (interrupt) — Command(resume=answer(вопрос)); answer по умолчанию input().
+    """
+    if graph.checkpointer is None:
+        return state
+    snapshot = graph.get_state(config)
+    if not snapshot.next:
+        return state
+    interrupts = [item for task in snapshot.tasks for item in task.interrupts]
+    if interrupts:
+        return Command(resume=(answer or input)(f"{interrupts[0].value}\n> "))
+    return None
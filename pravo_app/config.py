@@ -2,7 +2,8 @@
 Конфигурация юридического агента.
 
 Загружает переменные окружения из .env и экспортирует параметры для подключения
-к GigaChat API — LLM, используемой агентом для генерации и классификации.
+к GigaChat API — LLM, используемой агентом для генерации и классификации,
+а также параметры web-поиска и локальных кэшей.
 """
 import os
 
@@ -10,9 +11,145 @@ from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-# Обязательный ключ авторизации GigaChat API
-GIGACHAT_API_KEY = os.environ["GIGACHAT_API_KEY"]
+
+def __getattr__(name: str):
+    # Обязательный ключ авторизации GigaChat API: читается при первом обращении (при создании
+    # клиента), поэтому модули без вызовов LLM импортируются и без учётных данных
+    if name == "GIGACHAT_API_KEY":
+        return os.environ["GIGACHAT_API_KEY"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Область доступа: по умолчанию персональный скоуп (GIGACHAT_API_PERS)
 GIGACHAT_SCOPE = os.getenv("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
 # Имя модели: GigaChat-2 или иная, поддерживаемая API
 GIGACHAT_MODEL = os.getenv("GIGACHAT_MODEL", "GigaChat-2")
+# Модель эмбеддингов GigaChat (для локального индекса)
+GIGACHAT_EMBEDDINGS_MODEL = os.getenv("GIGACHAT_EMBEDDINGS_MODEL", "Embeddings")
+# Глобальный лимит запросов к GigaChat в секунду на процесс (0 — без ограничения)
+LLM_RATE_LIMIT = float(os.getenv("PRAVO_LLM_RATE_LIMIT", "0"))
+# Цена 1000 токенов GigaChat (для оценки стоимости прогона в метриках; 0 — не считать)
+LLM_TOKEN_PRICE = float(os.getenv("PRAVO_LLM_TOKEN_PRICE", "0"))
+# Порт HTTP-экспортёра метрик в формате Prometheus (0 — не запускать)
+METRICS_PORT = int(os.getenv("PRAVO_METRICS_PORT", "0"))
+# Кассета вызовов GigaChat и поиска: путь к файлу (.jsonl.gz) и режим record | replay
+CASSETTE = os.getenv("PRAVO_CASSETTE", "")
+CASSETTE_MODE = os.getenv("PRAVO_CASSETTE_MODE", "replay")
+# Каталог кассет пакетного режима: отдельная кассета на каждый запрос
+CASSETTE_DIR = os.getenv("PRAVO_CASSETTE_DIR", "")
+
+# Долговременный checkpointer графа (SQLite): путь к базе (пусто — без сохранения состояния),
+# сколько последних контрольных точек хранить на сессию и через сколько секунд без обновлений удалять сессию
+CHECKPOINT_DB = os.getenv("PRAVO_CHECKPOINT_DB", "")
+CHECKPOINT_KEEP = int(os.getenv("PRAVO_CHECKPOINT_KEEP", "20"))
+CHECKPOINT_TTL = float(os.getenv("PRAVO_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+# Сервис с пулом процессов (service.py): порт HTTP, число рабочих процессов (0 — по числу ядер)
+# и одновременных запросов в каждом (граф большую часть времени ждёт GigaChat и поиск)
+# Процессы сервиса — демоны и не создают пул извлечения (EXTRACT_PROCESSES): ядра занимает только SERVICE_WORKERS
+SERVICE_PORT = int(os.getenv("PRAVO_SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.getenv("PRAVO_SERVICE_WORKERS", "0"))
+SERVICE_THREADS = int(os.getenv("PRAVO_SERVICE_THREADS", "4"))
+# Допуск заявок: длина очереди и расчётное ожидание в очереди (сек.), сверх которых заявка отклоняется (429)
+SERVICE_QUEUE = int(os.getenv("PRAVO_SERVICE_QUEUE", "64"))
+SERVICE_MAX_WAIT = float(os.getenv("PRAVO_SERVICE_MAX_WAIT", "120"))
+# Сколько секунд хранить результаты завершённых заявок
+SERVICE_RESULT_TTL = float(os.getenv("PRAVO_SERVICE_RESULT_TTL", "600"))
+
+# Параллельная загрузка страниц в DdgsSearchProvider: размер пула потоков
+FETCH_WORKERS = int(os.getenv("PRAVO_FETCH_WORKERS", "8"))
+# Таймаут загрузки одной страницы, сек.
+FETCH_TIMEOUT = float(os.getenv("PRAVO_FETCH_TIMEOUT", "10"))
+# Общий дедлайн вызова search (поиск + загрузка + извлечение), сек.
+SEARCH_DEADLINE = float(os.getenv("PRAVO_SEARCH_DEADLINE", "20"))
+# Извлечение текста страниц (extract.py): число процессов пула (0 — в вызывающем потоке),
+# максимальный размер HTML (больше — обрезается) и размер, начиная с которого страница уходит в пул, КБ
+EXTRACT_PROCESSES = int(os.getenv("PRAVO_EXTRACT_PROCESSES", str(os.cpu_count() or 1)))
+EXTRACT_MAX_KB = float(os.getenv("PRAVO_EXTRACT_MAX_KB", "5120"))
+EXTRACT_INLINE_KB = float(os.getenv("PRAVO_EXTRACT_INLINE_KB", "32"))
+# Сколько секунд ждать извлечения в пуле; дольше — страница извлекается в вызывающем потоке
+EXTRACT_TIMEOUT = float(os.getenv("PRAVO_EXTRACT_TIMEOUT", "10"))
+
+# Каталог локальных кэшей (SQLite)
+CACHE_DIR = os.getenv("PRAVO_CACHE_DIR", ".pravo_cache")
+# Кэш ответов LLM: включение, срок жизни записи (сек.) и лимит размера (МБ)
+LLM_CACHE = os.getenv("PRAVO_LLM_CACHE", "0") == "1"
+LLM_CACHE_TTL = float(os.getenv("PRAVO_LLM_CACHE_TTL", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("PRAVO_LLM_CACHE_MAX_MB", "256"))
+# Узлы, для которых кэш включён (через запятую, пусто — все) и для которых выключен
+LLM_CACHE_NODES = {n.strip() for n in os.getenv("PRAVO_LLM_CACHE_NODES", "").split(",") if n.strip()}
+LLM_CACHE_SKIP_NODES = {n.strip() for n in os.getenv("PRAVO_LLM_CACHE_SKIP_NODES", "").split(",") if n.strip()}
+# Кэш web-поиска: включение, TTL и лимит размера для уровня «запрос → результаты»
+SEARCH_CACHE = os.getenv("PRAVO_SEARCH_CACHE", "0") == "1"
+SEARCH_CACHE_TTL = float(os.getenv("PRAVO_SEARCH_CACHE_TTL", "3600"))
+SEARCH_CACHE_MAX_MB = float(os.getenv("PRAVO_SEARCH_CACHE_MAX_MB", "32"))
+# Уровень «URL → текст страницы»: TTL, лимит размера и период ревалидации по ETag/Last-Modified
+PAGE_CACHE_TTL = float(os.getenv("PRAVO_PAGE_CACHE_TTL", str(30 * 24 * 3600)))
+PAGE_CACHE_MAX_MB = float(os.getenv("PRAVO_PAGE_CACHE_MAX_MB", "512"))
+PAGE_REVALIDATE = float(os.getenv("PRAVO_PAGE_REVALIDATE", str(24 * 3600)))
+# Сохранять сырой HTML страниц во внешнем хранилище (в состоянии графа — только ссылка)
+KEEP_HTML = os.getenv("PRAVO_KEEP_HTML", "0") == "1"
+# Память диалога (messages): сколько последних сообщений хранить целиком (0 — без ограничения)
+# и максимальная длина сводки более старых сообщений, символов
+MESSAGES_WINDOW = int(os.getenv("PRAVO_MESSAGES_WINDOW", "12"))
+MESSAGES_SUMMARY_CHARS = int(os.getenv("PRAVO_MESSAGES_SUMMARY_CHARS", "1500"))
+# Бюджет токенов на документы в RAG-промптах (черновой и финальный ответ)
+CONTEXT_TOKENS = int(os.getenv("PRAVO_CONTEXT_TOKENS", "6000"))
+# Повторный поиск после самопроверки (re_search.py): максимум циклов; минимальная новизна новой
+# поисковой фразы (доля термов, которых не было в прежних фразах) и минимальная доля новых
+# источников в предыдущем цикле, ниже которых цикл не запускается
+RE_SEARCH_MAX = int(os.getenv("PRAVO_RE_SEARCH_MAX", "1"))
+RE_SEARCH_MIN_NOVELTY = float(os.getenv("PRAVO_RE_SEARCH_MIN_NOVELTY", "0.25"))
+RE_SEARCH_MIN_NEW_SOURCES = float(os.getenv("PRAVO_RE_SEARCH_MIN_NEW_SOURCES", "0.25"))
+# Бюджет запроса: время работы узлов (сек.) и токены GigaChat, после которых новый цикл не начинается (0 — без ограничения)
+RE_SEARCH_BUDGET_SECONDS = float(os.getenv("PRAVO_RE_SEARCH_BUDGET_SECONDS", "0"))
+RE_SEARCH_BUDGET_TOKENS = int(os.getenv("PRAVO_RE_SEARCH_BUDGET_TOKENS", "0"))
+# Дедупликация документов между циклами поиска (dedup.py): длина шингла в термах и порог
+# сходства Жаккара (оценка MinHash), начиная с которого документ считается почти-дубликатом
+DEDUP_SHINGLE = int(os.getenv("PRAVO_DEDUP_SHINGLE", "5"))
+DEDUP_THRESHOLD = float(os.getenv("PRAVO_DEDUP_THRESHOLD", "0.8"))
+# Локальный индекс документов: пополнять его результатами web-поиска и Garant
+INDEX = os.getenv("PRAVO_INDEX", "0") == "1"
+# Переранжирование кандидатов индекса эмбеддингами GigaChat
+INDEX_EMBEDDINGS = os.getenv("PRAVO_INDEX_EMBEDDINGS", "0") == "1"
+# Гибридный поиск: сколько документов индекса с какой долей термов запроса достаточно, чтобы не идти в web
+INDEX_MIN_HITS = int(os.getenv("PRAVO_INDEX_MIN_HITS", "2"))
+INDEX_MIN_COVERAGE = float(os.getenv("PRAVO_INDEX_MIN_COVERAGE", "0.6"))
+# Garant API: базовый адрес (можно указать локальный stub) и путь экспорта текста документа по topic
+GARANT_API_URL = os.getenv("PRAVO_GARANT_API_URL", "https://api.garant.ru").rstrip("/")
+GARANT_EXPORT_PATH = os.getenv("PRAVO_GARANT_EXPORT_PATH", "/v1/topic/{topic}/html")
+# Для скольких первых результатов Garant загружать тексты документов
+GARANT_FETCH_TOP = int(os.getenv("PRAVO_GARANT_FETCH_TOP", "3"))
+# Garant API: размер пула соединений, число повторов и база экспоненциальной задержки (сек.) при 429/5xx
+GARANT_POOL_SIZE = int(os.getenv("PRAVO_GARANT_POOL_SIZE", "10"))
+GARANT_RETRIES = int(os.getenv("PRAVO_GARANT_RETRIES", "3"))
+GARANT_BACKOFF = float(os.getenv("PRAVO_GARANT_BACKOFF", "0.5"))
+GARANT_TIMEOUT = float(os.getenv("PRAVO_GARANT_TIMEOUT", "15"))
+# Circuit breaker: после скольких ошибок подряд и на сколько секунд переходить на DDGS
+GARANT_BREAKER_THRESHOLD = int(os.getenv("PRAVO_GARANT_BREAKER_THRESHOLD", "5"))
+GARANT_BREAKER_RESET = float(os.getenv("PRAVO_GARANT_BREAKER_RESET", "60"))
+# Режим поиска: route — НПА или судебная практика по категории; parallel — оба поиска параллельно
+SEARCH_MODE = os.getenv("PRAVO_SEARCH_MODE", "route")
+# В режиме parallel: вызывать классификацию для распределения числа результатов между ветками
+CLASSIFY_WEIGHTING = os.getenv("PRAVO_CLASSIFY_WEIGHTING", "0") == "1"
+# Переформулировка и классификация одним вызовом LLM со структурированным (JSON) ответом
+REWRITE_CLASSIFY = os.getenv("PRAVO_REWRITE_CLASSIFY", "1") == "1"
+# Локальный предклассификатор clarify_node / classify_node: включение и порог уверенности
+PRECLASSIFY = os.getenv("PRAVO_PRECLASSIFY", "0") == "1"
+PRECLASSIFY_THRESHOLD = float(os.getenv("PRAVO_PRECLASSIFY_THRESHOLD", "0.9"))
+# Размеченные записи пакетной обработки для обучения модели уточнений (glob; по умолчанию — от корня проекта)
+PRECLASSIFY_DATA = os.getenv(
+    "PRAVO_PRECLASSIFY_DATA",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "batch_08022026", "legal_process_*.json"),
+)
+# Обученная заранее модель уточнений (python -m pravo_app.preclassify --train) и требуемая точность «ок»:
+# порог модели — наименьший, при котором нижняя граница точности на отложенных записях не ниже этой
+PRECLASSIFY_MODEL = os.getenv(
+    "PRAVO_PRECLASSIFY_MODEL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "preclassify_model.json")
+)
+PRECLASSIFY_MIN_PRECISION = float(os.getenv("PRAVO_PRECLASSIFY_MIN_PRECISION", "0.95"))
+# Спекулятивное выполнение: переформулировка и поиск запускаются параллельно с clarify_node
+# и используются, если уточнение не понадобилось (иначе результат отбрасывается)
+SPECULATIVE = os.getenv("PRAVO_SPECULATIVE", "0") == "1"
+# Число результатов поиска: основная ветка и второстепенная (при взвешивании категорией)
+SEARCH_RESULTS = int(os.getenv("PRAVO_SEARCH_RESULTS", "3"))
+SEARCH_RESULTS_SECONDARY = int(os.getenv("PRAVO_SEARCH_RESULTS_SECONDARY", "2"))
@@ -4,8 +4,9 @@
 Функции возвращают имя следующего узла в зависимости от состояния.
 Используются в workflow.add_conditional_edges() для маршрутизации потока.
 """
-from typing import Literal
+from typing import List, Literal
 
+from .config import RE_SEARCH_MAX, SEARCH_MODE
 from .state import MyState
 
 
@@ -22,8 +23,14 @@ def check_need_human(state: MyState) -> Literal["вопрос пользоват
     return "переформулировка"
 
 
-def check_search_type(state: MyState) -> Literal["поиск нпа", "поиск судебки"]:
-    """Выбирает тип поиска: НПА или судебная практика по категории запроса."""
+def check_search_type(state: MyState) -> Literal["поиск нпа", "поиск судебки"] | List[str]:
+    """Выбирает тип поиска: НПА или судебная практика по категории запроса.
+
+    В режиме PRAVO_SEARCH_MODE=parallel запускает оба поиска параллельными ветками графа;
+    их документы объединяются редуктором docs.
+    """
+    if SEARCH_MODE == "parallel":
+        return ["поиск нпа", "поиск судебки"]
     category = state["category"].lower()
     if "нпа" in category:
         return "поиск нпа"
@@ -33,11 +40,14 @@ def check_search_type(state: MyState) -> Literal["поиск нпа", "поис
 
 
 def check_need_re_search(state: MyState) -> Literal["классификация", "финальный ответ"]:
-    """Решает: требуется ли повторный поиск или формировать финальный ответ."""
+    """Решает: требуется ли повторный поиск или формировать финальный ответ.
+
+    Лимит циклов — PRAVO_RE_SEARCH_MAX; остальные условия остановки учтены в need_re_search (см. re_search).
+    """
     re_search_cnt = state["re_search_cnt"]
     need_re_search_flag = state["need_re_search"]
 
-    if re_search_cnt > 1:
+    if re_search_cnt > RE_SEARCH_MAX:
         return "финальный ответ"
     if need_re_search_flag:
         return "классификация"
@@ -0,0 +1,153 @@
+"""
+Дедупликация документов поля docs между циклами поиска.
+
+Документы всех циклов накапливаются в docs (черновой ответ и итоговый синтез строятся по
+их объединению), поэтому одна и та же страница, найденная повторно, раньше попадала в
+промпты несколько раз. Редуктор merge_docs добавляет документ, только если он новый:
+
+- по адресу: URL без схемы, www., фрагмента и завершающего «/» (normalize_url);
+- по содержимому: совпадение doc_hash (для документов без него — хэша doc_text);
+- по почти-дубликатам: оценка сходства Жаккара по MinHash шинглов из PRAVO_DEDUP_SHINGLE
+  термов не ниже PRAVO_DEDUP_THRESHOLD — например, одна статья ГК на разных сайтах.
+
+Документ без текста (не загрузился к дедлайну) сравнивается только по адресу и заменяется,
+если та же страница позже пришла с текстом. Остаётся первый из дубликатов.
+
+Поисковые узлы открывают session_documents(docs): провайдеры берут текст уже найденных
+в сессии страниц через known_text без повторной загрузки и извлечения.
+"""
+import contextlib
+import contextvars
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from .blobs import content_hash
+from .config import DEDUP_SHINGLE, DEDUP_THRESHOLD
+from .metrics import record
+from .text import tokenize
+
+# Размер сигнатуры MinHash (bottom-k: k наименьших хэшей шинглов): погрешность оценки ~ 1/sqrt(64) ≈ 0.125
+_SKETCH = 64
+# Сколько первых термов документа участвует в сигнатуре
+_MAX_TERMS = 2000
+# Кэш сигнатур по doc_hash
+_SIGNATURES_MAX = 2048
+
+Signature = Tuple[int, ...]
+
+_signatures: "OrderedDict[str, Signature | None]" = OrderedDict()
+_signatures_lock = threading.Lock()
+_session: contextvars.ContextVar[Dict[str, str] | None] = contextvars.ContextVar("pravo_session_docs", default=None)
+
+
+def normalize_url(href: str) -> str:
+    """URL без схемы, www., фрагмента и завершающего «/» — для сравнения источников."""
+    parts = urlsplit((href or "").strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{parts.query}" if parts.query else "")
+
+
+def minhash(text: str) -> Signature | None:
+    """MinHash-сигнатура (bottom-k) множества шинглов текста; None — в тексте нет термов.
+
+    Хэши строк зависят от PYTHONHASHSEED: сигнатуры сравнимы только внутри процесса.
+    """
+    terms = tokenize(text)[:_MAX_TERMS]
+    if not terms:
+        return None
+    size = min(DEDUP_SHINGLE, len(terms))
+    shingles = {hash(" ".join(terms[i : i + size])) for i in range(len(terms) - size + 1)}
+    return tuple(heapq.nsmallest(_SKETCH, shingles))
+
+
+def _doc_hash(doc: Dict[str, Any]) -> str:
+    """doc_hash документа; для документов без него (собранных не через make_doc) — хэш doc_text."""
+    return doc.get("doc_hash") or content_hash(doc.get("doc_text") or "")
+
+
+def _signature(doc: Dict[str, Any]) -> Signature | None:
+    """Сигнатура документа с кэшем по doc_hash."""
+    key = _doc_hash(doc)
+    with _signatures_lock:
+        if key in _signatures:
+            _signatures.move_to_end(key)
+            return _signatures[key]
+    signature = minhash(doc.get("doc_text") or "")
+    with _signatures_lock:
+        _signatures[key] = signature
+        if len(_signatures) > _SIGNATURES_MAX:
+            _signatures.popitem(last=False)
+    return signature
+
+
+def similarity(left: Signature, right: Signature) -> float:
+    """Оценка сходства Жаккара множеств шинглов: доля общих хэшей среди k наименьших хэшей объединения."""
+    both = set(left) & set(right)
+    union = heapq.nsmallest(_SKETCH, set(left) | set(right))
+    return sum(1 for x in union if x in both) / len(union)
+
+
+def merge_docs(left: List[Dict[str, Any]], right: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Редуктор docs: добавляет к left документы right, которых там ещё нет (по адресу, хэшу или MinHash)."""
+    docs = list(left)
+    if not right:
+        return docs
+    by_url = {normalize_url(doc.get("href") or ""): i for i, doc in enumerate(docs)}
+    by_url.pop("", None)
+    hashes = {_doc_hash(doc) for doc in docs if doc.get("doc_text")}
+    signatures = [s for s in (_signature(doc) for doc in docs if doc.get("doc_text")) if s is not None]
+    for doc in right:
+        url, text = normalize_url(doc.get("href") or ""), doc.get("doc_text")
+        reason = None
+        if url in by_url:
+            if not text or docs[by_url[url]].get("doc_text"):
+                reason = "url"
+            else:
+                # Страница, не загруженная ранее, пришла с текстом — занимает место пустого документа
+                docs[by_url[url]] = doc
+                reason = "refill"
+        if reason is None and text:
+            signature = _signature(doc)
+            if _doc_hash(doc) in hashes:
+                reason = "hash"
+            elif signature is not None and any(similarity(signature, s) >= DEDUP_THRESHOLD for s in signatures):
+                reason = "near"
+        if reason is not None:
+            record("dedup", reason=reason)
+            if reason != "refill":
+                continue
+        else:
+            docs.append(doc)
+            if url:
+                by_url[url] = len(docs) - 1
+        if text:
+            hashes.add(_doc_hash(doc))
+            signature = _signature(doc)
+            if signature is not None:
+                signatures.append(signature)
+    return docs
+
+
+@contextlib.contextmanager
+def session_documents(docs: Sequence[Dict[str, Any]]) -> Iterator[None]:
+    """Делает тексты документов сессии доступными known_text на время поиска (и в потоках через propagate)."""
+    texts = {normalize_url(doc.get("href") or ""): doc["doc_text"] for doc in docs if doc.get("doc_text")}
+    texts.pop("", None)
+    token = _session.set(texts)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def known_text(href: str) -> str | None:
+    """Текст страницы href, уже найденной в сессии; None — страницу нужно загрузить."""
+    texts = _session.get()
+    if texts is None:
+        return None
+    text = texts.get(normalize_url(href))
+    record("cache", name="session_docs", hit=text is not None)
+    return text
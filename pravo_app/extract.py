@@ -0,0 +1,181 @@
+"""
+Извлечение основного текста HTML-страниц (trafilatura) в пуле процессов.
+
+trafilatura.extract — работа CPU под GIL: на больших страницах consultant.ru она
+занимает поток графа и не масштабируется потоками. extract_text() отдаёт такие
+страницы в пул процессов (PRAVO_EXTRACT_PROCESSES), и извлечение идёт на всех ядрах.
+
+- Размер ограничен: HTML длиннее PRAVO_EXTRACT_MAX_KB обрезается до извлечения.
+- Быстрый предфильтр вырезает script, style, noscript, svg, nav, iframe, template и
+  комментарии — trafilatura разбирает меньший документ. Закрывающий тег ищется один раз
+  на элемент без возврата: незакрытые <script> обрезанной страницы не дают квадратичного
+  перебора, как регулярное выражение с обратной ссылкой и ленивым .*?.
+- Передача без копирования через pipe: байты страницы один раз записываются в
+  shared memory, рабочий процесс декодирует их прямо из memoryview.
+- Страницы меньше PRAVO_EXTRACT_INLINE_KB обрабатываются в вызывающем потоке:
+  передача в процесс обошлась бы дороже самого извлечения. Так же — без пула —
+  работает извлечение в демон-процессах (рабочих процессах service.py), которым
+  нельзя порождать дочерние процессы.
+- Извлечение в пуле, не завершённое за PRAVO_EXTRACT_TIMEOUT секунд (пул занят или
+  рабочий процесс завис), повторяется в вызывающем потоке.
+
+Каждый вызов регистрируется в metrics как событие extract.
+"""
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Set
+
+from .config import EXTRACT_INLINE_KB, EXTRACT_MAX_KB, EXTRACT_PROCESSES, EXTRACT_TIMEOUT
+from .metrics import timed
+
+# Элементы, которые никогда не дают основного текста, и HTML-комментарии
+_STRIP_TAGS = ("script", "style", "noscript", "svg", "nav", "iframe", "template")
+_OPEN_RE = re.compile(r"<(%s)\b[^>]*>|<!--" % "|".join(_STRIP_TAGS), re.IGNORECASE)
+_CLOSE_RE: Dict[str, re.Pattern] = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in _STRIP_TAGS}
+_COMMENT = "!--"
+
+
+def _element_end(html: str, tag: str, start: int) -> int:
+    """Конец элемента tag (после закрывающего тега или -->), начиная поиск со start; -1 — не закрыт."""
+    if tag == _COMMENT:
+        end = html.find("-->", start)
+        return end + 3 if end >= 0 else -1
+    close = _CLOSE_RE[tag].search(html, start)
+    return close.end() if close else -1
+
+
+def strip_html(html: str) -> str:
+    """HTML без script/style/noscript/svg/nav/iframe/template и комментариев.
+
+    Незакрытый элемент остаётся в тексте; закрывающий тег того же вида после него уже не ищется.
+    """
+    parts: List[str] = []
+    unclosed: Set[str] = set()
+    position = search_from = 0
+    while True:
+        match = _OPEN_RE.search(html, search_from)
+        if match is None:
+            break
+        tag = (match.group(1) or _COMMENT).lower()
+        end = -1 if tag in unclosed else _element_end(html, tag, match.end())
+        if end < 0:
+            unclosed.add(tag)
+            search_from = match.end()
+            continue
+        parts.append(html[position : match.start()])
+        parts.append(" ")
+        position = search_from = end
+    parts.append(html[position:])
+    return "".join(parts)
+
+
+def _decode(data: Any) -> str:
+    """Текст HTML из bytes / memoryview: UTF-8 без промежуточной копии, иначе — определение кодировки
+    (в том числе когда обрезка по лимиту разрезала многобайтовый символ)."""
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError:
+        from trafilatura.utils import decode_file
+
+        return decode_file(bytes(data))
+
+
+def _extract(html: str) -> str:
+    import trafilatura
+
+    return trafilatura.extract(strip_html(html)) or ""
+
+
+def _init_worker() -> None:
+    """Прогрев рабочего процесса: импорт trafilatura и lxml до первой страницы."""
+    import trafilatura  # noqa: F401
+
+
+def _extract_shared(name: str, size: int) -> str:
+    """Извлечение в рабочем процессе: HTML читается из shared memory name (size байт)."""
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: сегмент повторно регистрируется в resource tracker, общем с родительским
+        # процессом (spawn), — это безвредно; освобождает сегмент родительский процесс
+        shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:size]
+        try:
+            html = _decode(view)
+        finally:
+            view.release()
+    finally:
+        shm.close()
+    return _extract(html)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor | None:
+    """Пул процессов извлечения, созданный при первом обращении; None — пул не используется."""
+    global _pool
+    if EXTRACT_PROCESSES <= 0 or multiprocessing.current_process().daemon:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """Сбрасывает сломанный пул (рабочий процесс завершился аварийно): следующий вызов создаст новый."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _in_pool(pool: ProcessPoolExecutor, data: memoryview) -> str:
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[: len(data)] = data
+        future = pool.submit(_extract_shared, shm.name, len(data))
+        try:
+            return future.result(timeout=EXTRACT_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            raise
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def extract_text(html: str | bytes | None) -> str:
+    """Основной текст страницы (trafilatura) с ограничением размера и предфильтром; "" — текста нет."""
+    if not html:
+        return ""
+    data = memoryview(html.encode("utf-8") if isinstance(html, str) else html)
+    limit = int(EXTRACT_MAX_KB * 1024)
+    truncated = len(data) > limit
+    with timed("extract", bytes=len(data), truncated=truncated, mode="inline") as event:
+        data = data[:limit]
+        pool = _get_pool() if len(data) >= EXTRACT_INLINE_KB * 1024 else None
+        if pool is not None:
+            try:
+                text = _in_pool(pool, data)
+                event["mode"] = "pool"
+                return text
+            except BrokenProcessPool:
+                print("Пул извлечения текста недоступен, извлечение в текущем потоке")
+                _reset_pool(pool)
+            except TimeoutError:
+                print(f"Извлечение в пуле дольше {EXTRACT_TIMEOUT} с, извлечение в текущем потоке")
+                event["pool_timeout"] = True
+        return _extract(html if isinstance(html, str) and not truncated else _decode(data))
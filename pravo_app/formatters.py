@@ -4,7 +4,10 @@
 Функции преобразуют структурированные результаты поиска и диалог
 в текстовые строки, подходящие для промптов RAG.
 """
-from typing import Dict, List, Tuple
+from typing import Dict, List, Sequence, Tuple
+
+from .memory import resolve_ref
+from .text import BM25, estimate_tokens, split_passages, tokenize
 
 
 def format_docs(search_results: List[Dict]) -> str:
@@ -17,6 +20,58 @@ def format_docs(search_results: List[Dict]) -> str:
     return tpl
 
 
+def pack_docs(search_results: List[Dict], query: str, budget_tokens: int) -> str:
+    """
+    Упаковывает документы в контекст RAG-промпта в пределах бюджета токенов.
+
+    Документы делятся на пассажи, пассажи ранжируются по BM25 относительно query.
+    Сначала в бюджет попадает лучший пассаж каждого документа (в порядке релевантности),
+    затем остальные пассажи по убыванию оценки; пассажи без совпадений с запросом
+    отбрасываются. В тексте пассажи группируются по
+    источникам с исходной нумерацией [Source N] и сохраняют порядок внутри документа.
+
+    Заголовки источников входят всегда (их стоимость вычитается из бюджета): документ без
+    текста (найден, но не загружен к дедлайну) или без пассажей в бюджете остаётся в
+    контексте строкой [Source N]: title.
+    """
+    passages = []  # (номер источника, позиция в документе, текст)
+    for i, r in enumerate(search_results):
+        for pos, passage in enumerate(split_passages(r.get("doc_text") or "")):
+            passages.append((i, pos, passage))
+    if not passages:
+        return format_docs(search_results)
+
+    scores = BM25([tokenize(p[2]) for p in passages]).scores(tokenize(query))
+    # При равной оценке выше пассажи из начала документа
+    order = sorted(range(len(passages)), key=lambda k: (-scores[k], passages[k][1], passages[k][0]))
+    best_per_source: Dict[int, int] = {}
+    for k in order:
+        best_per_source.setdefault(passages[k][0], k)
+    leaders = set(best_per_source.values())
+    # Пассажи без совпадений с запросом (навигация, шапки) добавляются, только если совпадений нет вовсе
+    has_matches = any(score > 0 for score in scores)
+    ranked = list(best_per_source.values()) + [
+        k for k in order if k not in leaders and (scores[k] > 0 or not has_matches)
+    ]
+
+    selected = set()
+    used = sum(estimate_tokens(f"[Source {i}]: {r.get('title', '')}") for i, r in enumerate(search_results))
+    for k in ranked:
+        cost = estimate_tokens(passages[k][2])
+        if used + cost > budget_tokens:
+            continue
+        selected.add(k)
+        used += cost
+
+    tpl = ""
+    for i, r in enumerate(search_results):
+        chosen = [passages[k][2] for k in sorted(selected) if passages[k][0] == i]
+        title = r.get("title", "")
+        body = "\n...\n".join(chosen)
+        tpl += f"[Source {i}]: {title}\n{body}\n\n"
+    return tpl
+
+
 def format_links(search_results: List[Dict]) -> str:
     """Формирует список ссылок: title [href] для записи в messages."""
     links = []
@@ -25,9 +80,14 @@ def format_links(search_results: List[Dict]) -> str:
     return "\n".join(links)
 
 
-def format_dialog(messages: List[Tuple[str, str]]) -> str:
-    """Преобразует диалог (роль, текст) в текст для query_concat_prompt."""
+def format_dialog(
+    messages: List[Tuple[str, str]], docs: Sequence[Dict] = (), answers: Sequence[Dict] = ()
+) -> str:
+    """Преобразует диалог (роль, текст) в текст для query_concat_prompt.
+
+    Ссылки на выводы инструментов (@docs:..., @answers:N) раскрываются по docs и answers.
+    """
     tpl = ""
     for m in messages:
-        tpl += f"[{m[0]}]: {m[1]}\n\n"
+        tpl += f"[{m[0]}]: {resolve_ref(m[1], docs, answers)}\n\n"
     return tpl
@@ -0,0 +1,157 @@
+"""
+Локальный stub-сервер Garant API для тестов и офлайн-прогонов.
+
+Поддерживает поиск (POST /v1/search) и экспорт текста документа
+(GET /v1/topic/{topic}/html) на наборе документов в памяти. Запуск:
+
+    python -m pravo_app.garant_stub 8765 [documents.json]
+    PRAVO_GARANT_API_URL=http://127.0.0.1:8765 PRAVO_SEARCH_PROVIDER=garant python main.py
+
+documents.json — список {topic, name, text}. Без файла используется небольшой
+встроенный набор норм ЖК РФ и ГК РФ.
+"""
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from .text import tokenize
+
+DEFAULT_DOCUMENTS = [
+    {
+        "topic": 12138291,
+        "name": "Жилищный кодекс Российской Федерации. Статья 161. Выбор способа управления многоквартирным домом",
+        "text": "Управление многоквартирным домом должно обеспечивать благоприятные и безопасные условия "
+        "проживания граждан, надлежащее содержание общего имущества в многоквартирном доме.",
+    },
+    {
+        "topic": 10164072,
+        "name": "Гражданский кодекс Российской Федерации. Статья 15. Возмещение убытков",
+        "text": "Лицо, право которого нарушено, может требовать полного возмещения причиненных ему убытков, "
+        "если законом или договором не предусмотрено возмещение убытков в меньшем размере.",
+    },
+    {
+        "topic": 10164073,
+        "name": "Гражданский кодекс Российской Федерации. Статья 1064. Общие основания ответственности за причинение вреда",
+        "text": "Вред, причиненный личности или имуществу гражданина, подлежит возмещению в полном объеме "
+        "лицом, причинившим вред.",
+    },
+]
+
+_TOPIC_RE = re.compile(r"^/v1/topic/(\d+)/html$")
+
+
+class GarantStub:
+    """Stub-сервер: start() поднимает его в фоновом потоке, url — базовый адрес для PRAVO_GARANT_API_URL.
+
+    latency — искусственная задержка ответа (сек.), fail_first — сколько первых запросов
+    завершить ошибкой 503 (для проверки повторов и circuit breaker).
+    """
+
+    def __init__(
+        self,
+        documents: List[Dict[str, Any]] | None = None,
+        port: int = 0,
+        latency: float = 0.0,
+        fail_first: int = 0,
+    ) -> None:
+        self.documents = {int(d["topic"]): d for d in (documents or DEFAULT_DOCUMENTS)}
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "GarantStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def search(self, text: str, count: int) -> List[Dict[str, Any]]:
+        """Документы по убыванию числа совпавших термов запроса."""
+        terms = set(tokenize(text))
+        scored = []
+        for topic, doc in self.documents.items():
+            overlap = len(terms & set(tokenize(f"{doc['name']} {doc['text']}")))
+            if overlap:
+                scored.append((overlap, topic, doc))
+        scored.sort(key=lambda item: -item[0])
+        return [{"name": doc["name"], "url": f"/document/{topic}", "topic": topic} for _, topic, doc in scored[:count]]
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            return self.requests <= self.fail_first
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _prepare(self) -> bool:
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub._should_fail():
+                    self._send(503, b"Service Unavailable", "text/plain")
+                    return False
+                return True
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self._prepare():
+                    return
+                if self.path != "/v1/search":
+                    self._send(404, b"Not Found", "text/plain")
+                    return
+                payload = json.loads(body or b"{}")
+                documents = stub.search(payload.get("text", ""), int(payload.get("count", 1)))
+                data = json.dumps({"documents": documents}, ensure_ascii=False).encode("utf-8")
+                self._send(200, data, "application/json; charset=utf-8")
+
+            def do_GET(self) -> None:
+                if not self._prepare():
+                    return
+                m = _TOPIC_RE.match(self.path)
+                doc = stub.documents.get(int(m.group(1))) if m else None
+                if doc is None:
+                    self._send(404, b"Not Found", "text/plain")
+                    return
+                html = f"<html><body><article><h1>{doc['name']}</h1><p>{doc['text']}</p></article></body></html>"
+                self._send(200, html.encode("utf-8"), "text/html; charset=utf-8")
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    documents = None
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], encoding="utf-8") as f:
+            documents = json.load(f)
+    stub = GarantStub(documents, port=port)
+    print(f"Garant stub: {stub.url}")
+    stub._server.serve_forever()
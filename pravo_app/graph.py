@@ -3,12 +3,32 @@
 
 Определяет workflow: узлы, рёбра и условные переходы. Реализует Recursive RAG:
 уточнение → поиск → ответ → самопроверка → повторный поиск (при необходимости).
+
+Каждый узел регистрируется с синхронной и асинхронной реализацией: graph.invoke/stream
+используют первую, graph.ainvoke/astream — вторую.
 """
+from typing import Callable
+
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, START, StateGraph
 
+from .checkpoint import get_checkpointer
 from .decisions import check_need_human, check_need_re_search, check_search_type
+from .metrics import ainstrument, instrument
 from .nodes import (
+    aanswer_node,
+    abatch_clarify_node,
+    aclarify_node,
+    aclassify_node,
+    afinal_answer_node,
+    ahuman_clarify_node,
     answer_node,
+    aquery_concat_node,
+    areflect_node,
+    arewrite_node,
+    asearch_court_node,
+    asearch_npa_node,
+    asetup_node,
     batch_clarify_node,
     clarify_node,
     classify_node,
@@ -24,21 +44,30 @@ from .nodes import (
 from .state import MyState
 
 
+def _node(func: Callable, afunc: Callable) -> RunnableLambda:
+    """Узел графа с синхронной (func) и асинхронной (afunc) реализацией.
+
+    Обе реализации инструментированы: время узла и его события попадают в поле metrics.
+    """
+    name = func.__name__
+    return RunnableLambda(instrument(func, name), afunc=ainstrument(afunc, name), name=name)
+
+
 def build_graph() -> StateGraph:
     """Собирает и возвращает граф состояний. После compile() — исполняемый граф."""
     workflow = StateGraph(MyState)
-    workflow.add_node("старт", setup_node)
-    workflow.add_node("уточнение", clarify_node)
-    workflow.add_node("вопрос пользователю", human_clarify_node)
-    workflow.add_node("уточнение в batch", batch_clarify_node)
-    workflow.add_node("сбор запроса", query_concat_node)
-    workflow.add_node("переформулировка", rewrite_node)
-    workflow.add_node("классификация", classify_node)
-    workflow.add_node("поиск нпа", search_npa_node)
-    workflow.add_node("поиск судебки", search_court_node)
-    workflow.add_node("черновой ответ", answer_node)
-    workflow.add_node("самопроверка", reflect_node)
-    workflow.add_node("финальный ответ", final_answer_node)
+    workflow.add_node("старт", _node(setup_node, asetup_node))
+    workflow.add_node("уточнение", _node(clarify_node, aclarify_node))
+    workflow.add_node("вопрос пользователю", _node(human_clarify_node, ahuman_clarify_node))
+    workflow.add_node("уточнение в batch", _node(batch_clarify_node, abatch_clarify_node))
+    workflow.add_node("сбор запроса", _node(query_concat_node, aquery_concat_node))
+    workflow.add_node("переформулировка", _node(rewrite_node, arewrite_node))
+    workflow.add_node("классификация", _node(classify_node, aclassify_node))
+    workflow.add_node("поиск нпа", _node(search_npa_node, asearch_npa_node))
+    workflow.add_node("поиск судебки", _node(search_court_node, asearch_court_node))
+    workflow.add_node("черновой ответ", _node(answer_node, aanswer_node))
+    workflow.add_node("самопроверка", _node(reflect_node, areflect_node))
+    workflow.add_node("финальный ответ", _node(final_answer_node, afinal_answer_node))
 
     workflow.add_edge(START, "старт")
     workflow.add_edge("старт", "уточнение")
@@ -57,5 +86,6 @@ def build_graph() -> StateGraph:
     return workflow
 
 
-# Скомпилированный граф для обработки запросов
-graph = build_graph().compile()
+# Скомпилированный граф для обработки запросов; при PRAVO_CHECKPOINT_DB состояние
+# сохраняется после каждого узла (вызовы требуют config с thread_id, см. checkpoint.thread_config)
+graph = build_graph().compile(checkpointer=get_checkpointer())
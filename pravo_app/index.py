@@ -0,0 +1,268 @@
+"""
+Локальный поисковый индекс по уже полученным правовым документам.
+
+Каждый непустой doc_text, возвращённый web-поиском или Garant API, добавляется
+в индекс: документ делится на пассажи, пассажи индексируются в SQLite FTS5 и
+ранжируются по BM25 (встроенная функция bm25()). Опционально пассажи получают
+эмбеддинги (PRAVO_INDEX_EMBEDDINGS=1), и кандидаты BM25 переранжируются по
+косинусной близости к запросу.
+
+LocalSearchProvider ищет только в индексе (работает без сети),
+HybridSearchProvider — сначала в индексе, а в web — лишь при низкой полноте.
+"""
+import asyncio
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Sequence
+from urllib.parse import urlparse
+
+from .blobs import content_hash
+from .cache import cache_path
+from .config import INDEX_EMBEDDINGS, INDEX_MIN_COVERAGE, INDEX_MIN_HITS
+from .state import Doc
+from .text import split_passages, tokenize
+
+# Фильтр site:домен в поисковой фразе (как у DDGS)
+_SITE_RE = re.compile(r"\bsite:(\S+)")
+# Сколько пассажей-кандидатов BM25 отбирается на один запрос
+CANDIDATES = 50
+# Вес косинусной близости при переранжировании эмбеддингами
+EMBEDDING_WEIGHT = 0.5
+
+Embedder = Callable[[List[str]], List[List[float]]]
+
+
+def _domain(href: str) -> str:
+    host = urlparse(href).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _split_site(query: str) -> tuple[str, str | None]:
+    """Отделяет фильтр site: от текста запроса: (запрос, домен)."""
+    m = _SITE_RE.search(query)
+    if not m:
+        return query, None
+    site = m.group(1).strip("/").lower()
+    site = urlparse(site if "//" in site else f"//{site}").netloc or site
+    return _SITE_RE.sub("", query).strip(), site[4:] if site.startswith("www.") else site
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class LocalIndex:
+    """Инкрементальный индекс документов и пассажей в SQLite (FTS5 + BM25)."""
+
+    def __init__(self, path: str, embed: Embedder | None = None) -> None:
+        self.path = path
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "doc_hash TEXT PRIMARY KEY, href TEXT NOT NULL, domain TEXT NOT NULL, "
+            "title TEXT NOT NULL, doc_text TEXT NOT NULL, added_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS docs_domain ON docs(domain);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+            "terms, passage UNINDEXED, doc_hash UNINDEXED, domain UNINDEXED);"
+            "CREATE TABLE IF NOT EXISTS vectors (passage_id INTEGER PRIMARY KEY, vector TEXT NOT NULL);"
+        )
+        self._conn.commit()
+
+    def _has(self, doc_hash: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM docs WHERE doc_hash = ?", (doc_hash,)).fetchone() is not None
+
+    def add_documents(self, docs: Sequence[Doc]) -> int:
+        """Добавляет в индекс новые документы с непустым текстом; возвращает число добавленных."""
+        added = 0
+        for doc in docs:
+            text = doc.get("doc_text") or ""
+            href = doc.get("href") or ""
+            if not text or not href:
+                continue
+            doc_hash = doc.get("doc_hash") or content_hash(text)
+            if self._has(doc_hash):
+                continue
+            passages = split_passages(text)
+            vectors = self.embed(passages) if self.embed and passages else None
+            domain = _domain(href)
+            with self._lock:
+                # Повторная проверка: документ мог добавить другой поток
+                exists = self._conn.execute("SELECT 1 FROM docs WHERE doc_hash = ?", (doc_hash,)).fetchone()
+                if exists:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO docs (doc_hash, href, domain, title, doc_text, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_hash, href, domain, doc.get("title", ""), text, time.time()),
+                )
+                for pos, passage in enumerate(passages):
+                    cur = self._conn.execute(
+                        "INSERT INTO passages (terms, passage, doc_hash, domain) VALUES (?, ?, ?, ?)",
+                        (" ".join(tokenize(passage)), passage, doc_hash, domain),
+                    )
+                    if vectors:
+                        self._conn.execute(
+                            "INSERT INTO vectors (passage_id, vector) VALUES (?, ?)",
+                            (cur.lastrowid, json.dumps(vectors[pos])),
+                        )
+                self._conn.commit()
+            added += 1
+        return added
+
+    def search(self, query: str, max_results: int = 3) -> List[Dict]:
+        """
+        Ищет документы по запросу (поддерживает фильтр site:домен).
+
+        Возвращает до max_results записей {doc, score, coverage}: doc — документ в формате
+        Doc, score — лучшая оценка пассажа, coverage — доля термов запроса, найденных
+        в пассажах документа.
+        """
+        text, site = _split_site(query)
+        terms = sorted(set(tokenize(text)))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{t}"' for t in terms)
+        sql = "SELECT rowid, terms, doc_hash, -bm25(passages) AS score FROM passages WHERE passages MATCH ?"
+        params: list = [match]
+        if site:
+            sql += " AND (domain = ? OR domain LIKE ?)"
+            params += [site, f"%.{site}"]
+        sql += " ORDER BY bm25(passages) LIMIT ?"
+        params.append(CANDIDATES)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if not rows:
+            return []
+
+        scores = {row[0]: row[3] for row in rows}
+        if self.embed:
+            scores = self._rerank(text, scores)
+
+        by_doc: Dict[str, Dict] = {}
+        for rowid, passage_terms, doc_hash, _ in rows:
+            entry = by_doc.setdefault(doc_hash, {"score": 0.0, "terms": set()})
+            entry["score"] = max(entry["score"], scores[rowid])
+            entry["terms"].update(t for t in passage_terms.split() if t in terms)
+
+        ranked = sorted(by_doc.items(), key=lambda item: -item[1]["score"])[:max_results]
+        results = []
+        with self._lock:
+            for doc_hash, entry in ranked:
+                href, title, doc_text = self._conn.execute(
+                    "SELECT href, title, doc_text FROM docs WHERE doc_hash = ?", (doc_hash,)
+                ).fetchone()
+                doc: Doc = {"title": title, "href": href, "doc_text": doc_text, "doc_hash": doc_hash}
+                results.append({"doc": doc, "score": entry["score"], "coverage": len(entry["terms"]) / len(terms)})
+        return results
+
+    def _rerank(self, text: str, scores: Dict[int, float]) -> Dict[int, float]:
+        """Смешивает нормированную оценку BM25 с косинусной близостью эмбеддингов."""
+        ids = list(scores)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT passage_id, vector FROM vectors WHERE passage_id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        if not rows:
+            return scores
+        query_vector = self.embed([text])[0]
+        vectors = {pid: json.loads(vector) for pid, vector in rows}
+        top = max(scores.values()) or 1.0
+        return {
+            pid: (1 - EMBEDDING_WEIGHT) * score / top
+            + EMBEDDING_WEIGHT * (_cosine(query_vector, vectors[pid]) if pid in vectors else 0.0)
+            for pid, score in scores.items()
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            docs = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            passages = self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+        return {"docs": docs, "passages": passages}
+
+
+_index: LocalIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalIndex:
+    """Общий индекс процесса в PRAVO_CACHE_DIR/index.sqlite."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            embed = None
+            if INDEX_EMBEDDINGS:
+                from .llm import embed_texts
+
+                embed = embed_texts
+            _index = LocalIndex(cache_path("index.sqlite"), embed=embed)
+        return _index
+
+
+class LocalSearchProvider:
+    """Поиск только по локальному индексу: без сети, за миллисекунды."""
+
+    # Понимает фильтр site: в поисковой фразе
+    supports_site_filter = True
+
+    def __init__(self, index: LocalIndex | None = None) -> None:
+        self.index = index or get_local_index()
+
+    def search(self, query: str, max_results: int = 3) -> List[Doc]:
+        return [hit["doc"] for hit in self.index.search(query, max_results)]
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Doc]:
+        """Асинхронный search: запрос к SQLite (и эмбеддинги) — в потоке, event loop не блокируется."""
+        return await asyncio.to_thread(self.search, query, max_results)
+
+
+class HybridSearchProvider:
+    """Сначала локальный индекс; web-поиск — только если индекс не обеспечивает полноту.
+
+    Полнота достаточна, если найдено не менее min_hits документов, покрывающих
+    не меньше min_coverage термов запроса. Результаты web-поиска добавляются в индекс.
+    """
+
+    supports_site_filter = True
+
+    def __init__(
+        self,
+        web,
+        index: LocalIndex | None = None,
+        min_hits: int = INDEX_MIN_HITS,
+        min_coverage: float = INDEX_MIN_COVERAGE,
+    ) -> None:
+        self.web = web
+        self.index = index or get_local_index()
+        self.min_hits = min_hits
+        self.min_coverage = min_coverage
+
+    def _local(self, query: str, max_results: int) -> List[Doc] | None:
+        hits = self.index.search(query, max_results)
+        good = [hit["doc"] for hit in hits if hit["coverage"] >= self.min_coverage]
+        return good if len(good) >= min(self.min_hits, max_results) else None
+
+    def search(self, query: str, max_results: int = 3) -> List[Doc]:
+        local = self._local(query, max_results)
+        if local is not None:
+            return local
+        results = self.web.search(query, max_results)
+        self.index.add_documents(results)
+        return results
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Doc]:
+        """Асинхронный search: работа с индексом выполняется в потоках, web-поиск — через web.asearch."""
+        local = await asyncio.to_thread(self._local, query, max_results)
+        if local is not None:
+            return local
+        results = await self.web.asearch(query, max_results)
+        await asyncio.to_thread(self.index.add_documents, results)
+        return results
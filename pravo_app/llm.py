@@ -1,38 +1,307 @@
 """
 Работа с LLM GigaChat.
 
-Предоставляет единый экземпляр клиента и функцию ask_giga() для синхронных
-запросов к модели. Используется узлами графа для классификации, переформулировки
-и генерации RAG-ответов.
-"""
-from gigachat import GigaChat
-from gigachat.models import Chat, Messages, MessagesRole
+Предоставляет единый экземпляр клиента и функции ask_giga() / aask_giga() для
+синхронных и асинхронных запросов к модели. Используется узлами графа для
+классификации, переформулировки и генерации RAG-ответов. stream_giga() /
+astream_giga() получают ответ потоком и отдают фрагменты по мере генерации
+(для вывода ответа пользователю до завершения генерации).
+
+Ответы могут кэшироваться на диске (PRAVO_LLM_CACHE=1): ключ — хэш промпта,
+модели и параметров генерации. Кэш включается/выключается по узлам через
+аргумент node и списки PRAVO_LLM_CACHE_NODES / PRAVO_LLM_CACHE_SKIP_NODES.
 
-from .config import GIGACHAT_API_KEY, GIGACHAT_SCOPE
+Каждый вызов регистрируется в metrics как событие llm: время, ожидание лимита
+частоты, токены промпта и ответа (поле usage GigaChat) и попадание в кэш.
+При активной кассете (см. cassette) ответы записываются или воспроизводятся без API.
+
+Клиент GigaChat (и сам пакет gigachat) создаётся при первом вызове, а не при импорте:
+для импорта модуля не нужны ни учётные данные, ни время на загрузку SDK.
+"""
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
-# Глобальный клиент GigaChat (singleton)
-_llm = GigaChat(
-    credentials=GIGACHAT_API_KEY,
-    verify_ssl_certs=False,
-    scope=GIGACHAT_SCOPE,
+from . import config
+from .cache import DiskCache, cache_path, make_key
+from .cassette import wrap_client
+from .config import (
+    GIGACHAT_EMBEDDINGS_MODEL,
+    GIGACHAT_SCOPE,
+    LLM_CACHE,
+    LLM_CACHE_MAX_MB,
+    LLM_CACHE_NODES,
+    LLM_CACHE_SKIP_NODES,
+    LLM_CACHE_TTL,
+    LLM_RATE_LIMIT,
 )
+from .metrics import Event, timed
+from .ratelimit import RateLimiter
+from .text import estimate_tokens
+
+if TYPE_CHECKING:
+    from gigachat.models import Chat
+
+# Глобальный клиент GigaChat (singleton): поддерживает и sync, и async вызовы; создаётся в _get_llm()
+_llm: Any = None
+_llm_lock = threading.Lock()
+
+
+def _get_llm() -> Any:
+    """Клиент GigaChat, созданный при первом обращении (или подменённый через set_client)."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from gigachat import GigaChat
+
+                _llm = GigaChat(
+                    credentials=config.GIGACHAT_API_KEY,
+                    verify_ssl_certs=False,
+                    scope=GIGACHAT_SCOPE,
+                )
+    return _llm
+
+
+def set_client(client: Any) -> Any:
+    """Подменяет клиент GigaChat (объект с методами chat/achat/stream/astream) и возвращает прежний.
+
+    Используется бенчмарком и тестами для работы без обращения к API. None — вернуть
+    клиент по умолчанию (будет создан при следующем вызове).
+    """
+    global _llm
+    with _llm_lock:
+        previous, _llm = _llm, client
+    return previous
+
+
+def _client() -> Any:
+    """Клиент для очередного вызова: при активной кассете — с записью/воспроизведением ответов."""
+    return wrap_client(_get_llm)
+
+
+# Общий лимит частоты вызовов GigaChat для всех потоков и корутин процесса
+_rate_limiter = RateLimiter(LLM_RATE_LIMIT)
+
+
+def set_rate_limit(rate: float) -> None:
+    """Переустанавливает глобальный лимит запросов к GigaChat в секунду (0 — без ограничения)."""
+    global _rate_limiter
+    _rate_limiter = RateLimiter(rate)
+
+
+# Параметры генерации: входят и в запрос, и в ключ кэша
+GENERATION_PARAMS = {
+    "temperature": 1.0,
+    "max_tokens": 1000,
+    "top_p": 0.0,
+    "repetition_penalty": 1.0,
+}
+
+# Дисковый кэш ответов создаётся при первом обращении
+_llm_cache: DiskCache | None = None
+_llm_cache_lock = threading.Lock()
+
+
+def _get_llm_cache() -> DiskCache:
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = DiskCache(
+                cache_path("llm.sqlite"),
+                table="llm",
+                ttl=LLM_CACHE_TTL,
+                max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024),
+            )
+        return _llm_cache
+
+
+def _cache_enabled(node: str | None) -> bool:
+    """Кэш включён глобально и для данного узла (node — имя функции узла, например clarify_node)."""
+    if not LLM_CACHE:
+        return False
+    if node in LLM_CACHE_SKIP_NODES:
+        return False
+    return not LLM_CACHE_NODES or node in LLM_CACHE_NODES
+
+
+def llm_cache_stats() -> Dict[str, int]:
+    """Счётчики кэша LLM: hits, misses, entries, bytes."""
+    if not LLM_CACHE:
+        return {"hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+    return _get_llm_cache().stats()
 
 
-def ask_giga(query: str, model: str) -> str:
-    """Отправляет промпт в GigaChat и возвращает текст ответа."""
-    payload = Chat(
+def _build_payload(query: str, model: str) -> "Chat":
+    """Формирует запрос к чату: один пользовательский промпт и фиксированные параметры генерации."""
+    from gigachat.models import Chat, Messages, MessagesRole
+
+    return Chat(
         messages=[
             Messages(
                 role=MessagesRole.USER,
                 content=query,
             )
         ],
-        temperature=1.0,
-        max_tokens=1000,
-        top_p=0.0,
-        repetition_penalty=1.0,
         model=model,
+        **GENERATION_PARAMS,
     )
-    response = _llm.chat(payload)
+
+
+# Получатель фрагментов ответа при потоковой генерации
+TokenCallback = Callable[[str], None]
+
+
+def _usage(response: Any) -> Dict[str, int]:
+    """Токены промпта и ответа из поля usage ответа GigaChat (пусто, если его нет)."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {}
+    return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+
+def _acquire(event: Event) -> None:
+    """Ожидает разрешения лимита частоты; время ожидания записывается в событие."""
+    started = time.perf_counter()
+    _rate_limiter.acquire()
+    event["rate_wait"] = round(time.perf_counter() - started, 4)
+
+
+async def _aacquire(event: Event) -> None:
+    started = time.perf_counter()
+    await _rate_limiter.aacquire()
+    event["rate_wait"] = round(time.perf_counter() - started, 4)
+
+
+def _response_text(response: Any) -> str:
+    """Извлекает текст первого варианта ответа."""
     data = response.model_dump() if hasattr(response, "model_dump") else response.dict()
     return data["choices"][0]["message"]["content"].strip()
+
+
+def ask_giga(query: str, model: str, node: str | None = None) -> str:
+    """Отправляет промпт в GigaChat и возвращает текст ответа. node — имя узла для настроек кэша и метрик."""
+    with timed("llm", node=node, model=model, cache_hit=False) as event:
+        use_cache = _cache_enabled(node)
+        if use_cache:
+            key = make_key(query, model, GENERATION_PARAMS)
+            cached = _get_llm_cache().get(key)
+            if cached is not None:
+                event["cache_hit"] = True
+                return cached
+        _acquire(event)
+        response = _client().chat(_build_payload(query, model))
+        event.update(_usage(response))
+        text = _response_text(response)
+        if use_cache:
+            _get_llm_cache().set(key, text)
+        return text
+
+
+async def aask_giga(query: str, model: str, node: str | None = None) -> str:
+    """Асинхронный вариант ask_giga: не блокирует event loop на время сетевого запроса и обращений к кэшу."""
+    with timed("llm", node=node, model=model, cache_hit=False) as event:
+        use_cache = _cache_enabled(node)
+        if use_cache:
+            key = make_key(query, model, GENERATION_PARAMS)
+            cached = await asyncio.to_thread(_get_llm_cache().get, key)
+            if cached is not None:
+                event["cache_hit"] = True
+                return cached
+        await _aacquire(event)
+        response = await _client().achat(_build_payload(query, model))
+        event.update(_usage(response))
+        text = _response_text(response)
+        if use_cache:
+            await asyncio.to_thread(_get_llm_cache().set, key, text)
+        return text
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Текст фрагмента потокового ответа (пустая строка для служебных фрагментов)."""
+    choices = chunk.choices
+    return (choices[0].delta.content or "") if choices else ""
+
+
+def _estimated_usage(query: str, text: str) -> Dict[str, Any]:
+    """Оценка токенов, если поток не вернул usage."""
+    return {"prompt_tokens": estimate_tokens(query), "completion_tokens": estimate_tokens(text), "estimated": True}
+
+
+def stream_giga(query: str, model: str, node: str | None = None, on_token: TokenCallback | None = None) -> str:
+    """Как ask_giga, но получает ответ потоком: каждый фрагмент передаётся в on_token.
+
+    Возвращает полный текст ответа. Ответ из кэша передаётся в on_token одним фрагментом.
+    """
+    with timed("llm", node=node, model=model, cache_hit=False) as event:
+        use_cache = _cache_enabled(node)
+        if use_cache:
+            key = make_key(query, model, GENERATION_PARAMS)
+            cached = _get_llm_cache().get(key)
+            if cached is not None:
+                event["cache_hit"] = True
+                if on_token:
+                    on_token(cached)
+                return cached
+        _acquire(event)
+        parts = []
+        usage: Dict[str, int] = {}
+        for chunk in _client().stream(_build_payload(query, model)):
+            usage = _usage(chunk) or usage
+            part = _chunk_text(chunk)
+            if part:
+                parts.append(part)
+                if on_token:
+                    on_token(part)
+        text = "".join(parts).strip()
+        event.update(usage or _estimated_usage(query, text))
+        if use_cache:
+            _get_llm_cache().set(key, text)
+        return text
+
+
+async def astream_giga(
+    query: str, model: str, node: str | None = None, on_token: TokenCallback | None = None
+) -> str:
+    """Асинхронный вариант stream_giga."""
+    with timed("llm", node=node, model=model, cache_hit=False) as event:
+        use_cache = _cache_enabled(node)
+        if use_cache:
+            key = make_key(query, model, GENERATION_PARAMS)
+            cached = await asyncio.to_thread(_get_llm_cache().get, key)
+            if cached is not None:
+                event["cache_hit"] = True
+                if on_token:
+                    on_token(cached)
+                return cached
+        await _aacquire(event)
+        parts = []
+        usage: Dict[str, int] = {}
+        async for chunk in _client().astream(_build_payload(query, model)):
+            usage = _usage(chunk) or usage
+            part = _chunk_text(chunk)
+            if part:
+                parts.append(part)
+                if on_token:
+                    on_token(part)
+        text = "".join(parts).strip()
+        event.update(usage or _estimated_usage(query, text))
+        if use_cache:
+            await asyncio.to_thread(_get_llm_cache().set, key, text)
+        return text
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Эмбеддинги текстов моделью GIGACHAT_EMBEDDINGS_MODEL (в порядке texts).
+
+    Вызов регистрируется как событие llm узла embeddings (токены — из usage элементов ответа).
+    """
+    with timed("llm", node="embeddings", model=GIGACHAT_EMBEDDINGS_MODEL, cache_hit=False, texts=len(texts)) as event:
+        _acquire(event)
+        response = _client().embeddings(texts, model=GIGACHAT_EMBEDDINGS_MODEL)
+        items = sorted(response.data, key=lambda item: item.index)
+        usages = [getattr(item, "usage", None) for item in items]
+        event["prompt_tokens"] = sum(usage.prompt_tokens for usage in usages if usage is not None)
+        event["completion_tokens"] = 0
+        return [item.embedding for item in items]
@@ -0,0 +1,87 @@
+"""
+Ограниченная память диалога для поля состояния messages.
+
+Редуктор window_messages хранит последние MESSAGES_WINDOW сообщений; более старые
+сворачиваются в одно сообщение ("summary", текст) — извлекающая сводка без LLM:
+реплики пользователя и поисковые фразы сохраняются (в сокращении), выводы инструментов
+отбрасываются. Размер messages и промпта query_concat_node не растёт с числом
+уточнений и циклов повторного поиска.
+
+Выводы инструментов (result_search_*, tool_rag) записываются в messages ссылкой на
+данные, которые и так есть в состоянии: "@docs:<doc_hash>,..." — на документы поля docs,
+"@answers:<номер>" — на черновой ответ поля answers. format_dialog раскрывает ссылки.
+"""
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .blobs import content_hash
+from .config import MESSAGES_SUMMARY_CHARS, MESSAGES_WINDOW
+
+Message = Tuple[str, str]
+
+# Роль сообщения со сводкой свёрнутой части истории
+SUMMARY_ROLE = "summary"
+# Роли, реплики которых попадают в сводку: пользователь и поисковые фразы
+_SUMMARY_ROLES = {"user": "Пользователь", "tool_clarify": "Уточнение", "tool_concat": "Запрос", "tool_rewrite": "Запрос"}
+# Длина одной реплики в сводке, символов
+_SUMMARY_ITEM_CHARS = 300
+# Число символов doc_hash в ссылке на документ
+_HASH_CHARS = 12
+
+_REF_RE = re.compile(r"^@(docs|answers):(.*)$")
+
+
+def _doc_key(doc: Dict[str, Any]) -> str:
+    return (doc.get("doc_hash") or content_hash(doc.get("doc_text") or ""))[:_HASH_CHARS]
+
+
+def docs_ref(docs: Sequence[Dict[str, Any]]) -> str:
+    """Ссылка на документы поля docs по хэшам содержимого."""
+    return "@docs:" + ",".join(_doc_key(doc) for doc in docs)
+
+
+def answer_ref(index: int) -> str:
+    """Ссылка на черновой ответ answers[index]."""
+    return f"@answers:{index}"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def summarize_messages(messages: Sequence[Message]) -> str:
+    """Извлекающая сводка сообщений (с учётом предыдущей сводки), не длиннее MESSAGES_SUMMARY_CHARS."""
+    lines: List[str] = []
+    for role, text in messages:
+        if role == SUMMARY_ROLE:
+            lines.extend(text.splitlines())
+        elif role in _SUMMARY_ROLES and text:
+            lines.append(f"{_SUMMARY_ROLES[role]}: {_clip(text, _SUMMARY_ITEM_CHARS)}")
+    # При превышении лимита отбрасываются самые старые строки; первая реплика пользователя остаётся
+    while len(lines) > 2 and sum(len(line) + 1 for line in lines) > MESSAGES_SUMMARY_CHARS:
+        del lines[1]
+    return "\n".join(lines)
+
+
+def window_messages(left: List[Message], right: List[Message]) -> List[Message]:
+    """Редуктор messages: добавляет новые сообщения и сворачивает вышедшие за окно в сводку."""
+    messages = list(left) + list(right)
+    if MESSAGES_WINDOW <= 0 or len(messages) <= MESSAGES_WINDOW + 1:
+        return messages
+    older, recent = messages[:-MESSAGES_WINDOW], messages[-MESSAGES_WINDOW:]
+    return [(SUMMARY_ROLE, summarize_messages(older))] + recent
+
+
+def resolve_ref(text: str, docs: Sequence[Dict[str, Any]] = (), answers: Sequence[Dict[str, Any]] = ()) -> str:
+    """Текст сообщения со ссылкой: список документов или черновой ответ; иначе text без изменений."""
+    match = _REF_RE.match(text or "")
+    if not match:
+        return text
+    kind, value = match.groups()
+    if kind == "answers":
+        index = int(value) if value.isdigit() else -1
+        return answers[index].get("doc_text", "") if 0 <= index < len(answers) else text
+    by_hash = {_doc_key(doc): doc for doc in docs}
+    links = [f"{by_hash[h].get('title', '')} [{by_hash[h].get('href', '')}]" for h in value.split(",") if h in by_hash]
+    return "\n".join(links) if links else text
@@ -0,0 +1,308 @@
+"""
+Инструментирование агента: время узлов, токены GigaChat, объём загрузок, попадания в кэш.
+
+Каждое измерение — структурированное событие (словарь с полем kind):
+  node   — выполнение узла графа: name, seconds;
+  llm    — вызов GigaChat: node (embeddings — эмбеддинги индекса), model, seconds, rate_wait,
+           prompt_tokens, completion_tokens, cache_hit;
+  search — вызов поиска: name (npa/court), provider, seconds, results, bytes;
+  fetch  — сетевая загрузка страницы или документа: source, seconds, bytes;
+  extract — извлечение текста HTML (extract.py): mode (pool/inline), seconds, bytes, truncated;
+  cache  — обращение к кэшу поиска: name, hit;
+  preclassify — решение локального предклассификатора: name (clarify/classify), label,
+           confidence, hit (решение принято без LLM);
+  re_search — решение о повторном поиске (re_search.py): decision (continue/stop), reason;
+  speculation — спекулятивная ветка clarify_node: hit (результат использован, а не отброшен);
+  dedup  — документ поиска, совпавший с уже найденным (dedup.py): reason (url/hash/near/refill).
+
+Обёртка узла (instrument / ainstrument, подключается в graph.py) собирает события,
+возникшие во время выполнения узла, и добавляет их в поле состояния metrics. По
+итоговому состоянию summarize() строит сводку прогона; узел финального ответа сохраняет
+её в поле metrics_summary (run_summary — с событиями самого узла). Кроме того, все события
+накапливаются в счётчиках процесса, которые отдаются в текстовом формате Prometheus
+(prometheus_text, serve_metrics).
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Sequence
+
+from .config import LLM_TOKEN_PRICE
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+Event = Dict[str, Any]
+
+# События текущего узла графа (None — вызов вне графа: событие попадает только в счётчики процесса)
+_events: contextvars.ContextVar[List[Event] | None] = contextvars.ContextVar("pravo_metrics_events", default=None)
+# Имя и время начала (perf_counter) выполняемого узла графа
+_node: contextvars.ContextVar[tuple[str, float] | None] = contextvars.ContextVar("pravo_metrics_node", default=None)
+
+
+class _Registry:
+    """Счётчики процесса по всем событиям: (имя метрики, метки) → значение."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+
+    def _inc(self, name: str, labels: Dict[str, Any], value: float = 1.0) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def observe(self, event: Event) -> None:
+        kind = event["kind"]
+        with self._lock:
+            if kind == "node":
+                self._inc("pravo_node_calls_total", {"node": event["name"]})
+                self._inc("pravo_node_seconds_total", {"node": event["name"]}, event["seconds"])
+            elif kind == "llm":
+                labels = {"node": event.get("node") or ""}
+                self._inc("pravo_llm_calls_total", {**labels, "cache": "hit" if event.get("cache_hit") else "miss"})
+                self._inc("pravo_llm_seconds_total", labels, event["seconds"])
+                self._inc("pravo_llm_tokens_total", {**labels, "type": "prompt"}, event.get("prompt_tokens", 0))
+                self._inc("pravo_llm_tokens_total", {**labels, "type": "completion"}, event.get("completion_tokens", 0))
+            elif kind == "search":
+                labels = {"name": event["name"], "provider": event.get("provider", "")}
+                self._inc("pravo_search_calls_total", labels)
+                self._inc("pravo_search_seconds_total", labels, event["seconds"])
+            elif kind == "fetch":
+                labels = {"source": event["source"]}
+                self._inc("pravo_fetch_total", labels)
+                self._inc("pravo_fetch_bytes_total", labels, event.get("bytes", 0))
+                self._inc("pravo_fetch_seconds_total", labels, event["seconds"])
+            elif kind == "extract":
+                labels = {"mode": event["mode"]}
+                self._inc("pravo_extract_total", labels)
+                self._inc("pravo_extract_bytes_total", labels, event.get("bytes", 0))
+                self._inc("pravo_extract_seconds_total", labels, event["seconds"])
+            elif kind == "cache":
+                self._inc("pravo_cache_requests_total", {"cache": event["name"], "result": "hit" if event["hit"] else "miss"})
+            elif kind == "preclassify":
+                self._inc("pravo_preclassify_total", {"node": event["name"], "result": "local" if event["hit"] else "llm"})
+            elif kind == "re_search":
+                self._inc("pravo_re_search_total", {"decision": event["decision"], "reason": event["reason"]})
+            elif kind == "speculation":
+                self._inc("pravo_speculation_total", {"result": "used" if event["hit"] else "discarded"})
+            elif kind == "dedup":
+                self._inc("pravo_dedup_total", {"reason": event["reason"]})
+
+    def text(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in items:
+            if name not in declared:
+                lines.append(f"# TYPE {name} counter")
+                declared.add(name)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = _Registry()
+
+
+def record(kind: str, **fields: Any) -> Event:
+    """Регистрирует событие: в списке текущего узла (если он есть) и в счётчиках процесса."""
+    event = {"kind": kind, **fields}
+    events = _events.get()
+    if events is not None:
+        events.append(event)
+    _registry.observe(event)
+    return event
+
+
+@contextmanager
+def timed(kind: str, **fields: Any) -> Iterator[Event]:
+    """Замеряет время блока и регистрирует событие kind; поля можно дополнять внутри блока."""
+    fields = dict(fields)
+    started = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(kind, seconds=round(time.perf_counter() - started, 4), **fields)
+
+
+def propagate(func: Callable) -> Callable:
+    """func, выполняемая в копии текущего контекста: события из пула потоков попадают в сборщик узла.
+
+    Копия создаётся на каждый вызов propagate — передавайте в executor.submit результат
+    отдельного вызова для каждой задачи.
+    """
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def _finish(update: Any, name: str, started: float, events: List[Event]) -> Any:
+    node_event = {"kind": "node", "name": name, "seconds": round(time.perf_counter() - started, 4)}
+    _registry.observe(node_event)
+    if not isinstance(update, dict):
+        return update
+    # langgraph импортируется здесь: metrics загружается и без графа (см. README, «Импорт»)
+    from langgraph.types import Overwrite
+
+    reset = update.get("metrics")
+    if isinstance(reset, Overwrite):
+        # Узел сбрасывает metrics (setup_node): события узла — первые в новом списке
+        return {**update, "metrics": Overwrite(reset.value + events + [node_event])}
+    return {**update, "metrics": events + [node_event]}
+
+
+def instrument(func: Callable, name: str | None = None) -> Callable:
+    """Обёртка узла графа: время выполнения и события узла добавляются в поле metrics."""
+    name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(state):
+        events: List[Event] = []
+        token = _events.set(events)
+        started = time.perf_counter()
+        node_token = _node.set((name, started))
+        try:
+            update = func(state)
+        finally:
+            _node.reset(node_token)
+            _events.reset(token)
+        return _finish(update, name, started, events)
+
+    return wrapper
+
+
+def ainstrument(afunc: Callable, name: str | None = None) -> Callable:
+    """Асинхронный вариант instrument."""
+    name = name or afunc.__name__.removeprefix("a")
+
+    @functools.wraps(afunc)
+    async def wrapper(state):
+        events: List[Event] = []
+        token = _events.set(events)
+        started = time.perf_counter()
+        node_token = _node.set((name, started))
+        try:
+            update = await afunc(state)
+        finally:
+            _node.reset(node_token)
+            _events.reset(token)
+        return _finish(update, name, started, events)
+
+    return wrapper
+
+
+def summarize(events: Sequence[Event]) -> Dict[str, Any]:
+    """Сводка прогона по событиям из поля metrics итогового состояния."""
+    nodes: Dict[str, Dict[str, float]] = {}
+    llm = {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0, "rate_wait": 0.0}
+    llm_by_node: Dict[str, Dict[str, float]] = {}
+    search = {"calls": 0, "results": 0, "bytes": 0, "seconds": 0.0}
+    fetch = {"count": 0, "bytes": 0, "seconds": 0.0}
+    caches: Dict[str, Dict[str, int]] = {}
+
+    for event in events:
+        kind = event.get("kind")
+        if kind == "node":
+            entry = nodes.setdefault(event["name"], {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += event["seconds"]
+        elif kind == "llm":
+            entry = llm_by_node.setdefault(
+                event.get("node") or "", {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+            )
+            for target in (llm, entry):
+                target["calls"] += 1
+                target["prompt_tokens"] += event.get("prompt_tokens", 0)
+                target["completion_tokens"] += event.get("completion_tokens", 0)
+                target["seconds"] += event["seconds"]
+            llm["cache_hits"] += 1 if event.get("cache_hit") else 0
+            llm["rate_wait"] += event.get("rate_wait", 0.0)
+        elif kind == "search":
+            search["calls"] += 1
+            search["results"] += event.get("results", 0)
+            search["bytes"] += event.get("bytes", 0)
+            search["seconds"] += event["seconds"]
+        elif kind == "fetch":
+            fetch["count"] += 1
+            fetch["bytes"] += event.get("bytes", 0)
+            fetch["seconds"] += event["seconds"]
+        elif kind == "cache":
+            entry = caches.setdefault(event["name"], {"hits": 0, "misses": 0})
+            entry["hits" if event["hit"] else "misses"] += 1
+
+    for entry in [llm, search, fetch, *nodes.values(), *llm_by_node.values()]:
+        for field in ("seconds", "rate_wait"):
+            if field in entry:
+                entry[field] = round(entry[field], 4)
+    tokens = llm["prompt_tokens"] + llm["completion_tokens"]
+    llm["cost"] = round(tokens / 1000 * LLM_TOKEN_PRICE, 4)
+    llm["by_node"] = llm_by_node
+    return {
+        "seconds": round(sum(entry["seconds"] for entry in nodes.values()), 4),
+        "nodes": nodes,
+        "llm": llm,
+        "search": search,
+        "fetch": fetch,
+        "cache": caches,
+    }
+
+
+def run_summary(events: Sequence[Event]) -> Dict[str, Any]:
+    """Сводка прогона изнутри узла графа: события прошлых узлов (поле metrics) и текущего узла до этого момента."""
+    current = list(_events.get() or [])
+    node = _node.get()
+    if node is not None:
+        name, started = node
+        current.append({"kind": "node", "name": name, "seconds": round(time.perf_counter() - started, 4)})
+    return summarize([*events, *current])
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Сводка прогона в виде текста для консоли."""
+    llm = summary["llm"]
+    lines = [
+        f"Время узлов: {summary['seconds']:.2f} с; LLM: {llm['calls']} вызовов "
+        f"({llm['cache_hits']} из кэша), токены {llm['prompt_tokens']} + {llm['completion_tokens']}, "
+        f"стоимость {llm['cost']}",
+    ]
+    for name, entry in sorted(summary["nodes"].items(), key=lambda item: -item[1]["seconds"]):
+        tokens = llm["by_node"].get(name)
+        token_text = f", токены {tokens['prompt_tokens']} + {tokens['completion_tokens']}" if tokens else ""
+        lines.append(f"  {name}: {entry['calls']} × {entry['seconds']:.2f} с{token_text}")
+    search, fetch = summary["search"], summary["fetch"]
+    lines.append(
+        f"Поиск: {search['calls']} вызовов, {search['seconds']:.2f} с; "
+        f"загрузки: {fetch['count']}, {fetch['bytes']} байт"
+    )
+    return "\n".join(lines)
+
+
+def prometheus_text() -> str:
+    """Счётчики процесса в текстовом формате Prometheus."""
+    return _registry.text()
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Поднимает в фоновом потоке HTTP-сервер, отдающий prometheus_text() по GET /metrics."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
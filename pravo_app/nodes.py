@@ -3,27 +3,66 @@
 
 Каждая функция принимает state, возвращает state_update (словарь изменений).
 Обновления мержатся в общее состояние согласно редукторам TypedDict.
+
+У каждого узла есть асинхронный вариант с префиксом «a» (aclarify_node и т.д.):
+он используется при graph.ainvoke/astream и не блокирует event loop на сетевых
+вызовах. Общая логика подготовки промпта и разбора ответа вынесена во
+вспомогательные функции _*_update, чтобы sync- и async-варианты не расходились.
 """
+import asyncio
+import json
 import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple
 
-from langgraph.types import interrupt
-
-from .config import GIGACHAT_MODEL
-from .formatters import format_dialog, format_docs, format_links
-from .llm import ask_giga
+from langgraph.config import get_stream_writer
+from langgraph.types import Overwrite, interrupt
+
+from .config import (
+    CLASSIFY_WEIGHTING,
+    CONTEXT_TOKENS,
+    GIGACHAT_MODEL,
+    PRECLASSIFY,
+    REWRITE_CLASSIFY,
+    SEARCH_MODE,
+    SEARCH_RESULTS,
+    SEARCH_RESULTS_SECONDARY,
+    SPECULATIVE,
+)
+from .decisions import check_need_human
+from .dedup import session_documents
+from .formatters import format_dialog, format_links, pack_docs
+from .memory import answer_ref, docs_ref
+from .llm import TokenCallback, aask_giga, ask_giga, astream_giga, stream_giga
+from .metrics import propagate, record, run_summary
+from .preclassify import local_category, local_clarification
+from .re_search import query_stop_reason, record_decision, stop_reason
 from .prompts import (
     classification_prompt,
     clarification_prompt,
     clarification_prompt_batch,
     final_answer_prompt,
     query_concat_prompt,
+    query_rewrite_classify_prompt,
     query_rewrite_prompt,
     rag_prompt, rag_prompt_only_link,
+    reflection_classify_prompt,
     reflection_prompt,
 )
-from .search import call_court_api, call_npa_api
-from .state import MyState
+from .search import acall_court_api, acall_npa_api, call_court_api, call_npa_api
+from .state import Doc, MyState
+
+# Ответ при отсутствии документов для RAG
+NO_DOCS_ANSWER = "Извините, по вашему запросу не удалось найти подходящие документы."
+
+# Допустимые категории в структурированных ответах LLM (ключ — в нижнем регистре)
+CATEGORIES = {"нпа": "НПА", "судебное": "Судебное"}
+# Ответ самопроверки «ок», в том числе развёрнутый («Ок, ответ полный»), но не слово на «ок…»
+_OK_RE = re.compile(r"^\W*(ок|ok|окей)(?!\w)", re.IGNORECASE)
+# Обёртка ```json ... ```, которую модель иногда добавляет вокруг JSON
+_JSON_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
 
 
 def ask_human(query: str) -> str:
@@ -32,16 +71,26 @@ def ask_human(query: str) -> str:
 
 
 def setup_node(state: MyState) -> MyState:
-    """Инициализирует состояние: query → search_query, messages, обнуляет счётчики и флаги."""
+    """Инициализирует состояние: query → search_query, messages, обнуляет счётчики и флаги.
+
+    Поля с редукторами (messages, docs, answers, metrics, retrieved_total) сбрасываются через
+    Overwrite: иначе новый запрос в сессии с тем же thread_id (checkpointer) дописывался бы
+    к документам, черновикам и событиям предыдущего.
+    """
     state_update = dict()
     state_update["search_query"] = state["query"]
-    state_update["messages"] = [("user", state["query"])]
+    state_update["messages"] = Overwrite([("user", state["query"])])
     state_update["clarification"] = None
     state_update["clarification_answer"] = None
     state_update["need_clarify_question"] = None
     state_update["category"] = None
-    state_update["docs"] = []
-    state_update["answers"] = []
+    state_update["category_query"] = None
+    state_update["speculation"] = None
+    state_update["docs"] = Overwrite([])
+    state_update["retrieved_total"] = Overwrite(0)
+    state_update["answers"] = Overwrite([])
+    state_update["metrics"] = Overwrite([])
+    state_update["metrics_summary"] = None
     state_update["final_answer"] = None
     state_update["need_re_search"] = None
     state_update["re_search_cnt"] = 0
@@ -51,14 +100,15 @@ def setup_node(state: MyState) -> MyState:
     return state_update
 
 
-def clarify_node(state: MyState) -> MyState:
-    """Проверяет достаточность контекста: LLM решает, нужен ли уточняющий вопрос или «ок»."""
-    query = state["search_query"]
-    prompt = clarification_prompt.format(query=query)
-    gen = ask_giga(prompt, GIGACHAT_MODEL)
+async def asetup_node(state: MyState) -> MyState:
+    """Асинхронный вариант setup_node (без I/O)."""
+    return setup_node(state)
+
 
+def _clarify_update(state: MyState, gen: str) -> MyState:
     state_update = dict()
-    state_update["need_clarify_question"] = False if (len(gen) < 10 and "ок" in gen.lower()) else True
+    # «ок» распознаётся так же, как в самопроверке: спекулятивная ветка и маршрут графа согласованы
+    state_update["need_clarify_question"] = not _OK_RE.match(gen)
     state_update["messages"] = [("tool_clarify", gen)]
     state_update["clarification"] = gen
     state_update["clarification_cnt"] = state["clarification_cnt"] + 1
@@ -69,12 +119,77 @@ def clarify_node(state: MyState) -> MyState:
     return state_update
 
 
-def batch_clarify_node(state: MyState) -> MyState:
-    """Режим без диалога: LLM отвечает по существу с допущениями при недостатке данных."""
-    query = state["search_query"]
-    prompt = clarification_prompt_batch.format(query=query)
-    gen = ask_giga(prompt, GIGACHAT_MODEL)
+def _local_clarify(state: MyState) -> MyState | None:
+    """Обновление без вызова LLM, если предклассификатор уверен, что уточнение не нужно."""
+    gen = local_clarification(state["search_query"]) if PRECLASSIFY else None
+    return _clarify_update(state, gen) if gen else None
+
+
+def _with_speculation(state: MyState, update: MyState, spec: Dict[str, Any] | None) -> MyState:
+    """Добавляет результат спекулятивной ветки, если граф пойдёт к переформулировке этого же запроса."""
+    used = spec is not None and check_need_human({**state, **update}) == "переформулировка"
+    record("speculation", hit=used)
+    if used:
+        update["speculation"] = spec
+        if state["verbose"]:
+            print("clarify_node: спекулятивный поиск использован:", spec["search_query"])
+    return update
 
+
+def clarify_node(state: MyState) -> MyState:
+    """Проверяет достаточность контекста: LLM решает, нужен ли уточняющий вопрос или «ок».
+
+    При PRAVO_PRECLASSIFY=1 уверенное «ок» локального предклассификатора заменяет вызов LLM.
+    При PRAVO_SPECULATIVE=1 одновременно с проверкой выполняются переформулировка и поиск (_speculate);
+    если нужно уточнение, ветка отменяется и не выполняет оставшиеся вызовы.
+    """
+    local = _local_clarify(state)
+    if local is not None:
+        return local
+    prompt = clarification_prompt.format(query=state["search_query"])
+    if not SPECULATIVE:
+        return _clarify_update(state, ask_giga(prompt, GIGACHAT_MODEL, node="clarify_node"))
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pravo-speculative")
+    future: Future = executor.submit(propagate(_speculate), state["search_query"], cancelled)
+    try:
+        update = _clarify_update(state, ask_giga(prompt, GIGACHAT_MODEL, node="clarify_node"))
+        spec = None
+        if check_need_human({**state, **update}) == "переформулировка":
+            try:
+                spec = future.result()
+            except Exception as e:
+                print(f"Спекулятивный поиск не выполнен: {e}")
+        return _with_speculation(state, update, spec)
+    finally:
+        # Ненужная ветка не ожидается: она пропускает оставшиеся шаги, результат отбрасывается
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def aclarify_node(state: MyState) -> MyState:
+    """Асинхронный вариант clarify_node: спекулятивная ветка — задача asyncio, отменяется, если не нужна."""
+    local = _local_clarify(state)
+    if local is not None:
+        return local
+    prompt = clarification_prompt.format(query=state["search_query"])
+    if not SPECULATIVE:
+        return _clarify_update(state, await aask_giga(prompt, GIGACHAT_MODEL, node="clarify_node"))
+    task = asyncio.create_task(_aspeculate(state["search_query"]))
+    try:
+        update = _clarify_update(state, await aask_giga(prompt, GIGACHAT_MODEL, node="clarify_node"))
+        spec = None
+        if check_need_human({**state, **update}) == "переформулировка":
+            try:
+                spec = await task
+            except Exception as e:
+                print(f"Спекулятивный поиск не выполнен: {e}")
+        return _with_speculation(state, update, spec)
+    finally:
+        task.cancel()
+
+
+def _batch_clarify_update(state: MyState, gen: str) -> MyState:
     message = ("tool_batch_clarify", gen)
 
     state_update = dict()
@@ -88,11 +203,19 @@ def batch_clarify_node(state: MyState) -> MyState:
     return state_update
 
 
-def human_clarify_node(state: MyState) -> MyState:
-    """Получает ответ пользователя на уточнение: input() или interrupt() для LangGraph."""
-    use_input = os.getenv("PRAVO_USE_INPUT", "0") == "1"
-    value = ask_human(state["clarification"]) if use_input else interrupt(state["clarification"])
+def batch_clarify_node(state: MyState) -> MyState:
+    """Режим без диалога: LLM отвечает по существу с допущениями при недостатке данных."""
+    prompt = clarification_prompt_batch.format(query=state["search_query"])
+    return _batch_clarify_update(state, ask_giga(prompt, GIGACHAT_MODEL, node="batch_clarify_node"))
+
+
+async def abatch_clarify_node(state: MyState) -> MyState:
+    """Асинхронный вариант batch_clarify_node."""
+    prompt = clarification_prompt_batch.format(query=state["search_query"])
+    return _batch_clarify_update(state, await aask_giga(prompt, GIGACHAT_MODEL, node="batch_clarify_node"))
+
 
+def _human_clarify_update(state: MyState, value: str) -> MyState:
     message = ("user", value)
 
     state_update = dict()
@@ -105,12 +228,24 @@ def human_clarify_node(state: MyState) -> MyState:
     return state_update
 
 
-def query_concat_node(state: MyState) -> MyState:
-    """Объединяет диалог в один поисковый запрос с учётом всех реплик пользователя."""
-    dialog = format_dialog(state["messages"])
-    prompt = query_concat_prompt.format(dialog=dialog)
-    gen = ask_giga(prompt, GIGACHAT_MODEL)
+def human_clarify_node(state: MyState) -> MyState:
+    """Получает ответ пользователя на уточнение: input() или interrupt() для LangGraph."""
+    use_input = os.getenv("PRAVO_USE_INPUT", "0") == "1"
+    value = ask_human(state["clarification"]) if use_input else interrupt(state["clarification"])
+    return _human_clarify_update(state, value)
+
+
+async def ahuman_clarify_node(state: MyState) -> MyState:
+    """Асинхронный вариант human_clarify_node: input() выполняется в отдельном потоке."""
+    use_input = os.getenv("PRAVO_USE_INPUT", "0") == "1"
+    if use_input:
+        value = await asyncio.to_thread(ask_human, state["clarification"])
+    else:
+        value = interrupt(state["clarification"])
+    return _human_clarify_update(state, value)
 
+
+def _query_concat_update(state: MyState, gen: str) -> MyState:
     message = ("tool_concat", gen)
 
     state_update = dict()
@@ -123,35 +258,120 @@ def query_concat_node(state: MyState) -> MyState:
     return state_update
 
 
-def rewrite_node(state: MyState) -> MyState:
-    """Переформулирует запрос в краткую юридическую поисковую фразу."""
-    query = state["search_query"]
-    prompt = query_rewrite_prompt.format(query=query)
-    rewritten = ask_giga(prompt, GIGACHAT_MODEL)
+def _dialog(state: MyState) -> str:
+    return format_dialog(state["messages"], state.get("docs") or [], state.get("answers") or [])
+
+
+def query_concat_node(state: MyState) -> MyState:
+    """Объединяет диалог в один поисковый запрос с учётом всех реплик пользователя."""
+    prompt = query_concat_prompt.format(dialog=_dialog(state))
+    return _query_concat_update(state, ask_giga(prompt, GIGACHAT_MODEL, node="query_concat_node"))
+
+
+async def aquery_concat_node(state: MyState) -> MyState:
+    """Асинхронный вариант query_concat_node."""
+    prompt = query_concat_prompt.format(dialog=_dialog(state))
+    return _query_concat_update(state, await aask_giga(prompt, GIGACHAT_MODEL, node="query_concat_node"))
+
+
+def _json_object(gen: str, fields: set) -> Dict[str, Any] | None:
+    """Строгий разбор JSON-ответа LLM: объект ровно с полями fields, иначе None."""
+    try:
+        data = json.loads(_JSON_FENCE_RE.sub("", gen.strip()))
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or set(data) != fields:
+        return None
+    return data
+
+
+def _category(value: Any) -> str | None:
+    """Нормализованная категория («НПА» / «Судебное») или None, если значение недопустимо."""
+    return CATEGORIES.get(value.strip().lower()) if isinstance(value, str) else None
 
+
+def _parse_rewrite_classify(gen: str) -> Tuple[str, str] | None:
+    """(поисковая фраза, категория) из ответа на query_rewrite_classify_prompt; None — ответ не по формату."""
+    data = _json_object(gen, {"search_query", "category"})
+    if data is None or not isinstance(data["search_query"], str) or not data["search_query"].strip():
+        return None
+    category = _category(data["category"])
+    return (data["search_query"].strip(), category) if category else None
+
+
+def _rewrite_update(state: MyState, rewritten: str, category: str | None = None) -> MyState:
     message = ("tool_rewrite", rewritten)
 
     state_update = dict()
     state_update["search_query"] = rewritten
     state_update["messages"] = [message]
+    # Категория, полученная вместе с фразой, избавляет classify_node от отдельного вызова
+    state_update["category"] = category
+    state_update["category_query"] = rewritten if category else None
+    if category:
+        state_update["messages"].append(("tool_classify", category))
 
     if state["verbose"]:
-        print("rewrite_node:", message)
+        print("rewrite_node:", message, category)
 
     return state_update
 
 
-def classify_node(state: MyState) -> MyState:
-    """Классифицирует запрос: «НПА» или «Судебное» для выбора типа поиска."""
-    query = state["search_query"]
-    prompt = classification_prompt.format(query=query)
-    category = ask_giga(prompt, GIGACHAT_MODEL)
+def _rewrite(query: str) -> Tuple[str, str | None]:
+    """(поисковая фраза, категория или None): JSON-вызов при PRAVO_REWRITE_CLASSIFY=1, иначе обычный."""
+    if REWRITE_CLASSIFY:
+        prompt = query_rewrite_classify_prompt.format(query=query)
+        parsed = _parse_rewrite_classify(ask_giga(prompt, GIGACHAT_MODEL, node="rewrite_node"))
+        if parsed:
+            return parsed
+    prompt = query_rewrite_prompt.format(query=query)
+    return ask_giga(prompt, GIGACHAT_MODEL, node="rewrite_node"), None
+
+
+async def _arewrite(query: str) -> Tuple[str, str | None]:
+    """Асинхронный вариант _rewrite."""
+    if REWRITE_CLASSIFY:
+        prompt = query_rewrite_classify_prompt.format(query=query)
+        parsed = _parse_rewrite_classify(await aask_giga(prompt, GIGACHAT_MODEL, node="rewrite_node"))
+        if parsed:
+            return parsed
+    prompt = query_rewrite_prompt.format(query=query)
+    return await aask_giga(prompt, GIGACHAT_MODEL, node="rewrite_node"), None
 
-    message = ("tool_classify", category)
 
+def _speculative_rewrite(state: MyState) -> MyState | None:
+    """Обновление из спекулятивной ветки clarify_node, если она выполнена для текущей search_query."""
+    spec = state.get("speculation")
+    if not spec or spec["query"] != state["search_query"]:
+        return None
+    return _rewrite_update(state, spec["search_query"], spec["category"])
+
+
+def rewrite_node(state: MyState) -> MyState:
+    """Переформулирует запрос в краткую юридическую поисковую фразу.
+
+    При PRAVO_REWRITE_CLASSIFY=1 одним вызовом получает и категорию запроса (JSON);
+    если ответ не разобран, выполняется обычная переформулировка, а категорию определит classify_node.
+    """
+    speculative = _speculative_rewrite(state)
+    if speculative is not None:
+        return speculative
+    return _rewrite_update(state, *_rewrite(state["search_query"]))
+
+
+async def arewrite_node(state: MyState) -> MyState:
+    """Асинхронный вариант rewrite_node."""
+    speculative = _speculative_rewrite(state)
+    if speculative is not None:
+        return speculative
+    return _rewrite_update(state, *await _arewrite(state["search_query"]))
+
+
+def _classify_update(state: MyState, category: str | None) -> MyState:
     state_update = dict()
     state_update["category"] = category
-    state_update["messages"] = [message]
+    state_update["category_query"] = state["search_query"] if category else None
+    state_update["messages"] = [("tool_classify", category)] if category else []
     state_update["docs"] = []
 
     if state["verbose"]:
@@ -160,60 +380,214 @@ def classify_node(state: MyState) -> MyState:
     return state_update
 
 
-def search_npa_node(state: MyState) -> MyState:
-    """Поиск по нормативно-правовым актам (КонсультантПлюс/DDGS или Garant API)."""
-    results = call_npa_api(state["search_query"])
+def _skip_classification() -> bool:
+    """В режиме parallel без взвешивания категория не нужна: оба поиска выполняются всегда."""
+    return SEARCH_MODE == "parallel" and not CLASSIFY_WEIGHTING
 
+
+def _known_category(state: MyState) -> MyState | None:
+    """Обновление без вызова LLM: категория уже получена для текущей search_query
+    или (при PRAVO_PRECLASSIFY=1) уверенно определена локальными правилами."""
+    if state.get("category") and state.get("category_query") == state["search_query"]:
+        if state["verbose"]:
+            print("classify_node:", state["category"], "(без вызова LLM)")
+        return {"docs": []}
+    category = local_category(state["search_query"]) if PRECLASSIFY else None
+    return _classify_update(state, category) if category else None
+
+
+def classify_node(state: MyState) -> MyState:
+    """Классифицирует запрос: «НПА» или «Судебное» для выбора типа поиска."""
+    if _skip_classification():
+        return _classify_update(state, None)
+    known = _known_category(state)
+    if known is not None:
+        return known
+    prompt = classification_prompt.format(query=state["search_query"])
+    return _classify_update(state, ask_giga(prompt, GIGACHAT_MODEL, node="classify_node"))
+
+
+async def aclassify_node(state: MyState) -> MyState:
+    """Асинхронный вариант classify_node."""
+    if _skip_classification():
+        return _classify_update(state, None)
+    known = _known_category(state)
+    if known is not None:
+        return known
+    prompt = classification_prompt.format(query=state["search_query"])
+    return _classify_update(state, await aask_giga(prompt, GIGACHAT_MODEL, node="classify_node"))
+
+
+def _max_results(state: MyState, court: bool) -> int | None:
+    """Число результатов ветки поиска в режиме parallel со взвешиванием по категории.
+
+    Ветка, совпадающая с категорией, получает SEARCH_RESULTS документов, вторая —
+    SEARCH_RESULTS_SECONDARY. None — значение по умолчанию провайдера.
+    """
+    category = (state.get("category") or "").lower()
+    if SEARCH_MODE != "parallel" or not category:
+        return None
+    primary = ("суд" in category) == court
+    return SEARCH_RESULTS if primary else SEARCH_RESULTS_SECONDARY
+
+
+def _search_update(state: MyState, results: List[Doc], role: str, node_name: str) -> MyState:
     message_text = format_links(results)
-    message = ("result_search_npa", message_text)
+    # В историю — ссылка на документы поля docs, а не список ссылок целиком
+    message = (role, docs_ref(results))
 
     state_update = dict()
+    # Редуктор merge_docs добавит только документы, которых ещё нет в docs
     state_update["docs"] = results
+    state_update["retrieved_total"] = len(results)
     state_update["messages"] = [message]
 
     if state["verbose"]:
-        print("search_npa_node:", message_text)
+        print(f"{node_name}:", message_text)
 
     return state_update
 
 
-def search_court_node(state: MyState) -> MyState:
-    """Поиск судебной практики (reputation.su или web-поиск при Garant)."""
-    results = call_court_api(state["search_query"])
+def _speculative_docs(state: MyState, kind: str) -> List[Doc] | None:
+    """Документы спекулятивного поиска kind ("npa" / "court") для текущей search_query; None — поиска не было."""
+    spec = state.get("speculation")
+    if not spec or spec["search_query"] != state["search_query"]:
+        return None
+    return spec["docs"].get(kind)
 
-    message_text = format_links(results)
-    message = ("result_search_court", message_text)
 
-    state_update = dict()
-    state_update["docs"] = results
-    state_update["messages"] = [message]
+def search_npa_node(state: MyState) -> MyState:
+    """Поиск по нормативно-правовым актам (КонсультантПлюс/DDGS или Garant API)."""
+    results = _speculative_docs(state, "npa")
+    if results is None:
+        with session_documents(state.get("docs") or []):
+            results = call_npa_api(state["search_query"], _max_results(state, court=False))
+    return _search_update(state, results, "result_search_npa", "search_npa_node")
 
-    if state["verbose"]:
-        print("search_court_node:", message_text)
 
-    return state_update
+async def asearch_npa_node(state: MyState) -> MyState:
+    """Асинхронный вариант search_npa_node."""
+    results = _speculative_docs(state, "npa")
+    if results is None:
+        with session_documents(state.get("docs") or []):
+            results = await acall_npa_api(state["search_query"], _max_results(state, court=False))
+    return _search_update(state, results, "result_search_npa", "search_npa_node")
 
 
-def answer_node(state: MyState) -> MyState:
-    """Генерирует черновой RAG-ответ по документам или сообщение об отсутствии результатов."""
-    query = state["search_query"]
+def search_court_node(state: MyState) -> MyState:
+    """Поиск судебной практики (reputation.su или web-поиск при Garant)."""
+    results = _speculative_docs(state, "court")
+    if results is None:
+        with session_documents(state.get("docs") or []):
+            results = call_court_api(state["search_query"], _max_results(state, court=True))
+    return _search_update(state, results, "result_search_court", "search_court_node")
+
+
+async def asearch_court_node(state: MyState) -> MyState:
+    """Асинхронный вариант search_court_node."""
+    results = _speculative_docs(state, "court")
+    if results is None:
+        with session_documents(state.get("docs") or []):
+            results = await acall_court_api(state["search_query"], _max_results(state, court=True))
+    return _search_update(state, results, "result_search_court", "search_court_node")
+
+
+def _speculative_kinds(category: str | None) -> List[str]:
+    """Поиски, которые выполнит граф при данной категории (как check_search_type)."""
+    if SEARCH_MODE == "parallel":
+        return ["npa", "court"]
+    category = (category or "").lower()
+    return ["court"] if "суд" in category and "нпа" not in category else ["npa"]
+
+
+def _speculate(query: str, cancelled: threading.Event | None = None) -> Dict[str, Any] | None:
+    """Спекулятивная ветка clarify_node: переформулировка, классификация и поиск так, как их выполнит граф,
+    если уточнение не понадобится. Результат — поле состояния speculation.
+
+    cancelled проверяется перед каждым шагом: после отмены (понадобилось уточнение) оставшиеся
+    вызовы GigaChat и поиска не начинаются, результат — None. Уже начатый вызов в потоке
+    прервать нельзя — он завершается, и его результат отбрасывается.
+    """
+    cancelled = cancelled or threading.Event()
+    if cancelled.is_set():
+        return None
+    search_query, category = _rewrite(query)
+    if cancelled.is_set():
+        return None
+    if category is None and not _skip_classification():
+        category = local_category(search_query) if PRECLASSIFY else None
+        if category is None:
+            prompt = classification_prompt.format(query=search_query)
+            category = ask_giga(prompt, GIGACHAT_MODEL, node="classify_node")
+    if cancelled.is_set():
+        return None
+    scope = {"category": category}
+    apis = {"npa": call_npa_api, "court": call_court_api}
+    kinds = _speculative_kinds(category)
+    with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+        futures = {
+            kind: pool.submit(propagate(apis[kind]), search_query, _max_results(scope, court=kind == "court"))
+            for kind in kinds
+        }
+        docs = {kind: future.result() for kind, future in futures.items()}
+    return {"query": query, "search_query": search_query, "category": category, "docs": docs}
+
+
+async def _aspeculate(query: str) -> Dict[str, Any]:
+    """Асинхронный вариант _speculate."""
+    search_query, category = await _arewrite(query)
+    if category is None and not _skip_classification():
+        category = local_category(search_query) if PRECLASSIFY else None
+        if category is None:
+            prompt = classification_prompt.format(query=search_query)
+            category = await aask_giga(prompt, GIGACHAT_MODEL, node="classify_node")
+    scope = {"category": category}
+    apis = {"npa": acall_npa_api, "court": acall_court_api}
+    kinds = _speculative_kinds(category)
+    results = await asyncio.gather(
+        *(apis[kind](search_query, _max_results(scope, court=kind == "court")) for kind in kinds)
+    )
+    return {"query": query, "search_query": search_query, "category": category, "docs": dict(zip(kinds, results))}
+
+
+def _token_writer(node: str) -> TokenCallback | None:
+    """Передаёт фрагменты ответа LLM в поток графа (stream_mode="custom") как {"node", "token"}.
+
+    None — узел вызван вне графа, потоковый вывод некуда отдавать.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+    return lambda token: writer({"node": node, "token": token})
+
+
+def _answer_prompt(state: MyState) -> str | None:
+    """RAG-промпт по найденным документам; None — документов нет."""
     docs = state.get("docs", [])
     if not docs:
-        answer = "Извините, по вашему запросу не удалось найти подходящие документы."
-    else:
-        prompt = rag_prompt_only_link.format(query=query, docs=format_docs(docs))
-        answer = ask_giga(prompt, GIGACHAT_MODEL)
+        return None
+    query = state["search_query"]
+    return rag_prompt_only_link.format(query=query, docs=pack_docs(docs, query, CONTEXT_TOKENS))
+
 
+def _answer_update(state: MyState, answer: str) -> MyState:
     answer_data = {
-        "title": query,
+        "title": state["search_query"],
         "doc_text": answer,
+        # Число документов (после дедупликации) и результатов поиска (до неё) на момент ответа:
+        # границы цикла поиска для re_search.new_source_share
+        "docs_count": len(state.get("docs") or []),
+        "retrieved_total": state.get("retrieved_total") or 0,
     }
 
-    message = ("tool_rag", answer)
+    message = ("tool_rag", answer_ref(len(state.get("answers") or [])))
 
     state_update = dict()
     state_update["answers"] = [answer_data]
     state_update["messages"] = [message]
+    # Спекулятивный результат относится только к первому поиску
+    state_update["speculation"] = None
 
     if state["verbose"]:
         print("answer_node:", answer)
@@ -221,18 +595,82 @@ def answer_node(state: MyState) -> MyState:
     return state_update
 
 
-def reflect_node(state: MyState) -> MyState:
-    """Самопроверка: LLM оценивает полноту ответа и решает — «ок» или новый поисковый запрос."""
-    answer = state["answers"][-1]
-    prompt = reflection_prompt.format(query=state["search_query"], response=answer["doc_text"])
-    gen = ask_giga(prompt, GIGACHAT_MODEL)
+def answer_node(state: MyState) -> MyState:
+    """Генерирует черновой RAG-ответ по документам или сообщение об отсутствии результатов."""
+    prompt = _answer_prompt(state)
+    if prompt:
+        on_token = _token_writer("answer_node")
+        answer = stream_giga(prompt, GIGACHAT_MODEL, node="answer_node", on_token=on_token)
+    else:
+        answer = NO_DOCS_ANSWER
+    return _answer_update(state, answer)
 
+
+async def aanswer_node(state: MyState) -> MyState:
+    """Асинхронный вариант answer_node."""
+    prompt = _answer_prompt(state)
+    if prompt:
+        on_token = _token_writer("answer_node")
+        answer = await astream_giga(prompt, GIGACHAT_MODEL, node="answer_node", on_token=on_token)
+    else:
+        answer = NO_DOCS_ANSWER
+    return _answer_update(state, answer)
+
+
+def _reflect_prompt(state: MyState, template=reflection_prompt) -> str:
+    answer = state["answers"][-1]
+    return template.format(query=state["search_query"], response=answer["doc_text"])
+
+
+def _parse_reflection(gen: str) -> Tuple[str | None, str | None] | None:
+    """(новая поисковая фраза, её категория) из ответа на reflection_classify_prompt.
+
+    (None, None) — вердикт «ок»; None — ответ не по формату.
+    """
+    data = _json_object(gen, {"verdict", "search_query", "category"})
+    if data is None or not isinstance(data["verdict"], str):
+        return None
+    verdict = data["verdict"].strip().lower()
+    if verdict == "ок":
+        return None, None
+    query, category = data["search_query"], _category(data["category"])
+    if verdict != "поиск" or not isinstance(query, str) or not query.strip() or not category:
+        return None
+    return query.strip(), category
+
+
+def _reflect_update(
+    state: MyState,
+    gen: str,
+    parsed: Tuple[str | None, str | None] | None = None,
+    reason: str | None = None,
+) -> MyState:
+    """gen — ответ на reflection_prompt; parsed — разобранный ответ на reflection_classify_prompt;
+    reason — причина не начинать цикл, найденная до вызова LLM (re_search.stop_reason)."""
+    category = None
+    if reason is not None:
+        new_query = None
+    elif parsed is None:
+        new_query = None if _OK_RE.match(gen) else gen.strip()
+    else:
+        new_query, category = parsed
+    if new_query is not None:
+        reason = query_stop_reason(state, new_query)
+        if reason is not None:
+            new_query = None
+    need_re_search = new_query is not None
+    record_decision(need_re_search, reason or "verdict")
+    gen = new_query or (f"ок ({reason})" if reason else "ок")
     message = ("tool_reflect", gen)
 
     state_update = dict()
-    state_update["need_re_search"] = False if (len(gen) < 10 and "ок" in gen.lower()) else True
-    if state_update["need_re_search"]:
-        state_update["search_query"] = gen
+    state_update["need_re_search"] = need_re_search
+    if need_re_search:
+        state_update["search_query"] = new_query
+        if category:
+            # Категория новой фразы уже известна — classify_node не вызывает LLM
+            state_update["category"] = category
+            state_update["category_query"] = new_query
 
     state_update["messages"] = [message]
     state_update["re_search_cnt"] = state["re_search_cnt"] + 1
@@ -243,23 +681,61 @@ def reflect_node(state: MyState) -> MyState:
     return state_update
 
 
-def final_answer_node(state: MyState) -> MyState:
-    """Формирует итоговый ответ: один черновик или синтез нескольких через final_answer_prompt."""
+def reflect_node(state: MyState) -> MyState:
+    """Самопроверка: LLM оценивает полноту ответа и решает — «ок» или новый поисковый запрос.
+
+    При PRAVO_REWRITE_CLASSIFY=1 новый запрос возвращается вместе с категорией (JSON);
+    если ответ не разобран, выполняется обычная самопроверка. Если новый цикл не может
+    дать новых источников или выходит за бюджет (см. re_search), LLM не вызывается.
+    """
+    reason = stop_reason(state)
+    if reason is not None:
+        return _reflect_update(state, "", reason=reason)
+    if REWRITE_CLASSIFY:
+        prompt = _reflect_prompt(state, reflection_classify_prompt)
+        parsed = _parse_reflection(ask_giga(prompt, GIGACHAT_MODEL, node="reflect_node"))
+        if parsed:
+            return _reflect_update(state, "", parsed)
+    return _reflect_update(state, ask_giga(_reflect_prompt(state), GIGACHAT_MODEL, node="reflect_node"))
+
+
+async def areflect_node(state: MyState) -> MyState:
+    """Асинхронный вариант reflect_node."""
+    reason = stop_reason(state)
+    if reason is not None:
+        return _reflect_update(state, "", reason=reason)
+    if REWRITE_CLASSIFY:
+        prompt = _reflect_prompt(state, reflection_classify_prompt)
+        parsed = _parse_reflection(await aask_giga(prompt, GIGACHAT_MODEL, node="reflect_node"))
+        if parsed:
+            return _reflect_update(state, "", parsed)
+    return _reflect_update(state, await aask_giga(_reflect_prompt(state), GIGACHAT_MODEL, node="reflect_node"))
+
+
+def _final_answer_prompt(state: MyState) -> Tuple[str | None, str | None]:
+    """(готовый ответ, промпт): без LLM при 0–1 черновике, иначе — промпт синтеза.
+
+    Синтез строится по источникам — дедуплицированному объединению docs всех циклов, а не по
+    пересказам черновиков; пассажи ранжируются по вопросу и поисковым фразам всех циклов.
+    """
+    answers = state["answers"]
+    if not answers:
+        return NO_DOCS_ANSWER, None
+    if len(answers) == 1:
+        return answers[0]["doc_text"], None
     query = state["query"]
-    docs = state["answers"]
-    if not docs:
-        answer = "Извините, по вашему запросу не удалось найти подходящие документы."
-    elif len(docs) == 1:
-        answer = docs[0]["doc_text"]
-    else:
-        prompt = final_answer_prompt.format(query=query, docs=format_docs(docs))
-        answer = ask_giga(prompt, GIGACHAT_MODEL)
+    docs = state.get("docs") or answers
+    ranking_query = " ".join([query] + [answer["title"] for answer in answers])
+    return None, final_answer_prompt.format(query=query, docs=pack_docs(docs, ranking_query, CONTEXT_TOKENS))
 
+
+def _final_answer_update(state: MyState, answer: str) -> MyState:
     message = ("tool_final_answer", answer)
 
     state_update = dict()
     state_update["final_answer"] = answer
     state_update["messages"] = [message]
+    state_update["metrics_summary"] = run_summary(state.get("metrics") or [])
 
     if state["verbose"]:
         print("answer_node:", answer)
@@ -267,3 +743,19 @@ def final_answer_node(state: MyState) -> MyState:
     return state_update
 
 
+def final_answer_node(state: MyState) -> MyState:
+    """Формирует итоговый ответ: один черновик или синтез нескольких через final_answer_prompt."""
+    answer, prompt = _final_answer_prompt(state)
+    if prompt:
+        on_token = _token_writer("final_answer_node")
+        answer = stream_giga(prompt, GIGACHAT_MODEL, node="final_answer_node", on_token=on_token)
+    return _final_answer_update(state, answer)
+
+
+async def afinal_answer_node(state: MyState) -> MyState:
+    """Асинхронный вариант final_answer_node."""
+    answer, prompt = _final_answer_prompt(state)
+    if prompt:
+        on_token = _token_writer("final_answer_node")
+        answer = await astream_giga(prompt, GIGACHAT_MODEL, node="final_answer_node", on_token=on_token)
+    return _final_answer_update(state, answer)
@@ -0,0 +1,311 @@
+"""
+Локальный предклассификатор: решения clarify_node и classify_node без вызова GigaChat.
+
+- Категория запроса («НПА» / «Судебное») — набор правил: взвешенные регулярные
+  выражения для маркеров судебной практики и нормативных актов; перевес одной из
+  сторон переводится в уверенность логистической функцией.
+- Нужно ли уточнение — TF-IDF + логистическая регрессия (чистый Python), обученные
+  заранее на записях пакетной обработки (batch_08022026: поле «сгенерированный вопрос»
+  равно «ок» или содержит уточняющий вопрос) и сохранённые в PRAVO_PRECLASSIFY_MODEL.
+  Локально принимается только решение «ок»: сам уточняющий вопрос всё равно формулирует LLM.
+
+Порог модели уточнений калибруется при обучении по отложенным записям (кросс-валидация):
+наименьший порог, при котором нижняя граница доверительного интервала точности «ок»
+не ниже PRAVO_PRECLASSIFY_MIN_PRECISION. Если такого порога нет (на batch_08022026 модель
+почти не лучше доли «ок» в корпусе), модель решений не принимает и локально определяется
+только категория. Категория принимается при уверенности не ниже PRAVO_PRECLASSIFY_THRESHOLD;
+иначе узел вызывает GigaChat как обычно.
+
+    python -m pravo_app.preclassify           # оценка на корпусе
+    python -m pravo_app.preclassify --train   # обучение, калибровка и сохранение модели
+"""
+import argparse
+import glob
+import json
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+from .config import PRECLASSIFY_DATA, PRECLASSIFY_MIN_PRECISION, PRECLASSIFY_MODEL, PRECLASSIFY_THRESHOLD
+from .metrics import record
+from .text import tokenize
+
+# Ответ clarify_node, когда уточнение не требуется
+CLARIFY_OK = "ок"
+# Короткие запросы непохожи на обучающие (развёрнутые описания ситуаций) — их решает LLM
+MIN_TERMS = 8
+# Квантиль нормального распределения для нижней границы точности (односторонний, 95%)
+_Z = 1.645
+
+# Маркеры категорий: (регулярное выражение, вес)
+_COURT_RULES: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"судебн\w*\s+практик|практик\w*\s+суд"), 3.0),
+    (re.compile(r"прецедент"), 3.0),
+    (re.compile(r"пленум|обзор\w*\s+(судебн|практик)"), 3.0),
+    (re.compile(r"позици\w*\s+(суд|вс\b|верховн|конституцион)"), 3.0),
+    (re.compile(r"(решени|определени|постановлени)\w*\s+(суд|вс\b|верховн|арбитраж|апелляц|кассац)"), 2.5),
+    (re.compile(r"апелляц|кассац|арбитражн\w*\s+суд"), 2.0),
+    (re.compile(r"как\s+суды?\b|суды\s+(решают|толкуют|признают|взыскивают)"), 2.0),
+    (re.compile(r"дел[оау]?\s+№|по\s+делу"), 1.5),
+    (re.compile(r"\bсуд"), 0.5),
+]
+_NPA_RULES: List[Tuple[re.Pattern, float]] = [
+    (re.compile(r"\b(гк|жк|нк|тк|ук|апк|гпк|кас|коап|ск)\s+рф|\d+-фз|\bфз\b"), 3.0),
+    (re.compile(r"кодекс|федеральн\w*\s+закон|закон\w*\s+о\b"), 2.5),
+    (re.compile(r"постановлени\w*\s+правительств|приказ\w*\s+(мин|фнс|ростехнадзор)"), 2.5),
+    (re.compile(r"стать[яеиюь]\s*\d|\bст\.\s*\d|пункт\w*\s*\d|\bп\.\s*\d"), 2.0),
+    (re.compile(r"норматив|законодательств|санпин|снип|гост"), 2.0),
+    (re.compile(r"\bзакон|правил[аоуе]?\b|норм[аыу]?\b|требовани"), 1.0),
+    (re.compile(r"вычет|ставк\w*\s+налог|срок\w*\s+(подачи|уплаты|исковой|давност)"), 1.0),
+]
+
+
+class Decision(NamedTuple):
+    """Решение предклассификатора: метка и уверенность (0.5–1)."""
+
+    label: str
+    confidence: float
+
+
+def _sigmoid(value: float) -> float:
+    if value < -30:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-value))
+
+
+def _rule_score(text: str, rules: Sequence[Tuple[re.Pattern, float]]) -> float:
+    return sum(weight for pattern, weight in rules if pattern.search(text))
+
+
+def classify_category(query: str) -> Decision:
+    """«НПА» или «Судебное» по правилам; без маркеров — уверенность 0.5."""
+    text = query.lower()
+    p_court = _sigmoid(_rule_score(text, _COURT_RULES) - _rule_score(text, _NPA_RULES))
+    if p_court >= 0.5:
+        return Decision("Судебное", p_court)
+    return Decision("НПА", 1.0 - p_court)
+
+
+class ClarifyModel:
+    """TF-IDF + логистическая регрессия: вероятность того, что уточнение не требуется («ок»)."""
+
+    def __init__(self, epochs: int = 300, learning_rate: float = 2.0, l2: float = 0.001) -> None:
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.idf: Dict[str, float] = {}
+        self.weights: Dict[str, float] = {}
+        self.bias = 0.0
+        # Откалиброванный порог «ок»; None — модель не достигает требуемой точности
+        self.threshold: float | None = None
+
+    def _vector(self, text: str) -> Dict[str, float]:
+        counts = Counter(term for term in tokenize(text) if term in self.idf)
+        vector = {term: count * self.idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {term: value / norm for term, value in vector.items()}
+
+    def fit(self, texts: Sequence[str], labels: Sequence[int]) -> "ClarifyModel":
+        """Обучение пакетным градиентным спуском; labels — 1 для «ок», 0 для уточнения."""
+        documents = [set(tokenize(text)) for text in texts]
+        df = Counter(term for terms in documents for term in terms)
+        n = len(documents)
+        self.idf = {term: math.log((1 + n) / (1 + count)) + 1.0 for term, count in df.items()}
+        vectors = [self._vector(text) for text in texts]
+        positive = sum(labels) / n if n else 0.5
+        self.bias = math.log(positive / (1 - positive)) if 0 < positive < 1 else 0.0
+        self.weights = {}
+        for _ in range(self.epochs):
+            gradient: Dict[str, float] = {}
+            bias_gradient = 0.0
+            for vector, label in zip(vectors, labels):
+                error = self._predict(vector) - label
+                bias_gradient += error
+                for term, value in vector.items():
+                    gradient[term] = gradient.get(term, 0.0) + error * value
+            for term, value in gradient.items():
+                weight = self.weights.get(term, 0.0)
+                self.weights[term] = weight - self.learning_rate * (value / n + self.l2 * weight)
+            self.bias -= self.learning_rate * bias_gradient / n
+        return self
+
+    def _predict(self, vector: Dict[str, float]) -> float:
+        return _sigmoid(self.bias + sum(self.weights.get(term, 0.0) * value for term, value in vector.items()))
+
+    def predict(self, text: str) -> float:
+        """Вероятность «ок» для текста запроса."""
+        return self._predict(self._vector(text))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"idf": self.idf, "weights": self.weights, "bias": self.bias, "threshold": self.threshold}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClarifyModel":
+        model = cls()
+        model.idf, model.weights, model.bias = data["idf"], data["weights"], data["bias"]
+        model.threshold = data.get("threshold")
+        return model
+
+
+def load_examples(mask: str = PRECLASSIFY_DATA) -> Tuple[List[str], List[int]]:
+    """(запросы, метки) из записей пакетной обработки: 1 — «ок», 0 — был задан уточняющий вопрос."""
+    texts, labels = [], []
+    for path in sorted(glob.glob(mask)):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for item in data if isinstance(data, list) else [data]:
+            question = (item.get("сгенерированный вопрос") or "").strip()
+            if not item.get("запрос") or not question:
+                continue
+            texts.append(item["запрос"])
+            labels.append(1 if question.lower().strip(' ."«»') == CLARIFY_OK else 0)
+    return texts, labels
+
+
+def cross_val_scores(texts: Sequence[str], labels: Sequence[int], folds: int = 5) -> List[Tuple[float, int]]:
+    """(вероятность «ок», метка) для каждой записи от модели, обученной без неё."""
+    scores: List[Tuple[float, int]] = []
+    for fold in range(folds):
+        train = [i for i in range(len(texts)) if i % folds != fold]
+        model = ClarifyModel().fit([texts[i] for i in train], [labels[i] for i in train])
+        for i in range(fold, len(texts), folds):
+            p_ok = model.predict(texts[i]) if len(tokenize(texts[i])) >= MIN_TERMS else 0.0
+            scores.append((p_ok, labels[i]))
+    return scores
+
+
+def precision_lower_bound(correct: int, total: int) -> float:
+    """Нижняя граница интервала Уилсона для доли correct из total."""
+    if total == 0:
+        return 0.0
+    share = correct / total
+    centre = share + _Z * _Z / (2 * total)
+    spread = _Z * math.sqrt(share * (1 - share) / total + _Z * _Z / (4 * total * total))
+    return (centre - spread) / (1 + _Z * _Z / total)
+
+
+def calibrate(scores: Sequence[Tuple[float, int]], min_precision: float = PRECLASSIFY_MIN_PRECISION) -> float | None:
+    """Наименьший порог «ок», при котором нижняя граница точности на отложенных записях не ниже min_precision."""
+    for threshold in sorted({p_ok for p_ok, _ in scores if p_ok >= 0.5}):
+        decided = [label for p_ok, label in scores if p_ok >= threshold]
+        if precision_lower_bound(sum(decided), len(decided)) >= min_precision:
+            return round(threshold, 4)
+    return None
+
+
+def train(mask: str = PRECLASSIFY_DATA, min_precision: float = PRECLASSIFY_MIN_PRECISION) -> ClarifyModel | None:
+    """Модель по всем записям с порогом, откалиброванным кросс-валидацией; None — нет записей обоих классов."""
+    texts, labels = load_examples(mask)
+    if not 0 < sum(labels) < len(labels):
+        return None
+    model = ClarifyModel().fit(texts, labels)
+    model.threshold = calibrate(cross_val_scores(texts, labels), min_precision)
+    return model
+
+
+def save_model(model: ClarifyModel, path: str = PRECLASSIFY_MODEL) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model.to_dict(), f, ensure_ascii=False, sort_keys=True)
+
+
+def load_model(path: str = PRECLASSIFY_MODEL) -> ClarifyModel | None:
+    """Сохранённая модель; None — файла нет или он повреждён."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return ClarifyModel.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Модель уточнений не загружена ({path}): {e}")
+        return None
+
+
+_model: ClarifyModel | None = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def _clarify_model() -> ClarifyModel | None:
+    """Модель уточнений из PRAVO_PRECLASSIFY_MODEL, прочитанная при первом обращении (без обучения)."""
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model = load_model()
+            _model_loaded = True
+        return _model
+
+
+def classify_clarification(query: str) -> Decision:
+    """«ок» или «уточнение»; короткие запросы и отсутствие модели — уверенность 0.5."""
+    model = _clarify_model()
+    if model is None or len(tokenize(query)) < MIN_TERMS:
+        return Decision("уточнение", 0.5)
+    p_ok = model.predict(query)
+    if p_ok >= 0.5:
+        return Decision(CLARIFY_OK, p_ok)
+    return Decision("уточнение", 1.0 - p_ok)
+
+
+def _confident(name: str, decision: Decision, threshold: float) -> bool:
+    hit = decision.confidence >= threshold
+    record("preclassify", name=name, label=decision.label, confidence=round(decision.confidence, 3), hit=hit)
+    return hit
+
+
+def local_category(query: str, threshold: float = PRECLASSIFY_THRESHOLD) -> str | None:
+    """Категория без вызова LLM или None, если правила не уверены."""
+    decision = classify_category(query)
+    return decision.label if _confident("classify", decision, threshold) else None
+
+
+def local_clarification(query: str, threshold: float | None = None) -> str | None:
+    """«ок», если модель уверена, что уточнение не нужно; иначе None — решает LLM.
+
+    threshold по умолчанию — откалиброванный порог модели; у модели без порога решений нет.
+    """
+    model = _clarify_model()
+    threshold = threshold if threshold is not None else model and model.threshold
+    if threshold is None:
+        return None
+    decision = classify_clarification(query)
+    if decision.label != CLARIFY_OK:
+        return None
+    return CLARIFY_OK if _confident("clarify", decision, threshold) else None
+
+
+def _evaluate(folds: int = 5) -> None:
+    """Кросс-валидация модели уточнений: доля решённых локально и их точность по порогам."""
+    texts, labels = load_examples()
+    if not texts:
+        print(f"Нет размеченных записей: {PRECLASSIFY_DATA}")
+        return
+    scores = cross_val_scores(texts, labels, folds)
+    print(f"Записей: {len(texts)}, «ок»: {sum(labels)} (доля {sum(labels) / len(labels):.3f})")
+    for threshold in (0.8, 0.85, 0.9, 0.95):
+        decided = [label for p_ok, label in scores if p_ok >= threshold]
+        precision = sum(decided) / len(decided) if decided else 0.0
+        lower = precision_lower_bound(sum(decided), len(decided))
+        print(
+            f"  порог {threshold}: локально {len(decided)}/{len(scores)}, "
+            f"точность «ок» {precision:.3f} (нижняя граница {lower:.3f})"
+        )
+    print(f"Откалиброванный порог при точности {PRECLASSIFY_MIN_PRECISION}: {calibrate(scores)}")
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Оценка и обучение модели уточнений предклассификатора")
+    parser.add_argument("--train", action="store_true", help=f"обучить и сохранить модель в {PRECLASSIFY_MODEL}")
+    args = parser.parse_args(argv)
+    if not args.train:
+        _evaluate()
+        return
+    model = train()
+    if model is None:
+        print(f"Нет размеченных записей обоих классов: {PRECLASSIFY_DATA}")
+        return
+    save_model(model)
+    print(f"Модель сохранена: {PRECLASSIFY_MODEL}, порог {model.threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -85,6 +85,35 @@ query_rewrite_prompt = PromptTemplate.from_template(
 Поисковая фраза:"""
 )
 
+# Переформулировка и классификация за один вызов: поисковая фраза и категория в JSON.
+#
+# Тип: переписывание запроса + классификация (structured output).
+# Техника: инструкции из query_rewrite_prompt и classification_prompt, строгий JSON-формат ответа.
+# Шаблон: подставляет {query}; ответ разбирается строго, при ошибке разбора узлы делают два отдельных вызова.
+query_rewrite_classify_prompt = PromptTemplate.from_template(
+    """Ты юридический ассистент. Выполни две задачи для запроса пользователя.
+1. Преобразуй запрос в краткую, точную поисковую фразу для правовой системы (например, «КонсультантПлюс», «Гарант»):
+- сохраняй юридический смысл исходного запроса;
+- используй официальную юридическую терминологию;
+- убирай разговорные формулировки, местоимения и лишние слова;
+- не добавляй пояснений и комментариев.
+2. Определи категорию запроса:
+- "НПА" — запрос касается нормативно-правовых актов: законов, кодексов, статей, постановлений, правил, требований законодательства, обязанностей по закону и т.п.;
+- "Судебное" — запрос касается судебных решений, прецедентов, практики судов, разборов дел, позиции ВС/Арбитражных судов и т.п.
+
+Ответь только JSON-объектом без пояснений и без разметки, ровно с двумя полями:
+{{"search_query": "<поисковая фраза>", "category": "НПА" или "Судебное"}}
+
+Пример:
+Исходный запрос: "Судебная практика по увольнению за прогул без объяснений"
+Ответ: {{"search_query": "Судебная практика увольнение за прогул отсутствие объяснений", "category": "Судебное"}}
+Исходный запрос: "Какие льготы у ветеранов труда в Москве?"
+Ответ: {{"search_query": "Льготы ветеранам труда Москва", "category": "НПА"}}
+
+[Исходный запрос]: "{query}"
+Ответ:"""
+)
+
 # Классификация запроса к НПА или судебной практике. Он выдаёт ровно одно слово-категорию.
 
 # Тип: классификация (labeling).
@@ -186,6 +215,36 @@ reflection_prompt = PromptTemplate.from_template(
 [Твой ответ]:"""
 )
 
+# Самопроверка с категорией нового запроса: вердикт, поисковая фраза и категория в JSON.
+#
+# Тип: рефлексия/самопроверка + классификация (structured output).
+# Техника: критерии из reflection_prompt, строгий JSON-формат ответа.
+# Шаблон: подставляет {query} и {response}; ответ разбирается строго, при ошибке — reflection_prompt.
+reflection_classify_prompt = PromptTemplate.from_template(
+    """Ты — эксперт-юрист. Проанализируй вопрос пользователя и черновик ответа.
+Оцени, насколько черновик ответа полностью раскрывает вопрос с точки зрения:
+- нормативно-правового регулирования (НПА),
+- судебной практики (если уместно),
+- возможных нюансов, условий, исключений.
+Ответь только JSON-объектом без пояснений и без разметки, ровно с тремя полями:
+- если ответ полностью раскрывает вопрос: {{"verdict": "ок", "search_query": "", "category": ""}}
+- если ответ недостаточен: {{"verdict": "поиск", "search_query": "<краткий поисковый запрос для справочно-правовой системы>", "category": "НПА" или "Судебное"}}
+Категория "НПА" — поиск законов, кодексов, статей, постановлений; "Судебное" — поиск судебной практики.
+---
+Пример 1:
+Вопрос: Можно ли уволить сотрудника за однократный прогул без предупреждений?
+Черновик ответа: Да, можно. Согласно ст. 81 ТК РФ, прогул является основанием для увольнения.
+Твой ответ: {{"verdict": "поиск", "search_query": "Судебная практика увольнение за прогул отсутствие уведомления", "category": "Судебное"}}
+Пример 2:
+Вопрос: Облагается ли НДС продажа доли в уставном капитале ООО?
+Черновик ответа: Нет, передача доли в уставном капитале ООО не облагается НДС на основании п. 2 ст. 149 НК РФ.
+Твой ответ: {{"verdict": "ок", "search_query": "", "category": ""}}
+---
+[Вопрос]: "{query}"
+[Черновик ответа]: {response}
+[Твой ответ]:"""
+)
+
 # Собирает финальный развернутый ответ по документам.
 # Он использует ту же структуру, но допускает более подробный вывод.
 #
@@ -0,0 +1,48 @@
+"""
+Ограничение частоты запросов к внешним API.
+
+RateLimiter — потокобезопасное «ведро токенов»: общий лимит на все потоки и
+корутины процесса. Используется в llm.py как глобальный лимит вызовов GigaChat.
+"""
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Ведро токенов: не более rate запросов в секунду, допускается всплеск до burst запросов.
+
+    rate <= 0 отключает ограничение.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Резервирует один запрос и возвращает задержку (сек.), которую нужно выждать перед ним."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """Блокирует поток до разрешения очередного запроса."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        """Асинхронный вариант acquire: ожидание не блокирует event loop."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
@@ -0,0 +1,97 @@
+"""
+Адаптивная остановка циклов повторного поиска (самопроверка → поиск → ответ).
+
+Каждый цикл стоит поиска и двух вызовов GigaChat, поэтому reflect_node запускает его,
+только если он может дать новые источники:
+
+- лимит: выполнено PRAVO_RE_SEARCH_MAX циклов — самопроверка не вызывает LLM;
+- бюджет: время работы узлов или токены GigaChat с учётом стоимости ещё одного цикла
+  (средней по уже выполненным) превышают PRAVO_RE_SEARCH_BUDGET_SECONDS / _TOKENS;
+- источники: предыдущий цикл почти не нашёл новых документов (доля результатов поиска,
+  прошедших дедупликацию docs, ниже PRAVO_RE_SEARCH_MIN_NEW_SOURCES) — следующий
+  вероятно тоже не найдёт;
+- новизна: новая поисковая фраза почти повторяет прежние (доля новых термов ниже
+  PRAVO_RE_SEARCH_MIN_NOVELTY) — поиск вернёт те же документы.
+
+Первые три проверки выполняются до вызова LLM, последняя — по вердикту самопроверки.
+Решение регистрируется в metrics как событие re_search (decision, reason).
+"""
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from .config import (
+    RE_SEARCH_BUDGET_SECONDS,
+    RE_SEARCH_BUDGET_TOKENS,
+    RE_SEARCH_MAX,
+    RE_SEARCH_MIN_NEW_SOURCES,
+    RE_SEARCH_MIN_NOVELTY,
+)
+from .metrics import record
+from .text import tokenize
+
+
+def spent(events: Iterable[Dict[str, Any]]) -> Tuple[float, int]:
+    """(время работы узлов, сек.; токены GigaChat) по событиям поля metrics."""
+    seconds, tokens = 0.0, 0
+    for event in events:
+        if event.get("kind") == "node":
+            seconds += event["seconds"]
+        elif event.get("kind") == "llm":
+            tokens += event.get("prompt_tokens", 0) + event.get("completion_tokens", 0)
+    return seconds, tokens
+
+
+def novelty(query: str, previous: Sequence[str]) -> float:
+    """Доля термов query, которых нет ни в одной из previous (1.0 — фраза полностью новая)."""
+    terms = set(tokenize(query))
+    if not terms:
+        return 0.0
+    seen = {term for text in previous for term in tokenize(text)}
+    return len(terms - seen) / len(terms)
+
+
+def new_source_share(answers: Sequence[Dict[str, Any]]) -> float | None:
+    """Доля результатов последнего цикла, оказавшихся новыми документами; None — повторного поиска ещё не было.
+
+    Редуктор docs (dedup.merge_docs) не добавляет уже найденные страницы и почти-дубликаты, поэтому
+    новые документы цикла — прирост docs_count черновых ответов, а все результаты — прирост retrieved_total.
+    """
+    if len(answers) < 2:
+        return None
+    added = answers[-1].get("docs_count", 0) - answers[-2].get("docs_count", 0)
+    retrieved = answers[-1].get("retrieved_total", 0) - answers[-2].get("retrieved_total", 0)
+    if retrieved <= 0:
+        return 0.0
+    return max(0, added) / retrieved
+
+
+def over_budget(events: List[Dict[str, Any]], loops: int) -> bool:
+    """Ещё один цикл (оценка — средняя стоимость loops выполненных) превысит бюджет запроса."""
+    seconds, tokens = spent(events)
+    loops = max(1, loops)
+    if RE_SEARCH_BUDGET_SECONDS > 0 and seconds + seconds / loops > RE_SEARCH_BUDGET_SECONDS:
+        return True
+    return RE_SEARCH_BUDGET_TOKENS > 0 and tokens + tokens / loops > RE_SEARCH_BUDGET_TOKENS
+
+
+def stop_reason(state: Dict[str, Any]) -> str | None:
+    """Причина не начинать новый цикл, известная до самопроверки: limit, budget, no_new_sources; None — можно."""
+    answers = state.get("answers") or []
+    if state["re_search_cnt"] >= RE_SEARCH_MAX:
+        return "limit"
+    if over_budget(state.get("metrics") or [], len(answers)):
+        return "budget"
+    share = new_source_share(answers)
+    if share is not None and share < RE_SEARCH_MIN_NEW_SOURCES:
+        return "no_new_sources"
+    return None
+
+
+def query_stop_reason(state: Dict[str, Any], new_query: str) -> str | None:
+    """Причина не искать по новой фразе самопроверки: not_novel; None — фраза достаточно новая."""
+    previous = [state["query"], state["search_query"]] + [a.get("title") or "" for a in state.get("answers") or []]
+    return "not_novel" if novelty(new_query, previous) < RE_SEARCH_MIN_NOVELTY else None
+
+
+def record_decision(re_search: bool, reason: str) -> None:
+    """Событие re_search: decision (continue / stop) и причина (verdict — по вердикту самопроверки)."""
+    record("re_search", decision="continue" if re_search else "stop", reason=reason)
@@ -3,12 +3,22 @@
 
 Потоковая обработка graph.stream() с выводом шагов и финального ответа.
 Режимы: debug — подробный лог, simple — краткие сообщения о этапах.
+Черновой и итоговый ответы печатаются по мере генерации: узлы передают
+фрагменты текста GigaChat в поток графа (stream_mode="custom").
+В режиме debug после ответа печатается сводка метрик прогона (см. metrics).
+Для графа с checkpointer передаётся config с thread_id (см. checkpoint).
 """
 from typing import Any, Dict
 
+from .metrics import format_summary, summarize
+from .state import update_value
 
-def run_graph(graph, state: Dict[str, Any], mode: str = "debug") -> None:
-    """Потоково выполняет граф, выводит промежуточные и финальный ответ. mode: 'debug' | 'simple'."""
+
+def run_graph(graph, state: Dict[str, Any] | Any, mode: str = "debug", config: Dict[str, Any] | None = None) -> None:
+    """Потоково выполняет граф, выводит промежуточные и финальный ответ. mode: 'debug' | 'simple'.
+
+    state — начальное состояние либо вход продолжения сессии config (None, Command(resume=...)).
+    """
     if mode not in {"debug", "simple"}:
         raise ValueError("mode must be 'debug' or 'simple'")
 
@@ -23,14 +33,50 @@ def run_graph(graph, state: Dict[str, Any], mode: str = "debug") -> None:
         "самопроверка": "оцениваю",
     }
 
+    # Заголовки потокового вывода по узлам, генерирующим ответ
+    stream_title_by_node = {
+        "answer_node": "думаю" if mode == "simple" else "Черновой ответ:",
+        "final_answer_node": "=== FINAL ANSWER ===",
+    }
+
     # Итоговый ответ, извлекаемый из узла «финальный ответ»
     final_answer = None
+    # Узел, чей ответ сейчас печатается потоком, и был ли итоговый ответ напечатан потоком
+    streaming_node = None
+    final_streamed = False
+    # События инструментирования из обновлений всех узлов
+    events = []
+    summary = None
+
+    for stream_mode, chunk in graph.stream(state, config, stream_mode=["updates", "custom"]):
+        if stream_mode == "custom":
+            if not isinstance(chunk, dict) or "token" not in chunk:
+                continue
+            if chunk["node"] != streaming_node:
+                if streaming_node:
+                    print()
+                streaming_node = chunk["node"]
+                print(stream_title_by_node.get(streaming_node, streaming_node))
+            final_streamed = final_streamed or streaming_node == "final_answer_node"
+            print(chunk["token"], end="", flush=True)
+            continue
+
+        step_result = chunk
+        # Узел, ответ которого был только что напечатан потоком (его этап уже выведен)
+        streamed_node = streaming_node
+        if streaming_node:
+            print()
+            streaming_node = None
+        for updated_state in step_result.values():
+            if hasattr(updated_state, "get"):
+                events.extend(update_value(updated_state, "metrics") or [])
+                summary = updated_state.get("metrics_summary") or summary
 
-    for step_result in graph.stream(state, stream_mode="updates"):
         if mode == "simple":
             for node_name, updated_state in step_result.items():
                 stage = stage_by_node.get(node_name)
-                if stage:
+                # «думаю» уже напечатано перед потоковым выводом чернового ответа
+                if stage and not (node_name == "черновой ответ" and streamed_node == "answer_node"):
                     print(stage)
                 if node_name == "финальный ответ" and hasattr(updated_state, "get"):
                     final_answer = updated_state.get("final_answer")
@@ -52,13 +98,17 @@ def run_graph(graph, state: Dict[str, Any], mode: str = "debug") -> None:
             print(f"  need_re_search: {updated_state.get('need_re_search', 'N/A')}")
             print(f"  clarification_cnt: {updated_state.get('clarification_cnt', 'N/A')}")
             print(f"  re_search_cnt: {updated_state.get('re_search_cnt', 'N/A')}")
-            messages = updated_state.get("messages", [])
+            messages = update_value(updated_state, "messages", [])
             if messages:
                 print("  Последние сообщения:")
                 for msg in messages[-3:]:
                     print(f"    {msg}")
             print("-" * 20)
 
-    if final_answer:
+    if final_answer and not final_streamed:
         print("=== FINAL ANSWER ===")
         print(final_answer)
+
+    if mode == "debug" and events:
+        print("=== МЕТРИКИ ===")
+        print(format_summary(summary or summarize(events)))
@@ -1,58 +1,267 @@
 """
 Поиск правовой информации во внешних источниках.
 
-Провайдеры: DuckDuckGo (DDGS) + trafilatura для извлечения текста,
-Garant API для НПА. call_npa_api / call_court_api — точки входа для узлов графа.
+Провайдеры: DuckDuckGo (DDGS) + trafilatura для извлечения текста (в пуле процессов, см. extract),
+Garant API для НПА. call_npa_api / call_court_api — точки входа для узлов графа,
+acall_npa_api / acall_court_api — их асинхронные варианты для graph.ainvoke/astream.
+Результаты поисковиков и извлечённые тексты страниц кэшируются (см. search_cache).
+Провайдеры local / hybrid ищут по локальному индексу уже полученных документов (см. index).
+При активной кассете (см. cassette) результаты поиска записываются или воспроизводятся.
+
+Тяжёлые зависимости (ddgs, trafilatura, requests) импортируются при первом
+использовании провайдера, а не при импорте модуля.
 """
+import asyncio
 import os
-from typing import Any, Dict, List, Protocol
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Protocol, Tuple
 
-import requests
-from ddgs import DDGS
-import trafilatura
+from .blobs import blob_store, content_hash
+from .breaker import CircuitBreaker
+from .cassette import wrap_provider
+from .config import (
+    FETCH_TIMEOUT,
+    FETCH_WORKERS,
+    GARANT_BACKOFF,
+    GARANT_BREAKER_RESET,
+    GARANT_API_URL,
+    GARANT_BREAKER_THRESHOLD,
+    GARANT_EXPORT_PATH,
+    GARANT_FETCH_TOP,
+    GARANT_POOL_SIZE,
+    GARANT_RETRIES,
+    GARANT_TIMEOUT,
+    INDEX,
+    KEEP_HTML,
+    SEARCH_DEADLINE,
+)
+from .dedup import known_text
+from .extract import extract_text
+from .index import HybridSearchProvider, LocalSearchProvider, get_local_index
+from .metrics import propagate, timed
+from .search_cache import cached_document_text, cached_results, get_page_text, put_page_text
+from .state import Doc
 
 
 class SearchProvider(Protocol):
-    """Протокол провайдера поиска: метод search возвращает список документов {title, href, doc_text}."""
+    """Протокол провайдера поиска: метод search возвращает список документов Doc {title, href, doc_text, doc_hash}."""
+
+    # Провайдер понимает фильтр «site:домен» в поисковой фразе
+    supports_site_filter: bool
 
-    def search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+    def search(self, query: str, max_results: int = 3) -> List[Doc]:
         ...
 
+    async def asearch(self, query: str, max_results: int = 3) -> List[Doc]:
+        ...
+
+
+def make_doc(title: str, href: str, doc_text: str, doc_html: str | None = None) -> Doc:
+    """Документ для состояния графа: title, href, doc_text и хэш содержимого.
+
+    Сырой HTML в документ не попадает: при PRAVO_KEEP_HTML=1 он сохраняется в blob store,
+    а в документе остаётся ссылка html_ref.
+    """
+    doc: Doc = {"title": title, "href": href, "doc_text": doc_text, "doc_hash": content_hash(doc_text)}
+    if KEEP_HTML and doc_html:
+        doc["html_ref"] = blob_store.put(doc_html)
+    return doc
+
 
 class DdgsSearchProvider:
-    """Поиск через DuckDuckGo + извлечение текста страниц через trafilatura."""
-
-    def search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
-        results = DDGS().text(query, max_results=max_results)
-        for r in results:
-            try:
-                doc_html = trafilatura.fetch_url(r["href"])
-                doc_text = trafilatura.extract(doc_html)
-                r["doc_html"] = doc_html
-                r["doc_text"] = doc_text
-            except Exception as e:
-                print(f"Ошибка при извлечении текста с {r['href']}: {e}")
-                r["doc_html"] = ""
-                r["doc_text"] = ""
-        return results
+    """Поиск через DuckDuckGo + параллельное извлечение текста страниц через trafilatura.
+
+    Страницы загружаются в ограниченном пуле потоков (workers) с таймаутом на один URL
+    (fetch_timeout). Общий дедлайн (deadline) ограничивает весь вызов search: страницы,
+    не успевшие загрузиться, возвращаются с пустым doc_text. Порядок результатов сохраняется.
+    """
+
+    # Понимает фильтр site: в поисковой фразе
+    supports_site_filter = True
+
+    def __init__(
+        self,
+        workers: int = FETCH_WORKERS,
+        fetch_timeout: float = FETCH_TIMEOUT,
+        deadline: float = SEARCH_DEADLINE,
+    ) -> None:
+        self.workers = workers
+        self.fetch_timeout = fetch_timeout
+        self.deadline = deadline
+        from trafilatura.settings import use_config
+
+        # Конфиг trafilatura с таймаутом загрузки одной страницы
+        self._config = use_config()
+        self._config.set("DEFAULT", "DOWNLOAD_TIMEOUT", str(max(1, int(fetch_timeout))))
+
+    def _fetch(self, href: str) -> Tuple[str, str]:
+        """Загружает страницу и извлекает текст: (doc_html, doc_text). Текст страницы, уже найденной в сессии,
+        или актуальный текст из кэша берётся без загрузки."""
+        import trafilatura
+
+        known = known_text(href)
+        if known is not None:
+            return "", known
+        cached_text = get_page_text(href, self.fetch_timeout)
+        if cached_text is not None:
+            return "", cached_text
+        with timed("fetch", source="web", bytes=0) as event:
+            # Декодированный HTML нужен только для хранилища blobs; extract_text принимает байты
+            response = trafilatura.fetch_response(href, decode=KEEP_HTML, with_headers=True, config=self._config)
+            event["bytes"] = len(response.data or b"") if response else 0
+        if not response or response.status != 200 or not response.data:
+            return "", ""
+        doc_text = extract_text(response.data)
+        put_page_text(href, doc_text, response.headers)
+        return response.html or "", doc_text
+
+    def _hits(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Результаты DDGS (title, href, body) с кэшем по поисковой фразе."""
+
+        def request() -> List[Dict[str, Any]]:
+            from ddgs import DDGS
+
+            return DDGS().text(query, max_results=max_results)
+
+        return cached_results("ddgs", query, max_results, request)
+
+    def search(self, query: str, max_results: int = 3) -> List[Doc]:
+        started = time.monotonic()
+        results = self._hits(query, max_results)
+        if not results:
+            return results
+
+        # Пул не используется как контекстный менеджер: зависшие загрузки не должны
+        # задерживать возврат после дедлайна
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.workers, len(results))),
+            thread_name_prefix="pravo-fetch",
+        )
+        futures = [executor.submit(propagate(self._fetch), r["href"]) for r in results]
+        wait(futures, timeout=max(0.0, self.deadline - (time.monotonic() - started)))
+        executor.shutdown(wait=False, cancel_futures=True)
+
+        return self._fill(results, futures)
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Doc]:
+        """Асинхронный search: загрузки выполняются в потоках, event loop не блокируется."""
+        started = time.monotonic()
+        results = await asyncio.to_thread(self._hits, query, max_results)
+        if not results:
+            return results
+
+        semaphore = asyncio.Semaphore(max(1, self.workers))
+
+        async def fetch(href: str) -> Tuple[str, str]:
+            async with semaphore:
+                return await asyncio.wait_for(asyncio.to_thread(self._fetch, href), self.fetch_timeout)
+
+        tasks = [asyncio.ensure_future(fetch(r["href"])) for r in results]
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, self.deadline - (time.monotonic() - started)))
+        for task in pending:
+            task.cancel()
+        return self._fill(results, tasks)
+
+    @staticmethod
+    def _fill(results: List[Dict[str, Any]], futures: List[Any]) -> List[Doc]:
+        """Собирает документы из результатов загрузок; незавершённые и упавшие — с пустым текстом."""
+        docs = []
+        for r, future in zip(results, futures):
+            doc_html, doc_text = "", ""
+            if not future.done() or future.cancelled():
+                print(f"Превышен дедлайн поиска при загрузке {r['href']}")
+            else:
+                try:
+                    doc_html, doc_text = future.result()
+                except Exception as e:
+                    print(f"Ошибка при извлечении текста с {r['href']}: {e}")
+            docs.append(make_doc(r.get("title", ""), r["href"], doc_text, doc_html))
+        return docs
 
 
 class GarantSearchProvider:
-    """Поиск по НПА через API Garant.ru. Судебная практика не поддерживается — fallback на DDGS."""
+    """Поиск по НПА через API Garant.ru. Судебная практика не поддерживается — fallback на DDGS.
+
+    Провайдер держит долгоживущую HTTP-сессию с пулом keep-alive соединений (pool_size).
+    Ответы 429/5xx и сетевые ошибки повторяются с экспоненциальной задержкой и джиттером
+    (retries, backoff; заголовок Retry-After учитывается). Circuit breaker после серии
+    ошибок временно переводит поиск на резервный провайдер fallback (DDGS по consultant.ru).
+
+    Для первых fetch_top результатов параллельно загружаются тексты документов
+    (экспорт по topic); тексты кэшируются по topic и редакции документа. Адрес API
+    задаётся api_url / PRAVO_GARANT_API_URL — например, локальный stub-сервер (garant_stub.py).
+    """
+
+    supports_site_filter = False
+
+    # Статусы, при которых запрос повторяется
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
 
-    def __init__(self, token: str | None) -> None:
+    def __init__(
+        self,
+        token: str | None,
+        pool_size: int = GARANT_POOL_SIZE,
+        retries: int = GARANT_RETRIES,
+        backoff: float = GARANT_BACKOFF,
+        timeout: float = GARANT_TIMEOUT,
+        fallback: SearchProvider | None = None,
+        breaker: CircuitBreaker | None = None,
+        fetch_top: int = GARANT_FETCH_TOP,
+        deadline: float = SEARCH_DEADLINE,
+        api_url: str = GARANT_API_URL,
+    ) -> None:
         self.token = token  # GARANT_API_KEY из окружения
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.fetch_top = fetch_top  # для скольких первых результатов загружать текст
+        self.deadline = deadline
+        self.fallback = fallback
+        self.breaker = breaker or CircuitBreaker(GARANT_BREAKER_THRESHOLD, GARANT_BREAKER_RESET)
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            backoff_jitter=backoff,
+            status_forcelist=self.RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {token}",
+            }
+        )
+
+    def _fallback_search(self, query: str, max_results: int) -> List[Doc] | None:
+        """Резервный поиск НПА, если Garant недоступен; None — резервного провайдера нет."""
+        if self.fallback is None:
+            return None
+        return self.fallback.search(_npa_query(self.fallback, query), min(max_results, 3))
+
+    def search(self, query: str, max_results: int = 10) -> List[Doc]:
+        import requests
 
-    def search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
         if not self.token:
-            return [{"title": "Ошибка", "href": "", "doc_text": "GARANT_API_KEY не задан."}]
+            return [make_doc("Ошибка", "", "GARANT_API_KEY не задан.")]
+        if not self.breaker.allow():
+            fallback = self._fallback_search(query, max_results)
+            if fallback is not None:
+                return fallback
+            return [make_doc("Ошибка API", "", "Garant API временно недоступен.")]
 
-        url = "https://api.garant.ru/v1/search"
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.token}",
-        }
+        url = f"{self.api_url}/v1/search"
         payload = {
             "text": query,
             "count": max_results,
@@ -60,43 +269,212 @@ class GarantSearchProvider:
             "sort": 0,
             "sortOrder": 0,
         }
-        try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=15)
+
+        def request() -> List[Dict[str, Any]]:
+            resp = self.session.post(url, json=payload, timeout=self.timeout)
             resp.raise_for_status()
             data = resp.json()
-            documents = data.get("documents") or []
-            results: List[Dict[str, Any]] = []
-            for doc in documents:
-                name = doc.get("name", "Без названия")
-                rel_url = doc.get("url", "")
-                absolute_url = f"https://d.garant.ru{rel_url}" if rel_url.startswith("/") else rel_url
-                results.append({"title": name, "href": absolute_url, "doc_text": ""})
-            return results if results else [{"title": "Ничего не найдено", "href": "", "doc_text": ""}]
+            return data.get("documents") or []
+
+        try:
+            documents = cached_results("garant", query, max_results, request)
         except requests.RequestException as e:
-            return [{"title": "Ошибка API", "href": "", "doc_text": str(e)}]
+            self.breaker.record_failure()
+            print(f"Ошибка Garant API: {e}")
+            fallback = self._fallback_search(query, max_results)
+            if fallback is not None:
+                return fallback
+            return [make_doc("Ошибка API", "", str(e))]
+        self.breaker.record_success()
+        if not documents:
+            return [make_doc("Ничего не найдено", "", "")]
 
+        texts = self._fetch_bodies(documents[: self.fetch_top])
+        results: List[Doc] = []
+        for pos, doc in enumerate(documents):
+            name = doc.get("name", "Без названия")
+            results.append(make_doc(name, self._absolute_url(doc), texts[pos] if pos < len(texts) else ""))
+        return results
 
-def get_search_provider(name: str | None) -> SearchProvider:
-    """Возвращает провайдер по имени: 'garant' или по умолчанию DdgsSearchProvider."""
+    @staticmethod
+    def _absolute_url(document: Dict[str, Any]) -> str:
+        rel_url = document.get("url", "")
+        return f"https://d.garant.ru{rel_url}" if rel_url.startswith("/") else rel_url
+
+    def _fetch_body(self, document: Dict[str, Any]) -> str:
+        """Текст документа по его topic: уже найденный в сессии, из кэша (ключ — topic и редакция)
+        или через экспорт Garant API."""
+        topic = document.get("topic")
+        if topic is None:
+            return ""
+        known = known_text(self._absolute_url(document))
+        if known is not None:
+            return known
+
+        def fetch() -> str:
+            with timed("fetch", source="garant", bytes=0) as event:
+                resp = self.session.get(
+                    f"{self.api_url}{GARANT_EXPORT_PATH.format(topic=topic)}",
+                    headers={"Accept": "application/json, text/html"},
+                    timeout=self.timeout,
+                )
+                event["bytes"] = len(resp.content)
+            resp.raise_for_status()
+            if "json" in resp.headers.get("Content-Type", ""):
+                data = resp.json()
+                if data.get("text"):
+                    return data["text"]
+                return extract_text(data.get("html"))
+            return extract_text(resp.content)
+
+        revision = document.get("revision") or document.get("modified") or ""
+        return cached_document_text(("garant", topic, revision), fetch)
+
+    def _fetch_bodies(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """Параллельно загружает тексты документов в пределах дедлайна; ошибки дают пустой текст."""
+        if not documents:
+            return []
+        executor = ThreadPoolExecutor(max_workers=len(documents), thread_name_prefix="pravo-garant")
+        futures = [executor.submit(propagate(self._fetch_body), doc) for doc in documents]
+        wait(futures, timeout=self.deadline)
+        executor.shutdown(wait=False, cancel_futures=True)
+        texts = []
+        for doc, future in zip(documents, futures):
+            text = ""
+            if future.done() and not future.cancelled():
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"Ошибка загрузки текста документа Garant {doc.get('topic')}: {e}")
+            texts.append(text)
+        return texts
+
+    async def asearch(self, query: str, max_results: int = 10) -> List[Doc]:
+        """Асинхронный search: блокирующий HTTP-запрос выполняется в отдельном потоке."""
+        return await asyncio.to_thread(self.search, query, max_results)
+
+
+# Провайдеры создаются один раз на процесс: сессии и пулы соединений переиспользуются
+_providers: Dict[Tuple[str, str | None], SearchProvider] = {}
+_providers_lock = threading.RLock()
+
+
+def _create_provider(name: str | None) -> SearchProvider:
     if name == "garant":
         token = os.getenv("GARANT_API_KEY")
-        return GarantSearchProvider(token)
+        return GarantSearchProvider(token, fallback=get_search_provider("ddgs"))
+    if name == "local":
+        return LocalSearchProvider()
+    if name == "hybrid":
+        return HybridSearchProvider(get_search_provider("ddgs"))
     return DdgsSearchProvider()
 
 
-def call_npa_api(query: str) -> List[Dict[str, Any]]:
+def get_search_provider(name: str | None) -> SearchProvider:
+    """Возвращает провайдер по имени: 'garant', 'local', 'hybrid' или по умолчанию DdgsSearchProvider.
+
+    Экземпляры кэшируются: повторные вызовы возвращают тот же объект.
+    """
+    name = name if name in {"garant", "local", "hybrid"} else "ddgs"
+    key = (name, os.getenv("GARANT_API_KEY") if name == "garant" else None)
+    provider = _providers.get(key)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(key)
+            if provider is None:
+                provider = _providers[key] = _create_provider(name)
+    return provider
+
+
+# Провайдер, заменяющий выбор по PRAVO_SEARCH_PROVIDER (бенчмарк, тесты)
+_override: SearchProvider | None = None
+
+
+def set_search_provider(provider: SearchProvider | None) -> SearchProvider | None:
+    """Задаёт провайдер для call_npa_api / call_court_api (None — снова по PRAVO_SEARCH_PROVIDER).
+
+    Возвращает прежнее значение.
+    """
+    global _override
+    previous, _override = _override, provider
+    return previous
+
+
+def _current_provider() -> SearchProvider:
+    return _override or get_search_provider(os.getenv("PRAVO_SEARCH_PROVIDER"))
+
+
+def _npa_query(provider: SearchProvider, query: str) -> str:
+    """Поисковая фраза для НПА: при web-поиске и локальном индексе ограничивает поиск сайтом consultant.ru."""
+    if getattr(provider, "supports_site_filter", False):
+        return query + " site:consultant.ru/"
+    return query
+
+
+def _court_query(query: str) -> str:
+    """Поисковая фраза для судебной практики: поиск по reputation.su."""
+    return query + " site:reputation.su"
+
+
+def _court_provider(provider: SearchProvider) -> SearchProvider:
+    """Garant не предоставляет судебную практику — используем web-поиск."""
+    if getattr(provider, "supports_site_filter", False):
+        return provider
+    return get_search_provider("ddgs")
+
+
+def _limit(max_results: int | None) -> tuple:
+    """Аргументы search: явное число результатов или значение по умолчанию провайдера."""
+    return () if max_results is None else (max_results,)
+
+
+def _describe(event: Dict[str, Any], results: List[Doc]) -> None:
+    """Дополняет событие метрик поиска числом результатов и объёмом извлечённого текста."""
+    event["results"] = len(results)
+    event["bytes"] = sum(len((doc.get("doc_text") or "").encode("utf-8")) for doc in results)
+
+
+def _ingest(results: List[Doc]) -> None:
+    """Пополняет локальный индекс полученными документами (PRAVO_INDEX=1)."""
+    if INDEX:
+        get_local_index().add_documents(results)
+
+
+def call_npa_api(query: str, max_results: int | None = None) -> List[Doc]:
     """Поиск НПА: при DDGS добавляет site:consultant.ru/."""
-    provider = get_search_provider(os.getenv("PRAVO_SEARCH_PROVIDER"))
-    if isinstance(provider, DdgsSearchProvider):
-        query = query + " site:consultant.ru/"
-    return provider.search(query)
+    provider = _current_provider()
+    with timed("search", name="npa", provider=type(provider).__name__) as event:
+        results = wrap_provider(provider).search(_npa_query(provider, query), *_limit(max_results))
+        _describe(event, results)
+    _ingest(results)
+    return results
 
 
-def call_court_api(query: str) -> List[Dict[str, Any]]:
+def call_court_api(query: str, max_results: int | None = None) -> List[Doc]:
     """Поиск судебной практики: site:reputation.su. Garant → fallback на DDGS."""
-    provider = get_search_provider(os.getenv("PRAVO_SEARCH_PROVIDER"))
-    if isinstance(provider, DdgsSearchProvider):
-        query = query + " site:reputation.su"
-        return provider.search(query)
-    # Garant не предоставляет судебную практику — используем web-поиск
-    return DdgsSearchProvider().search(query + " site:reputation.su")
+    provider = _court_provider(_current_provider())
+    with timed("search", name="court", provider=type(provider).__name__) as event:
+        results = wrap_provider(provider).search(_court_query(query), *_limit(max_results))
+        _describe(event, results)
+    _ingest(results)
+    return results
+
+
+async def acall_npa_api(query: str, max_results: int | None = None) -> List[Doc]:
+    """Асинхронный поиск НПА (см. call_npa_api)."""
+    provider = _current_provider()
+    with timed("search", name="npa", provider=type(provider).__name__) as event:
+        results = await wrap_provider(provider).asearch(_npa_query(provider, query), *_limit(max_results))
+        _describe(event, results)
+    await asyncio.to_thread(_ingest, results)
+    return results
+
+
+async def acall_court_api(query: str, max_results: int | None = None) -> List[Doc]:
+    """Асинхронный поиск судебной практики (см. call_court_api)."""
+    provider = _court_provider(_current_provider())
+    with timed("search", name="court", provider=type(provider).__name__) as event:
+        results = await wrap_provider(provider).asearch(_court_query(query), *_limit(max_results))
+        _describe(event, results)
+    await asyncio.to_thread(_ingest, results)
+    return results
@@ -0,0 +1,137 @@
+"""
+Двухуровневый кэш web-поиска.
+
+1. Запрос → список результатов поисковика (короткий TTL): повторный поиск той же
+   фразы не обращается к DDGS/Garant.
+2. URL → извлечённый doc_text (длинный TTL): страница хранится вместе с ETag и
+   Last-Modified. После PRAVO_PAGE_REVALIDATE сек. запись перепроверяется HEAD-запросом;
+   если валидаторы совпали, текст используется без повторной загрузки и извлечения.
+   Тексты документов API (Garant) хранятся там же с ключом по id и редакции документа.
+
+Оба уровня — таблицы SQLite в PRAVO_CACHE_DIR/search.sqlite с вытеснением по LRU
+и лимитом размера. Кэш включается переменной PRAVO_SEARCH_CACHE=1. Каждое обращение
+регистрируется в metrics как событие cache (search_queries / search_pages).
+"""
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, Dict, List, Mapping
+
+from .cache import DiskCache, cache_path, make_key
+from .metrics import record
+from .config import (
+    PAGE_CACHE_MAX_MB,
+    PAGE_CACHE_TTL,
+    PAGE_REVALIDATE,
+    SEARCH_CACHE,
+    SEARCH_CACHE_MAX_MB,
+    SEARCH_CACHE_TTL,
+)
+
+_query_cache: DiskCache | None = None
+_page_cache: DiskCache | None = None
+_lock = threading.Lock()
+
+
+def _get_caches() -> tuple[DiskCache, DiskCache]:
+    global _query_cache, _page_cache
+    with _lock:
+        if _query_cache is None:
+            path = cache_path("search.sqlite")
+            _query_cache = DiskCache(
+                path, table="queries", ttl=SEARCH_CACHE_TTL, max_bytes=int(SEARCH_CACHE_MAX_MB * 1024 * 1024)
+            )
+            _page_cache = DiskCache(
+                path, table="pages", ttl=PAGE_CACHE_TTL, max_bytes=int(PAGE_CACHE_MAX_MB * 1024 * 1024)
+            )
+        return _query_cache, _page_cache
+
+
+def cached_results(
+    provider: str,
+    query: str,
+    max_results: int,
+    search: Callable[[], List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """Результаты поисковика из кэша первого уровня; при промахе вызывает search() и сохраняет ответ."""
+    if not SEARCH_CACHE:
+        return search()
+    query_cache, _ = _get_caches()
+    key = make_key(provider, query, max_results)
+    cached = query_cache.get(key)
+    record("cache", name="search_queries", hit=cached is not None)
+    if cached is not None:
+        return cached
+    results = search()
+    # Пустые ответы не кэшируем (ошибки приходят исключениями и тоже не попадают в кэш)
+    if results:
+        query_cache.set(key, results)
+    return results
+
+
+def cached_document_text(key_parts: tuple, fetch: Callable[[], str]) -> str:
+    """Текст документа API (например, Garant по topic и редакции) из кэша второго уровня или через fetch()."""
+    if not SEARCH_CACHE:
+        return fetch()
+    _, page_cache = _get_caches()
+    key = make_key(*key_parts)
+    entry = page_cache.get(key)
+    record("cache", name="search_pages", hit=entry is not None)
+    if entry is not None:
+        return entry["doc_text"]
+    doc_text = fetch()
+    if doc_text:
+        page_cache.set(key, {"doc_text": doc_text, "checked_at": time.time()})
+    return doc_text
+
+
+def _validators(headers: Mapping[str, str] | None) -> Dict[str, str | None]:
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    return {"etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+
+
+def _revalidate(href: str, entry: Dict[str, Any], timeout: float) -> bool:
+    """HEAD-запрос: True, если ETag/Last-Modified страницы не изменились."""
+    if not entry.get("etag") and not entry.get("last_modified"):
+        return False
+    try:
+        request = urllib.request.Request(href, method="HEAD")
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            current = _validators(dict(resp.headers))
+    except Exception:
+        return False
+    if entry.get("etag") and current["etag"]:
+        return entry["etag"] == current["etag"]
+    return bool(entry.get("last_modified")) and entry["last_modified"] == current["last_modified"]
+
+
+def get_page_text(href: str, timeout: float) -> str | None:
+    """Текст страницы из кэша второго уровня или None, если страницу нужно загрузить заново."""
+    if not SEARCH_CACHE:
+        return None
+    _, page_cache = _get_caches()
+    entry = page_cache.get(href)
+    if entry is not None and time.time() - entry.get("checked_at", 0) >= PAGE_REVALIDATE:
+        if _revalidate(href, entry, timeout):
+            page_cache.set(href, {**entry, "checked_at": time.time()})
+        else:
+            page_cache.delete(href)
+            entry = None
+    record("cache", name="search_pages", hit=entry is not None)
+    return entry["doc_text"] if entry is not None else None
+
+
+def put_page_text(href: str, doc_text: str, headers: Mapping[str, str] | None) -> None:
+    """Сохраняет извлечённый текст страницы с валидаторами ETag/Last-Modified."""
+    if not SEARCH_CACHE or not doc_text:
+        return
+    _, page_cache = _get_caches()
+    page_cache.set(href, {"doc_text": doc_text, "checked_at": time.time(), **_validators(headers)})
+
+
+def search_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Счётчики обоих уровней кэша."""
+    if not SEARCH_CACHE:
+        return {}
+    query_cache, page_cache = _get_caches()
+    return {"queries": query_cache.stats(), "pages": page_cache.stats()}
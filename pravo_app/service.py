@@ -0,0 +1,587 @@
+"""
+Локальный сервис юридического агента: пул рабочих процессов и HTTP/JSON API.
+
+Заявки (вопросы пользователя) ставятся в очередь и распределяются по рабочим
+процессам; в каждом процессе SERVICE_THREADS потоков выполняют graph.stream().
+Процессы «тёплые»: граф скомпилирован и клиент GigaChat создан один раз при
+запуске процесса, а не на каждую заявку. Процессы сервиса — демоны: пул
+извлечения (extract.py) в них не создаётся, и текст страниц извлекается в потоке
+заявки. Параллелизм по ядрам даёт только число процессов (PRAVO_SERVICE_WORKERS).
+
+Допуск заявок (admission control): новая заявка отклоняется (HTTP 429 с
+Retry-After), если очередь заполнена (PRAVO_SERVICE_QUEUE) или расчётное
+ожидание превышает PRAVO_SERVICE_MAX_WAIT. Ожидание оценивается по средней
+длительности и среднему числу вызовов GigaChat завершённых заявок; при
+PRAVO_LLM_RATE_LIMIT лимит делится между процессами, и очередь, которую
+лимит GigaChat не успеет обслужить, не принимается (обратное давление).
+
+Сервис не диалоговый: граф работает в пакетном режиме (batch_mode), уточнение
+формулирует batch_clarify_node. Запуск:
+
+    python -m pravo_app.service --port 8000 --workers 4
+
+API:
+    POST /jobs {"query": "..."}   — 202 {"id", "status", ...} или 429
+    GET  /jobs/<id>               — состояние заявки (и результат, если готов)
+    GET  /jobs/<id>/result?timeout=30 — дождаться результата: 200 или 202
+    GET  /jobs/<id>/stream        — события заявки построчно (NDJSON): stage, token, done / error
+    GET  /health                  — процессы, очередь, оценка ожидания
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from multiprocessing.connection import wait as wait_connections
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterator, List
+from urllib.parse import parse_qs, urlparse
+
+from .config import (
+    LLM_RATE_LIMIT,
+    SERVICE_MAX_WAIT,
+    SERVICE_PORT,
+    SERVICE_QUEUE,
+    SERVICE_RESULT_TTL,
+    SERVICE_THREADS,
+    SERVICE_WORKERS,
+)
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Коэффициент сглаживания средних по завершённым заявкам
+_EWMA_ALPHA = 0.2
+# Период проверки рабочих процессов и очистки старых заявок, сек.
+_SUPERVISE_INTERVAL = 1.0
+
+
+class Overloaded(RuntimeError):
+    """Заявка не принята: очередь заполнена или ожидание слишком велико."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _load_callable(path: str) -> Callable[[], Any]:
+    """Функция по строке «модуль:имя»."""
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+# ---- Рабочий процесс ----
+
+
+def _warm_up(rate_limit: float) -> None:
+    """Компилирует граф и создаёт клиент GigaChat до первой заявки."""
+    from .graph import graph  # noqa: F401
+    from .llm import _get_llm, set_rate_limit
+
+    set_rate_limit(rate_limit)
+    try:
+        _get_llm()
+    except Exception as e:
+        print(f"Клиент GigaChat не создан заранее: {e}")
+
+
+def _run_job(job_id: str, query: str, events: Any) -> Dict[str, Any]:
+    """Выполняет граф по заявке, передавая этапы и фрагменты ответа в очередь events."""
+    from .checkpoint import thread_config
+    from .graph import graph
+    from .metrics import summarize
+    from .state import update_value
+
+    state = {"query": query, "batch_mode": True, "verbose": False}
+    config = thread_config(f"service-{job_id}")
+    result: Dict[str, Any] = {"final_answer": None, "clarification": None, "clarification_answer": None}
+    metrics: List[Dict[str, Any]] = []
+    summary: Dict[str, Any] | None = None
+    for stream_mode, chunk in graph.stream(state, config, stream_mode=["updates", "custom"]):
+        if stream_mode == "custom":
+            if isinstance(chunk, dict) and "token" in chunk:
+                events.put(("token", job_id, chunk["node"], chunk["token"]))
+            continue
+        for node_name, update in chunk.items():
+            events.put(("stage", job_id, node_name))
+            if not hasattr(update, "get"):
+                continue
+            metrics.extend(update_value(update, "metrics") or [])
+            summary = update.get("metrics_summary") or summary
+            for field in result:
+                if update.get(field) is not None:
+                    result[field] = update[field]
+    if graph.checkpointer is not None:
+        graph.checkpointer.delete_thread(config["configurable"]["thread_id"])
+    result["metrics"] = summary or summarize(metrics)
+    return result
+
+
+class _Channel:
+    """Концы каналов рабочего процесса: потоки процесса читают заявки и пишут события под своими блокировками."""
+
+    def __init__(self, tasks: Any, events: Any) -> None:
+        self._tasks = tasks
+        self._events = events
+        self._get_lock = threading.Lock()
+        self._put_lock = threading.Lock()
+
+    def get(self) -> tuple | None:
+        with self._get_lock:
+            try:
+                return self._tasks.recv()
+            except EOFError:
+                return None
+
+    def put(self, message: tuple) -> None:
+        with self._put_lock:
+            self._events.send(message)
+
+
+def _worker_loop(channel: _Channel) -> None:
+    while True:
+        task = channel.get()
+        if task is None:
+            return
+        job_id, query = task
+        channel.put(("start", job_id))
+        try:
+            channel.put(("done", job_id, _run_job(job_id, query, channel)))
+        except Exception as e:
+            traceback.print_exc()
+            channel.put(("error", job_id, f"{type(e).__name__}: {e}"))
+
+
+def _worker_main(tasks: Any, events: Any, threads: int, rate_limit: float, initializer: str | None) -> None:
+    """Точка входа рабочего процесса: прогрев и threads потоков, выполняющих заявки."""
+    # Ctrl+C обрабатывает родительский процесс: он и останавливает пул
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer:
+        _load_callable(initializer)()
+    _warm_up(rate_limit)
+    channel = _Channel(tasks, events)
+    channel.put(("ready", None))
+    loops = [threading.Thread(target=_worker_loop, args=(channel,), daemon=True) for _ in range(threads)]
+    for loop in loops:
+        loop.start()
+    for loop in loops:
+        loop.join()
+
+
+# ---- Родительский процесс ----
+
+
+class Job:
+    """Заявка: состояние, события для потоковой выдачи и результат."""
+
+    def __init__(self, query: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.status = "queued"  # queued | running | done | error
+        self.events: List[Dict[str, Any]] = []
+        self.result: Dict[str, Any] | None = None
+        self.error: str | None = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "error")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"id": self.id, "status": self.status, "query": self.query, "created": self.created}
+        if self.started:
+            data["queued_seconds"] = round(self.started - self.created, 3)
+        if self.finished and self.started:
+            data["seconds"] = round(self.finished - self.started, 3)
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class _Worker:
+    """Рабочий процесс с собственными каналами заявок и событий.
+
+    Каналы не общие: аварийное завершение одного процесса не оставляет захваченной
+    блокировку общей очереди, и остальные процессы продолжают работу.
+    """
+
+    def __init__(self, context: Any, threads: int, rate_limit: float, initializer: str | None) -> None:
+        tasks_out, self.tasks = context.Pipe(duplex=False)
+        self.events, events_in = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=_worker_main,
+            args=(tasks_out, events_in, threads, rate_limit, initializer),
+            name="pravo-worker",
+            daemon=True,
+        )
+        self.process.start()
+        # Концы каналов, переданные процессу, в родителе не нужны: EOF придёт при его завершении
+        tasks_out.close()
+        events_in.close()
+        self.ready = False
+        # Заявки, отправленные процессу и ещё не завершённые
+        self.jobs: Dict[str, Job] = {}
+
+    def close(self) -> None:
+        self.tasks.close()
+        self.events.close()
+
+
+class AgentService:
+    """Пул рабочих процессов с очередью заявок и допуском по ожиданию.
+
+    Заявки ждут в очереди родительского процесса и отправляются процессу с наименьшим
+    числом заявок в работе, пока у него есть свободные потоки.
+    """
+
+    def __init__(
+        self,
+        workers: int = SERVICE_WORKERS,
+        threads: int = SERVICE_THREADS,
+        queue_size: int = SERVICE_QUEUE,
+        max_wait: float = SERVICE_MAX_WAIT,
+        rate_limit: float = LLM_RATE_LIMIT,
+        initializer: str | None = None,
+    ) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = max(1, threads)
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.rate_limit = rate_limit
+        self.initializer = initializer
+        self._context = multiprocessing.get_context("spawn")
+        self._pool: List[_Worker] = []
+        self._pending: Deque[Job] = deque()
+        self._jobs: Dict[str, Job] = {}
+        self._changed = threading.Condition()
+        # Средние по завершённым заявкам: длительность выполнения (сек.) и число вызовов GigaChat
+        self._job_seconds: float | None = None
+        self._job_llm_calls: float | None = None
+        self._stopping = False
+        self._collector: threading.Thread | None = None
+
+    # -- процессы --
+
+    def _spawn(self) -> _Worker:
+        # Лимит GigaChat делится между процессами: в сумме сервис не превышает rate_limit
+        return _Worker(self._context, self.threads, self.rate_limit / self.workers, self.initializer)
+
+    def start(self) -> "AgentService":
+        """Запускает рабочие процессы и поток, принимающий их события."""
+        self._pool = [self._spawn() for _ in range(self.workers)]
+        self._collector = threading.Thread(target=self._collect, name="pravo-service-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Останавливает пул: выполняемые заявки дорабатывают не дольше timeout секунд."""
+        with self._changed:
+            self._stopping = True
+            for worker in self._pool:
+                for _ in range(self.threads):
+                    try:
+                        worker.tasks.send(None)
+                    except OSError:
+                        pass
+        deadline = time.monotonic() + timeout
+        for worker in self._pool:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.close()
+
+    def _dispatch(self) -> None:
+        """Отправляет ожидающие заявки процессам со свободными потоками (вызывается под self._changed)."""
+        while self._pending and not self._stopping:
+            free = [w for w in self._pool if w.process.is_alive() and len(w.jobs) < self.threads]
+            if not free:
+                return
+            worker = min(free, key=lambda w: len(w.jobs))
+            job = self._pending.popleft()
+            worker.jobs[job.id] = job
+            try:
+                worker.tasks.send((job.id, job.query))
+            except OSError:
+                # Процесс завершился: заявку вернёт в очередь _supervise
+                return
+
+    def _supervise(self) -> None:
+        """Перезапускает упавшие процессы и удаляет старые заявки.
+
+        Заявки, которые упавший процесс уже выполнял, завершаются ошибкой; отправленные,
+        но не начатые, возвращаются в начало очереди.
+        """
+        with self._changed:
+            for i, worker in enumerate(self._pool):
+                if worker.process.is_alive() or self._stopping:
+                    continue
+                print(f"Рабочий процесс {worker.process.pid} завершился (код {worker.process.exitcode}), перезапуск")
+                for job in reversed(list(worker.jobs.values())):
+                    if job.status == "running":
+                        self._finish(job, error="рабочий процесс завершился аварийно")
+                    else:
+                        self._pending.appendleft(job)
+                worker.close()
+                self._pool[i] = self._spawn()
+            expired = time.time() - SERVICE_RESULT_TTL
+            for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < expired]:
+                del self._jobs[job_id]
+            self._dispatch()
+
+    def _collect(self) -> None:
+        next_check = time.monotonic() + _SUPERVISE_INTERVAL
+        while not self._stopping:
+            workers = {worker.events: worker for worker in self._pool if not worker.events.closed}
+            for connection in wait_connections(list(workers), timeout=_SUPERVISE_INTERVAL):
+                worker = workers[connection]
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # Процесс завершился: его заявки обработает _supervise
+                    connection.close()
+                    next_check = 0.0
+                    continue
+                self._apply(worker, message)
+            if time.monotonic() >= next_check:
+                self._supervise()
+                next_check = time.monotonic() + _SUPERVISE_INTERVAL
+
+    def _apply(self, worker: _Worker, message: tuple) -> None:
+        kind, job_id, *payload = message
+        with self._changed:
+            if kind == "ready":
+                worker.ready = True
+                return
+            job = worker.jobs.get(job_id)
+            if job is None:
+                return
+            if kind == "start":
+                job.status, job.started = "running", time.time()
+            elif kind == "stage":
+                job.events.append({"type": "stage", "node": payload[0]})
+            elif kind == "token":
+                job.events.append({"type": "token", "node": payload[0], "token": payload[1]})
+            elif kind == "done":
+                self._finish(job, result=payload[0])
+            elif kind == "error":
+                self._finish(job, error=payload[0])
+            if job.done:
+                del worker.jobs[job_id]
+                self._dispatch()
+            self._changed.notify_all()
+
+    def _finish(self, job: Job, result: Dict[str, Any] | None = None, error: str | None = None) -> None:
+        """Завершает заявку (вызывается под self._changed) и обновляет средние для оценки ожидания."""
+        job.finished = time.time()
+        job.started = job.started or job.finished
+        if error is not None:
+            job.status, job.error = "error", error
+            job.events.append({"type": "error", "error": error})
+        else:
+            job.status, job.result = "done", result
+            job.events.append({"type": "done", "result": result})
+            llm_calls = (result.get("metrics") or {}).get("llm", {}).get("calls", 0)
+            self._job_seconds = _ewma(self._job_seconds, job.finished - job.started)
+            self._job_llm_calls = _ewma(self._job_llm_calls, llm_calls)
+        self._changed.notify_all()
+
+    # -- заявки --
+
+    def _counts(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0}
+        for job in self._jobs.values():
+            if job.status in counts:
+                counts[job.status] += 1
+        return counts
+
+    def estimated_wait(self) -> float:
+        """Расчётное ожидание новой заявки в очереди, сек. (0 — пока нет завершённых заявок)."""
+        counts = self._counts()
+        wait = 0.0
+        if self._job_seconds is not None:
+            wait = counts["queued"] / (self.workers * self.threads) * self._job_seconds
+        if self._job_llm_calls is not None and self.rate_limit > 0:
+            # Вызовы GigaChat заявок в очереди и в работе при общем лимите rate_limit в секунду
+            wait = max(wait, (counts["queued"] + counts["running"]) * self._job_llm_calls / self.rate_limit)
+        return wait
+
+    def submit(self, query: str) -> Job:
+        """Ставит заявку в очередь; Overloaded — заявка не принята."""
+        with self._changed:
+            if self._stopping:
+                raise Overloaded("сервис останавливается", _SUPERVISE_INTERVAL)
+            if self._counts()["queued"] >= self.queue_size:
+                raise Overloaded("очередь заявок заполнена", self._job_seconds or _SUPERVISE_INTERVAL)
+            wait = self.estimated_wait()
+            if wait > self.max_wait:
+                raise Overloaded(f"расчётное ожидание {wait:.0f} с", wait - self.max_wait)
+            job = Job(query)
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._dispatch()
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def wait(self, job: Job, timeout: float | None = None) -> bool:
+        """Ждёт завершения заявки не дольше timeout секунд; True — заявка завершена."""
+        with self._changed:
+            return self._changed.wait_for(lambda: job.done, timeout)
+
+    def stream(self, job: Job, heartbeat: float = 15.0) -> Iterator[Dict[str, Any] | None]:
+        """События заявки по мере поступления; None — событий не было heartbeat секунд."""
+        position = 0
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: len(job.events) > position, heartbeat)
+                events = job.events[position:]
+            position += len(events)
+            if not events:
+                yield None
+            for event in events:
+                yield event
+                if event["type"] in ("done", "error"):
+                    return
+
+    def health(self) -> Dict[str, Any]:
+        with self._changed:
+            counts = self._counts()
+            wait = self.estimated_wait()
+            alive = sum(worker.process.is_alive() for worker in self._pool)
+            ready = sum(worker.ready for worker in self._pool)
+        return {
+            "workers": self.workers,
+            "threads": self.threads,
+            "alive": alive,
+            "ready": ready,
+            **counts,
+            "queue_size": self.queue_size,
+            "estimated_wait": round(wait, 3),
+            "job_seconds": self._job_seconds and round(self._job_seconds, 3),
+            "job_llm_calls": self._job_llm_calls and round(self._job_llm_calls, 2),
+        }
+
+
+def _ewma(previous: float | None, value: float) -> float:
+    return value if previous is None else previous + _EWMA_ALPHA * (value - previous)
+
+
+def serve(service: AgentService, port: int = SERVICE_PORT, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """HTTP/JSON API сервиса (см. описание модуля); сервер обслуживается вызывающим (serve_forever)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, data: Dict[str, Any], headers: Dict[str, str] | None = None) -> None:
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id: str) -> Job | None:
+            job = service.get(job_id)
+            if job is None:
+                self._send_json(404, {"error": "заявка не найдена"})
+            return job
+
+        def do_POST(self) -> None:
+            if urlparse(self.path).path != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            except ValueError:
+                payload = None
+            query = payload.get("query") if isinstance(payload, dict) else None
+            if not isinstance(query, str) or not query.strip():
+                self._send_json(400, {"error": "ожидается JSON {\"query\": \"...\"}"})
+                return
+            try:
+                job = service.submit(query.strip())
+            except Overloaded as e:
+                retry_after = max(1, round(e.retry_after))
+                self._send_json(429, {"error": str(e), "retry_after": retry_after}, {"Retry-After": str(retry_after)})
+                return
+            self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["health"]:
+                self._send_json(200, service.health())
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = self._job(parts[1])
+                if job:
+                    self._send_json(200, job.to_dict())
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+                job = self._job(parts[1])
+                if job:
+                    timeout = float(parse_qs(url.query).get("timeout", ["30"])[0])
+                    done = service.wait(job, timeout)
+                    self._send_json(200 if done else 202, job.to_dict())
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "stream":
+                job = self._job(parts[1])
+                if job:
+                    self._stream(job)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def _stream(self, job: Job) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.end_headers()
+            try:
+                for event in service.stream(job):
+                    # Пустая строка — проверка соединения при долгом выполнении узла
+                    line = json.dumps(event, ensure_ascii=False) if event else ""
+                    self.wfile.write(line.encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Сервис юридического агента с пулом рабочих процессов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="рабочих процессов (0 — по числу ядер)")
+    parser.add_argument("--threads", type=int, default=SERVICE_THREADS, help="одновременных заявок на процесс")
+    parser.add_argument("--init", help="функция «модуль:имя», вызываемая в каждом рабочем процессе до прогрева")
+    args = parser.parse_args(argv)
+
+    service = AgentService(workers=args.workers, threads=args.threads, initializer=args.init).start()
+    server = serve(service, args.port, args.host)
+    print(f"Сервис: http://{args.host}:{args.port} ({service.workers} процессов × {service.threads} потоков)")
+    # SIGTERM (остановка сервиса) завершает пул так же, как Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
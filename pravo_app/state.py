@@ -3,13 +3,31 @@
 
 Определяет TypedDict для LangGraph: все поля, передаваемые между узлами
 графа состояний. Аннотация Annotated[List, add] задаёт редуктор для слияния
-списков при обновлении состояния.
+списков при обновлении состояния; docs сливаются с дедупликацией (dedup.merge_docs).
 """
 from operator import add
-from typing import Any, Dict, List, Optional, Tuple, Annotated
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Annotated
 
 from typing_extensions import TypedDict
 
+from .dedup import merge_docs
+from .memory import window_messages
+
+
+class Doc(TypedDict, total=False):
+    """Документ в состоянии графа: только то, что нужно для RAG и ссылок."""
+
+    # Название документа / страницы
+    title: str
+    # Ссылка на источник
+    href: str
+    # Извлечённый текст
+    doc_text: str
+    # SHA-256 doc_text — идентификатор содержимого
+    doc_hash: str
+    # Ссылка на сырой HTML во внешнем хранилище (blobs.py), если PRAVO_KEEP_HTML=1
+    html_ref: str
+
 
 class MyState(TypedDict):
     """Состояние агента: входные данные, промежуточные и итоговые результаты."""
@@ -18,8 +36,9 @@ class MyState(TypedDict):
     query: str
     # Текущая поисковая фраза после переформулировки/уточнений
     search_query: Optional[str]
-    # История диалога: (роль, текст). Используется для конденсации контекста
-    messages: Annotated[List[Tuple[str, str]], add]
+    # История диалога: (роль, текст). Используется для конденсации контекста.
+    # Ограничена окном PRAVO_MESSAGES_WINDOW (старые сообщения — в сводке), выводы инструментов — ссылками (memory)
+    messages: Annotated[List[Tuple[str, str]], window_messages]
     # Вопрос уточнения, сформированный LLM (если need_clarify_question)
     clarification: Optional[str]
     # Ответ пользователя на уточняющий вопрос
@@ -28,8 +47,16 @@ class MyState(TypedDict):
     need_clarify_question: Optional[bool]
     # Категория запроса: "НПА" или "Судебное"
     category: Optional[str]
-    # Результаты поиска документов (сырые данные провайдера)
-    docs: Annotated[List[Dict], add]
+    # search_query, для которого определена category (классификация этого запроса не повторяется)
+    category_query: Optional[str]
+    # Результат спекулятивной ветки clarify_node (PRAVO_SPECULATIVE=1): query, search_query, category, docs
+    speculation: Optional[Dict[str, Any]]
+    # Результаты поиска документов всех циклов (облегчённое представление, без сырого HTML).
+    # Повторно найденные страницы и почти-дубликаты не добавляются (dedup.merge_docs)
+    docs: Annotated[List[Doc], merge_docs]
+    # Всего документов, возвращённых поиском за прогон, до дедупликации: нарастающий итог —
+    # поисковые узлы добавляют число своих результатов (для re_search.new_source_share)
+    retrieved_total: Annotated[int, add]
     # Черновые ответы RAG по каждому циклу поиска
     answers: Annotated[List[Any], add]
     # Итоговый ответ пользователю
@@ -44,3 +71,16 @@ class MyState(TypedDict):
     verbose: Optional[bool]
     # Пакетный режим: автоответ без запроса к пользователю при недостатке данных
     batch_mode: Optional[bool]
+    # События инструментирования (время узлов, вызовы LLM и поиска), см. metrics.summarize
+    metrics: Annotated[List[Dict[str, Any]], add]
+    # Сводка прогона (metrics.summarize), заполняется узлом финального ответа
+    metrics_summary: Optional[Dict[str, Any]]
+
+
+def update_value(update: Mapping[str, Any], field: str, default: Any = None) -> Any:
+    """Значение поля из обновления узла (graph.stream, stream_mode="updates").
+
+    setup_node сбрасывает поля с редукторами, записывая Overwrite(значение): обёртка разворачивается.
+    """
+    value = update.get(field, default)
+    return getattr(value, "value", value)
@@ -0,0 +1,21 @@
+"""Общие фикстуры тестов."""
+import pytest
+
+from pravo_app import llm
+from pravo_app.search import set_search_provider
+
+from .offline import install, load_corpus
+
+
+@pytest.fixture(scope="session")
+def corpus():
+    return load_corpus()
+
+
+@pytest.fixture
+def offline(corpus):
+    """Граф работает со стендами bench; возвращает корпус (записи — corpus.items)."""
+    previous_client, previous_provider = install(corpus)
+    yield corpus
+    llm.set_client(previous_client)
+    set_search_provider(previous_provider)
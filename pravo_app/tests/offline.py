@@ -0,0 +1,25 @@
+"""Стенды GigaChat и поиска из bench для тестов: без сети и учётных данных."""
+import os
+from typing import Any, Tuple
+
+from pravo_app import llm
+from pravo_app.bench import RECORDS_MASK, REQUESTS_PATH, BenchSearchProvider, Corpus, Latency, ReplayGigaChat
+from pravo_app.search import set_search_provider
+
+# Корень проекта: пути корпуса в bench заданы относительно него
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_corpus() -> Corpus:
+    return Corpus.load(os.path.join(ROOT, REQUESTS_PATH), os.path.join(ROOT, RECORDS_MASK))
+
+
+def install(corpus: Corpus | None = None) -> Tuple[Any, Any]:
+    """Подменяет клиент GigaChat и поиск стендами без задержек; возвращает прежние (клиент, провайдер).
+
+    Без аргументов годится как initializer рабочих процессов service (--init).
+    """
+    corpus = corpus or load_corpus()
+    previous_client = llm.set_client(ReplayGigaChat(corpus, Latency(0, 0), re_search_rate=0.0))
+    previous_provider = set_search_provider(BenchSearchProvider(corpus, Latency(0, 0)))
+    return previous_client, previous_provider
@@ -0,0 +1,34 @@
+"""Асинхронный путь: graph.ainvoke, aask_giga и асинхронные провайдеры дают тот же результат, что синхронные."""
+import asyncio
+
+from pravo_app.checkpoint import thread_config
+from pravo_app.graph import graph
+from pravo_app.llm import aask_giga, ask_giga
+from pravo_app.search import acall_npa_api, call_npa_api
+
+
+def node_names(state):
+    return [event["name"] for event in state["metrics"] if event["kind"] == "node"]
+
+
+def test_ainvoke_matches_invoke(offline):
+    item = offline.items[0]
+    state = {"query": item["запрос"], "batch_mode": True, "verbose": False}
+    sync_state = graph.invoke(dict(state), thread_config("test-sync"))
+    async_state = asyncio.run(graph.ainvoke(dict(state), thread_config("test-async")))
+    assert async_state["final_answer"] == sync_state["final_answer"]
+    assert async_state["search_query"] == sync_state["search_query"]
+    assert node_names(async_state) == node_names(sync_state)
+
+
+def test_aask_giga_matches_ask_giga(offline):
+    prompt = "Определи категорию запроса.\n[Вопрос]: " + offline.items[0]["запрос"]
+    assert asyncio.run(aask_giga(prompt, "GigaChat")) == ask_giga(prompt, "GigaChat")
+
+
+def test_async_search_matches_sync(offline):
+    query = offline.items[0]["тема"]
+    sync_docs = call_npa_api(query, 2)
+    async_docs = asyncio.run(acall_npa_api(query, 2))
+    assert sync_docs
+    assert [doc["href"] for doc in async_docs] == [doc["href"] for doc in sync_docs]
@@ -0,0 +1,113 @@
+"""Пакетная обработка: возобновление по журналу, повреждённые строки, ошибки элементов и лимит частоты."""
+import asyncio
+
+from pravo_app import ratelimit
+from pravo_app.batch import BatchJournal, run_batch
+from pravo_app.ratelimit import RateLimiter
+
+ITEMS = [{"no": i, "запрос": f"вопрос {i}"} for i in range(1, 6)]
+
+
+def process(item):
+    return {"no": item["no"], "ответ": item["запрос"].upper()}
+
+
+def run(path, func=process, items=ITEMS):
+    return run_batch(items, func, str(path), key=lambda item: item["no"], record_key="no", workers=2)
+
+
+def test_results_in_input_order(tmp_path):
+    records = run(tmp_path / "journal.jsonl")
+    assert [r["no"] for r in records] == [1, 2, 3, 4, 5]
+    assert records[0]["ответ"] == "ВОПРОС 1"
+
+
+def test_resume_skips_journaled_items(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    run(path, items=ITEMS[:2])
+    processed = []
+    records = run(path, func=lambda item: processed.append(item["no"]) or process(item))
+    assert sorted(processed) == [3, 4, 5]
+    assert [r["no"] for r in records] == [1, 2, 3, 4, 5]
+    assert len(BatchJournal(str(path), "no").load()) == 5
+
+
+def test_failed_item_is_retried_next_run(tmp_path):
+    path = tmp_path / "journal.jsonl"
+
+    def flaky(item):
+        if item["no"] == 3:
+            raise RuntimeError("таймаут GigaChat")
+        return process(item)
+
+    assert [r["no"] for r in run(path, func=flaky)] == [1, 2, 4, 5]
+    processed = []
+    records = run(path, func=lambda item: processed.append(item["no"]) or process(item))
+    assert processed == [3]
+    assert [r["no"] for r in records] == [1, 2, 3, 4, 5]
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    run(path, items=ITEMS[:2])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"no": 3, "отв')
+    journal = BatchJournal(str(path), "no")
+    assert journal.done_keys() == {1, 2}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_rate_limiter_spaces_requests(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    limiter = RateLimiter(rate=2.0, burst=2)
+    for _ in range(6):
+        limiter.acquire()
+    # Всплеск из 2 запросов сразу, затем по одному каждые 0.5 с
+    assert clock.now == 2.0
+
+
+def test_rate_limiter_refills_and_is_shared(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    limiter = RateLimiter(rate=1.0)
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 1.0
+    assert limiter.reserve() == 2.0
+    clock.now = 10.0
+    assert limiter.reserve() == 0.0
+
+
+def test_rate_limiter_async(monkeypatch):
+    clock = FakeClock()
+    delays = []
+
+    async def fake_sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(ratelimit.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(rate=4.0)
+
+    async def burst():
+        for _ in range(3):
+            await limiter.aacquire()
+
+    asyncio.run(burst())
+    assert delays == [0.25, 0.5]
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(rate=0)
+    assert [limiter.reserve() for _ in range(100)] == [0.0] * 100
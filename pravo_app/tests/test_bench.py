@@ -0,0 +1,62 @@
+"""Бенчмарк: типы промптов, стенд GigaChat, перцентили, сравнение с baseline и короткий прогон."""
+import random
+
+from pravo_app import llm, prompts
+from pravo_app.bench import Latency, ReplayGigaChat, compare, percentiles, prompt_kind, run_benchmark
+from pravo_app.search import set_search_provider
+
+
+def test_latency():
+    assert Latency.parse("0.8:0.4").sigma == 0.4
+    assert Latency.parse("0.3").sigma == 0.5
+    assert Latency(0).sample(random.Random(0)) == 0.0
+    samples = sorted(Latency(0.1, 0.3).sample(random.Random(i)) for i in range(201))
+    assert 0.08 < samples[100] < 0.12
+
+
+def test_prompt_kind():
+    query = "Как взыскать ущерб?"
+    assert prompt_kind(prompts.clarification_prompt.format(query=query)) == "clarify"
+    assert prompt_kind(prompts.clarification_prompt_batch.format(query=query)) == "batch_clarify"
+    assert prompt_kind(prompts.query_rewrite_classify_prompt.format(query=query)) == "rewrite_classify"
+    assert prompt_kind("произвольный текст") is None
+
+
+def test_replay_replies_from_corpus(corpus):
+    client = ReplayGigaChat(corpus, Latency(0), re_search_rate=0.0)
+    item = next(item for item in corpus.items if item.get("ответ"))
+    assert client.reply(prompts.query_rewrite_prompt.format(query=item["запрос"])) == item["тема"]
+    assert client.reply(prompts.classification_prompt.format(query=item["тема"])) in ("НПА", "Судебное")
+
+
+def test_percentiles():
+    stats = percentiles([float(i) for i in range(1, 101)])
+    assert (stats["count"], stats["p50"], stats["p95"], stats["p99"]) == (100, 50.0, 95.0, 99.0)
+    assert percentiles([])["p95"] == 0.0
+
+
+def test_compare_reports_p95_regressions():
+    def run(p95):
+        return {"sessions": 1, "end_to_end": {"p95": p95}, "nodes": {"answer_node": {"p95": p95}}}
+
+    baseline = {"runs": [run(1.0)]}
+    assert compare({"runs": [run(1.05)]}, baseline, tolerance=0.1) == []
+    problems = compare({"runs": [run(1.5)]}, baseline, tolerance=0.1)
+    assert len(problems) == 2 and "answer_node" in problems[1]
+
+
+def test_run_benchmark_restores_stubs(corpus):
+    client, provider = object(), object()
+    previous_client = llm.set_client(client)
+    previous_provider = set_search_provider(provider)
+    try:
+        report = run_benchmark(corpus, sessions=2, limit=3, llm_latency=Latency(0), search_latency=Latency(0))
+        assert llm.set_client(client) is client
+        assert set_search_provider(provider) is provider
+    finally:
+        llm.set_client(previous_client)
+        set_search_provider(previous_provider)
+    assert report["requests"] == 3
+    assert report["end_to_end"]["count"] == 3
+    assert report["llm_calls"] > 0
+    assert "final_answer_node" in report["nodes"]
@@ -0,0 +1,31 @@
+"""Хранилище blobs: параллельная запись одной и той же страницы."""
+import os
+import threading
+
+from pravo_app.blobs import BlobStore
+
+
+def test_concurrent_put_of_same_blob(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = "<html>" + "страница " * 50000 + "</html>"
+    barrier = threading.Barrier(8)
+    refs, errors = [], []
+
+    def put():
+        barrier.wait()
+        try:
+            refs.append(store.put(data))
+        except Exception as e:  # noqa: BLE001 — любая ошибка записи проваливает тест
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(set(refs)) == 1
+    assert store.get(refs[0]) == data
+    leftovers = [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
+    assert leftovers == []
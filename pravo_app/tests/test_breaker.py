@@ -0,0 +1,73 @@
+"""CircuitBreaker: переходы closed → open → half-open."""
+import pytest
+
+from pravo_app import breaker as breaker_module
+from pravo_app.breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker_module.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow() and not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.is_open
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 2
+    assert not breaker.is_open
+    assert breaker.allow()  # пробный вызов
+    assert not breaker.allow()  # пока он выполняется, остальные идут в резерв
+
+
+def test_trial_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.is_open
+
+
+def test_trial_failure_reopens_for_full_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 11
+    assert breaker.allow()
+    breaker.record_failure()  # одной ошибки пробного вызова достаточно
+    assert breaker.is_open and not breaker.allow()
+    clock.now += 9
+    assert not breaker.allow()
+    clock.now += 2
+    assert breaker.allow()
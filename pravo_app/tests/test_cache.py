@@ -0,0 +1,93 @@
+"""DiskCache: TTL, вытеснение по LRU и счётчики."""
+import pytest
+
+from pravo_app import cache as cache_module
+from pravo_app.cache import DiskCache, make_key
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_get_set_and_stats(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "c.sqlite"))
+    assert cache.get("k") is None
+    cache.set("k", {"text": "ответ", "n": [1, 2]})
+    assert cache.get("k") == {"text": "ответ", "n": [1, 2]}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] > 0
+
+
+def test_entry_expires_after_ttl(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl=60)
+    cache.set("k", "v")
+    clock.now += 59
+    assert cache.get("k") == "v"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_touch_extends_ttl(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl=60)
+    cache.set("k", "v")
+    clock.now += 50
+    cache.touch("k")
+    clock.now += 50
+    assert cache.get("k") == "v"
+
+
+def test_evict_removes_expired_entries(tmp_path, clock):
+    cache = DiskCache(str(tmp_path / "c.sqlite"), ttl=60)
+    cache.set("old", "v")
+    clock.now += 30
+    cache.set("new", "v")
+    clock.now += 40
+    cache.evict()
+    assert cache.stats()["entries"] == 1
+    assert cache.get("new") == "v"
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path, clock):
+    value = "x" * 100
+    cache = DiskCache(str(tmp_path / "c.sqlite"), max_bytes=350)
+    for key in ("a", "b", "c", "d"):
+        clock.now += 1
+        cache.set(key, value)
+    clock.now += 1
+    assert cache.get("a") == value  # a снова используется — b становится самой старой
+
+    cache.evict()
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in ("a", "c", "d")] == [True, True, True]
+    assert cache.stats()["bytes"] <= 350
+
+
+def test_eviction_runs_periodically_on_set(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(cache_module, "EVICT_EVERY", 3)
+    cache = DiskCache(str(tmp_path / "c.sqlite"), max_bytes=250)
+    for key in ("a", "b"):
+        clock.now += 1
+        cache.set(key, "x" * 100)
+    assert cache.stats()["entries"] == 2
+    clock.now += 1
+    cache.set("c", "x" * 100)  # третья запись запускает вытеснение
+    assert cache.stats()["entries"] == 2
+    assert cache.get("a") is None
+
+
+def test_make_key_is_stable_and_order_independent():
+    assert make_key("p", {"a": 1, "b": 2}) == make_key("p", {"b": 2, "a": 1})
+    assert make_key("p", "m1") != make_key("p", "m2")
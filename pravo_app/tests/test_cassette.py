@@ -0,0 +1,52 @@
+"""Кассеты GigaChat: запись и воспроизведение без сети и учётных данных."""
+from types import SimpleNamespace
+
+import pytest
+
+from pravo_app import llm
+from pravo_app.cassette import CassetteMiss, use_cassette
+
+
+class FakeGigaChat:
+    """Клиент GigaChat с детерминированными ответами и счётчиком вызовов."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, payload):
+        self.calls += 1
+        text = f"ответ на: {payload.messages[-1].content}"
+        usage = SimpleNamespace(prompt_tokens=3, completion_tokens=4)
+        return SimpleNamespace(usage=usage, model_dump=lambda: {"choices": [{"message": {"content": text}}]})
+
+    def embeddings(self, texts, model):
+        self.calls += 1
+        items = [SimpleNamespace(index=i, embedding=[float(len(t)), float(i)]) for i, t in enumerate(texts)]
+        return SimpleNamespace(data=list(reversed(items)))
+
+
+@pytest.fixture
+def fake_client():
+    client = FakeGigaChat()
+    previous = llm.set_client(client)
+    yield client
+    llm.set_client(previous)
+
+
+def test_replay_without_api_key(tmp_path, fake_client, monkeypatch):
+    path = str(tmp_path / "run.jsonl.gz")
+    with use_cassette(path, "record"):
+        answer = llm.ask_giga("вопрос", "GigaChat")
+        vectors = llm.embed_texts(["аб", "абв"])
+    assert fake_client.calls == 2
+    assert vectors == [[2.0, 0.0], [3.0, 1.0]]
+
+    # Без клиента и без ключа: создание GigaChat завершилось бы KeyError
+    llm.set_client(None)
+    monkeypatch.delenv("GIGACHAT_API_KEY", raising=False)
+    with use_cassette(path, "replay"):
+        assert llm.ask_giga("вопрос", "GigaChat") == answer
+        assert llm.embed_texts(["аб", "абв"]) == vectors
+        with pytest.raises(CassetteMiss):
+            llm.ask_giga("другой вопрос", "GigaChat")
+    assert fake_client.calls == 2
@@ -0,0 +1,183 @@
+"""SqliteCheckpointer: контрольные точки, продолжение сессий, очистка."""
+import asyncio
+import operator
+import sqlite3
+from typing import Annotated, List
+
+import pytest
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+from typing_extensions import TypedDict
+
+from pravo_app.checkpoint import SqliteCheckpointer, resume_input, thread_config
+
+
+class State(TypedDict):
+    query: str
+    steps: Annotated[List[str], operator.add]
+    answer: str
+
+
+def build_graph(checkpointer, fail_once=None, ask=False):
+    """Граф first → second → final; second может упасть один раз, final — спросить пользователя."""
+
+    def first(state):
+        return {"steps": ["first"]}
+
+    def second(state):
+        if fail_once is not None and not fail_once.get("failed"):
+            fail_once["failed"] = True
+            raise RuntimeError("сбой")
+        return {"steps": ["second"]}
+
+    def final(state):
+        answer = interrupt("Уточните вопрос") if ask else "готово"
+        return {"steps": ["final"], "answer": answer}
+
+    builder = StateGraph(State)
+    for node in (first, second, final):
+        builder.add_node(node.__name__, node)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", "final")
+    builder.add_edge("final", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite")
+
+
+def count(db_path, table, thread_id):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def test_put_get_tuple_list_round_trip(db_path):
+    saver = SqliteCheckpointer(db_path, keep=0, ttl=None)
+    config = {"configurable": {"thread_id": "t", "checkpoint_ns": ""}}
+    first = create_checkpoint(empty_checkpoint(), None, 1)
+    first["channel_values"] = {"query": "вопрос", "steps": ["a"]}
+    first["channel_versions"] = {"query": "1", "steps": "1"}
+    config1 = saver.put(config, first, {"source": "input", "step": -1}, {"query": "1", "steps": "1"})
+
+    second = create_checkpoint(first, None, 2)
+    second["channel_values"] = {"query": "вопрос", "steps": ["a", "b"]}
+    second["channel_versions"] = {"query": "1", "steps": "2"}
+    config2 = saver.put(config1, second, {"source": "loop", "step": 0}, {"steps": "2"})
+    saver.put_writes(config2, [("steps", ["c"])], task_id="task")
+
+    latest = saver.get_tuple(config)
+    assert latest.config == config2
+    assert latest.parent_config == config1
+    # Неизменившийся канал query берётся из значения, сохранённого с первой точкой
+    assert latest.checkpoint["channel_values"] == {"query": "вопрос", "steps": ["a", "b"]}
+    assert latest.metadata["source"] == "loop"
+    assert latest.pending_writes == [("task", "steps", ["c"])]
+    assert saver.get_tuple(config1).checkpoint["channel_values"]["steps"] == ["a"]
+
+    assert [item.config for item in saver.list(config)] == [config2, config1]
+    assert [item.config for item in saver.list(config, limit=1)] == [config2]
+    assert [item.config for item in saver.list(config, before=config2)] == [config1]
+    assert [item.config for item in saver.list(config, filter={"source": "input"})] == [config1]
+    assert saver.get_tuple({"configurable": {"thread_id": "other"}}) is None
+
+
+def test_graph_state_survives_restart(db_path):
+    config = thread_config("t")
+    build_graph(SqliteCheckpointer(db_path)).invoke({"query": "вопрос"}, config)
+    graph = build_graph(SqliteCheckpointer(db_path))
+    snapshot = graph.get_state(config)
+    assert snapshot.values["steps"] == ["first", "second", "final"]
+    assert snapshot.values["answer"] == "готово"
+    assert not snapshot.next
+    # Завершённая сессия: новый прогон начинается с переданного состояния
+    assert resume_input(graph, {"query": "вопрос"}, config) == {"query": "вопрос"}
+
+
+def test_interrupt_and_resume_after_restart(db_path):
+    config = thread_config("t")
+    graph = build_graph(SqliteCheckpointer(db_path), ask=True)
+    graph.invoke({"query": "вопрос"}, config)
+    assert graph.get_state(config).next == ("final",)
+
+    graph = build_graph(SqliteCheckpointer(db_path), ask=True)
+    questions = []
+    graph_input = resume_input(graph, {"query": "вопрос"}, config, answer=lambda q: questions.append(q) or "ответ")
+    assert isinstance(graph_input, Command)
+    assert questions == ["Уточните вопрос\n> "]
+    state = graph.invoke(graph_input, config)
+    assert state["answer"] == "ответ"
+    assert state["steps"] == ["first", "second", "final"]
+
+
+def test_resume_after_failure_skips_completed_nodes(db_path):
+    config = thread_config("t")
+    fail_once = {}
+    graph = build_graph(SqliteCheckpointer(db_path), fail_once=fail_once)
+    with pytest.raises(RuntimeError):
+        graph.invoke({"query": "вопрос"}, config)
+
+    graph = build_graph(SqliteCheckpointer(db_path), fail_once=fail_once)
+    assert resume_input(graph, {"query": "вопрос"}, config) is None
+    state = graph.invoke(None, config)
+    # first не выполнялся повторно
+    assert state["steps"] == ["first", "second", "final"]
+
+
+def test_keep_prunes_old_checkpoints_and_unused_blobs(db_path):
+    config = thread_config("t")
+    unlimited = str(db_path) + ".all"
+    build_graph(SqliteCheckpointer(unlimited, keep=0)).invoke({"query": "вопрос"}, config)
+    saver = SqliteCheckpointer(db_path, keep=2)
+    graph = build_graph(saver)
+    graph.invoke({"query": "вопрос"}, config)
+
+    assert count(unlimited, "checkpoints", "t") > 2
+    assert count(db_path, "checkpoints", "t") == 2
+    assert count(db_path, "blobs", "t") < count(unlimited, "blobs", "t")
+    assert graph.get_state(config).values["steps"] == ["first", "second", "final"]
+    assert len(list(saver.list(config))) == 2
+
+
+def test_prune_and_delete_threads(db_path):
+    saver = SqliteCheckpointer(db_path, keep=0)
+    graph = build_graph(saver)
+    for thread_id in ("a", "b"):
+        graph.invoke({"query": "вопрос"}, thread_config(thread_id))
+
+    saver.prune(["a"])
+    assert count(db_path, "checkpoints", "a") == 1
+    assert graph.get_state(thread_config("a")).values["answer"] == "готово"
+    saver.prune(["b"], strategy="delete")
+    assert count(db_path, "checkpoints", "b") == 0
+    saver.delete_thread("a")
+    assert count(db_path, "checkpoints", "a") == 0 and count(db_path, "blobs", "a") == 0
+
+
+def test_expired_threads_deleted_on_open(db_path):
+    graph = build_graph(SqliteCheckpointer(db_path, keep=0, ttl=None))
+    graph.invoke({"query": "вопрос"}, thread_config("old"))
+    graph.invoke({"query": "вопрос"}, thread_config("new"))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE checkpoints SET created_at = created_at - 7200 WHERE thread_id = 'old'")
+
+    saver = SqliteCheckpointer(db_path, keep=0, ttl=3600)
+    assert count(db_path, "checkpoints", "old") == 0
+    assert count(db_path, "checkpoints", "new") > 0
+    assert saver.delete_expired() == 0
+
+
+def test_async_api(db_path):
+    saver = SqliteCheckpointer(db_path)
+    graph = build_graph(saver)
+    config = thread_config("t")
+
+    async def run():
+        await graph.ainvoke({"query": "вопрос"}, config)
+        return [item async for item in saver.alist(config)]
+
+    items = asyncio.run(run())
+    assert items and items[0].checkpoint["channel_values"]["answer"] == "готово"
@@ -0,0 +1,64 @@
+"""Редуктор docs (dedup.merge_docs) и повторное использование документов сессии."""
+from pravo_app.dedup import known_text, merge_docs, session_documents
+from pravo_app.search import make_doc
+
+ARTICLE = " ".join(
+    f"Статья {i}. Собственник вправе по своему усмотрению совершать в отношении принадлежащего ему "
+    f"имущества любые действия {i * 7}, не противоречащие закону и иным правовым актам"
+    for i in range(40)
+)
+
+
+def titles(docs):
+    return [doc["title"] for doc in docs]
+
+
+def test_docs_without_hash_are_not_collapsed():
+    left = [{"title": "a", "href": "https://a.ru/1", "doc_text": "договор аренды нежилого помещения"}]
+    right = [
+        {"title": "b", "href": "https://b.ru/2", "doc_text": "срок исковой давности по взысканию долга"},
+        {"title": "c", "href": "https://c.ru/3", "doc_text": "расторжение брака через суд при наличии детей"},
+    ]
+    assert titles(merge_docs(left, right)) == ["a", "b", "c"]
+
+
+def test_docs_without_hash_deduplicated_by_text():
+    left = [{"title": "a", "href": "https://a.ru/1", "doc_text": "одинаковый текст документа"}]
+    right = [{"title": "b", "href": "https://b.ru/2", "doc_text": "одинаковый текст документа"}]
+    assert titles(merge_docs(left, right)) == ["a"]
+
+
+def test_same_url_is_dropped():
+    left = [make_doc("a", "https://www.consultant.ru/document/1/", "первый текст")]
+    right = [make_doc("b", "http://consultant.ru/document/1#part", "другой текст")]
+    assert titles(merge_docs(left, right)) == ["a"]
+
+
+def test_near_duplicate_from_mirror_is_dropped():
+    left = [make_doc("consultant", "https://consultant.ru/209", ARTICLE)]
+    right = [
+        make_doc("garant", "https://base.garant.ru/209", "Меню сайта. " + ARTICLE + " Контакты."),
+        make_doc("other", "https://other.ru", "Арендатор обязан своевременно вносить плату за пользование " * 10),
+    ]
+    assert titles(merge_docs(left, right)) == ["consultant", "other"]
+
+
+def test_empty_page_is_refilled():
+    left = [make_doc("empty", "https://x.ru/p", "")]
+    right = [make_doc("full", "https://x.ru/p/", "текст страницы, загруженной со второй попытки")]
+    assert titles(merge_docs(left, right)) == ["full"]
+    assert titles(merge_docs(right, left)) == ["full"]
+
+
+def test_empty_docs_without_url_are_kept():
+    right = [make_doc("Ошибка", "", ""), make_doc("Ничего не найдено", "", "")]
+    assert titles(merge_docs([], right)) == ["Ошибка", "Ничего не найдено"]
+
+
+def test_known_text_only_inside_session():
+    docs = [make_doc("a", "https://www.consultant.ru/a/", "текст")]
+    assert known_text("https://consultant.ru/a") is None
+    with session_documents(docs):
+        assert known_text("http://consultant.ru/a") == "текст"
+        assert known_text("https://consultant.ru/b") is None
+    assert known_text("https://consultant.ru/a") is None
@@ -0,0 +1,113 @@
+"""Извлечение текста: предфильтр, shared memory, пул процессов и возврат в вызывающий поток."""
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import pytest
+
+from pravo_app import extract
+from pravo_app.metrics import instrument
+
+ARTICLE = " ".join(["Собственник квартиры отвечает за ущерб, причинённый заливом соседей."] * 40)
+HTML = (
+    "<html><head><title>Залив</title><style>p {color: red}</style></head><body>"
+    "<nav>Главная | Контакты</nav><script>var tracker = 1;</script><!-- реклама -->"
+    f"<article><h1>Ответственность за залив</h1><p>{ARTICLE}</p><p>{ARTICLE}</p></article>"
+    "</body></html>"
+)
+
+
+def extract_events(html):
+    """(текст, события extract) — вызов внутри инструментированного узла."""
+    update = instrument(lambda state: {"text": extract.extract_text(html)}, "node")({})
+    return update["text"], [event for event in update["metrics"] if event["kind"] == "extract"]
+
+
+class FakePool:
+    """Пул, чьи задачи не завершаются или завершаются ошибкой."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.shut_down = False
+
+    def submit(self, *args):
+        future = Future()
+        if self.error is not None:
+            future.set_exception(self.error)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_strip_html():
+    stripped = extract.strip_html('a<SCRIPT type="x">1</script >b<!-- c -->d<nav>e</nav>f<svg><path/></svg>g')
+    assert stripped.replace(" ", "") == "abdfg"
+
+
+def test_strip_html_keeps_unclosed_elements():
+    assert extract.strip_html("a<script>b<!--c") == "a<script>b<!--c"
+    assert extract.strip_html("<style>x</style><script>y") == " <script>y"
+
+
+def test_strip_html_unclosed_is_linear():
+    started = time.perf_counter()
+    extract.strip_html("<script>" * 50_000 + "<!--" * 50_000)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_extract_shared_reads_shared_memory():
+    data = HTML.encode("utf-8")
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        text = extract._extract_shared(shm.name, len(data))
+    finally:
+        shm.close()
+        shm.unlink()
+    assert "Собственник квартиры" in text
+    assert "tracker" not in text
+
+
+def test_extract_in_pool(monkeypatch):
+    monkeypatch.setattr(extract, "EXTRACT_INLINE_KB", 0)
+    try:
+        text, events = extract_events(HTML)
+    finally:
+        pool = extract._pool
+        if pool is not None:
+            extract._reset_pool(pool)
+    assert "Собственник квартиры" in text
+    assert events[0]["mode"] == "pool"
+
+
+def test_small_page_inline():
+    text, events = extract_events(HTML)
+    assert "Собственник квартиры" in text
+    assert events[0]["mode"] == "inline"
+
+
+def test_pool_timeout_falls_back_inline(monkeypatch):
+    monkeypatch.setattr(extract, "EXTRACT_INLINE_KB", 0)
+    monkeypatch.setattr(extract, "EXTRACT_TIMEOUT", 0.05)
+    monkeypatch.setattr(extract, "_get_pool", lambda: FakePool())
+    text, events = extract_events(HTML)
+    assert "Собственник квартиры" in text
+    assert events[0]["mode"] == "inline"
+    assert events[0]["pool_timeout"] is True
+
+
+def test_broken_pool_is_reset(monkeypatch):
+    pool = FakePool(BrokenProcessPool("рабочий процесс завершился"))
+    monkeypatch.setattr(extract, "EXTRACT_INLINE_KB", 0)
+    monkeypatch.setattr(extract, "_get_pool", lambda: pool)
+    text, events = extract_events(HTML)
+    assert "Собственник квартиры" in text
+    assert events[0]["mode"] == "inline"
+    assert pool.shut_down
+
+
+@pytest.mark.parametrize("html", [None, "", b""])
+def test_empty(html):
+    assert extract.extract_text(html) == ""
@@ -0,0 +1,62 @@
+"""pack_docs: порядок пассажей по BM25, бюджет токенов и источники без текста."""
+from pravo_app.formatters import pack_docs
+from pravo_app.text import estimate_tokens
+
+
+def paragraph(words: str, size: int = 500) -> str:
+    """Абзац около size символов: отдельный пассаж (два таких не помещаются в PASSAGE_CHARS)."""
+    return (words + " ") * (size // (len(words) + 1))
+
+
+RELEVANT = paragraph("залив квартиры соседом возмещение ущерба")
+PARTLY = paragraph("возмещение ущерба по договору подряда")
+FILLER = paragraph("погода на выходные солнечно без осадков")
+QUERY = "залив квартиры соседом возмещение ущерба"
+
+
+def test_best_passage_first_and_document_order_kept():
+    docs = [{"title": "Статья", "doc_text": "\n".join([FILLER, PARTLY, RELEVANT])}]
+    context = pack_docs(docs, QUERY, budget_tokens=10_000)
+    # Пассаж без совпадений с запросом отброшен, выбранные — в порядке документа
+    assert FILLER.strip() not in context
+    assert context.index(PARTLY.strip()) < context.index(RELEVANT.strip())
+
+
+def test_budget_keeps_highest_scored_passages():
+    docs = [{"title": "Статья", "doc_text": "\n".join([PARTLY, RELEVANT])}]
+    budget = estimate_tokens(RELEVANT) + 50
+    context = pack_docs(docs, QUERY, budget_tokens=budget)
+    assert RELEVANT.strip() in context
+    assert PARTLY.strip() not in context
+    assert estimate_tokens(context) <= budget + 10
+
+
+def test_best_passage_of_each_source_before_others():
+    docs = [
+        {"title": "Первый", "doc_text": "\n".join([RELEVANT, RELEVANT.replace("соседом", "сверху")])},
+        {"title": "Второй", "doc_text": PARTLY},
+    ]
+    budget = estimate_tokens(RELEVANT) + estimate_tokens(PARTLY) + 50
+    context = pack_docs(docs, QUERY, budget_tokens=budget)
+    # Лучший пассаж второго источника вытесняет второй пассаж первого, хотя тот релевантнее
+    assert PARTLY.strip() in context
+    assert "сверху" not in context
+
+
+def test_sources_without_text_keep_title():
+    docs = [
+        {"title": "Загружен", "doc_text": RELEVANT},
+        {"title": "Не загружен к дедлайну", "doc_text": ""},
+        {"title": "Найден Garant без текста"},
+    ]
+    context = pack_docs(docs, QUERY, budget_tokens=10_000)
+    assert "[Source 0]: Загружен" in context
+    assert "[Source 1]: Не загружен к дедлайну" in context
+    assert "[Source 2]: Найден Garant без текста" in context
+
+
+def test_source_over_budget_keeps_title():
+    docs = [{"title": "Первый", "doc_text": RELEVANT}, {"title": "Второй", "doc_text": PARTLY}]
+    context = pack_docs(docs, QUERY, budget_tokens=estimate_tokens(RELEVANT) + 50)
+    assert "[Source 1]: Второй" in context
+    assert PARTLY.strip() not in context
@@ -0,0 +1,68 @@
+"""GarantSearchProvider против garant_stub: тексты первых результатов, параллельная загрузка, дедлайн и повторы."""
+import time
+
+import pytest
+
+from pravo_app.garant_stub import GarantStub
+from pravo_app.search import GarantSearchProvider
+
+QUERY = "возмещение убытков вред имуществу гражданина"
+
+
+@pytest.fixture
+def stub_factory():
+    stubs = []
+
+    def start(**kwargs):
+        stub = GarantStub(**kwargs).start()
+        stubs.append(stub)
+        return stub
+
+    yield start
+    for stub in stubs:
+        stub.stop()
+
+
+def provider(stub, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return GarantSearchProvider("test-token", api_url=stub.url, **kwargs)
+
+
+def test_bodies_fetched_for_top_results(stub_factory):
+    stub = stub_factory()
+    docs = provider(stub, fetch_top=1).search(QUERY, max_results=3)
+    assert len(docs) == 3
+    assert docs[0]["href"].startswith("https://d.garant.ru/document/")
+    assert "возмещ" in docs[0]["doc_text"].lower()
+    # Тексты загружаются только для первых fetch_top результатов
+    assert [doc["doc_text"] for doc in docs[1:]] == ["", ""]
+    assert stub.requests == 2
+
+
+def test_bodies_fetched_concurrently(stub_factory):
+    stub = stub_factory(latency=0.3)
+    started = time.perf_counter()
+    docs = provider(stub, fetch_top=3).search(QUERY, max_results=3)
+    elapsed = time.perf_counter() - started
+    assert all(doc["doc_text"] for doc in docs)
+    # Поиск и три загрузки по 0.3 с: последовательно — не меньше 1.2 с
+    assert elapsed < 0.85
+
+
+def test_deadline_keeps_titles(stub_factory):
+    stub = stub_factory(latency=0.5)
+    docs = provider(stub, fetch_top=3, deadline=0.1).search(QUERY, max_results=3)
+    assert [doc["title"] for doc in docs]
+    assert all(doc["doc_text"] == "" for doc in docs)
+
+
+def test_unavailable_api_is_retried(stub_factory):
+    stub = stub_factory(fail_first=2)
+    docs = provider(stub, retries=3, fetch_top=1).search(QUERY, max_results=1)
+    assert docs[0]["doc_text"]
+    assert stub.requests == 4
+
+
+def test_missing_token():
+    docs = GarantSearchProvider(None).search(QUERY)
+    assert docs[0]["title"] == "Ошибка"
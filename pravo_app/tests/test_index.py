@@ -0,0 +1,61 @@
+"""Провайдеры локального индекса в async-режиме и метрики эмбеддингов."""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from pravo_app import llm
+from pravo_app.index import HybridSearchProvider, LocalSearchProvider
+from pravo_app.metrics import instrument
+
+
+class ThreadRecordingIndex:
+    """Индекс-заглушка: запоминает потоки, в которых к нему обращались."""
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.threads = []
+
+    def search(self, query, max_results):
+        self.threads.append(threading.current_thread())
+        return self.hits
+
+    def add_documents(self, docs):
+        self.threads.append(threading.current_thread())
+
+
+class Web:
+    async def asearch(self, query, max_results):
+        return [{"title": "web", "href": "https://example.ru", "doc_text": "текст"}]
+
+
+def test_local_asearch_does_not_block_event_loop():
+    index = ThreadRecordingIndex([{"doc": {"title": "local"}, "coverage": 1.0}])
+    docs = asyncio.run(LocalSearchProvider(index).asearch("запрос", 3))
+    assert docs == [{"title": "local"}]
+    assert index.threads and threading.main_thread() not in index.threads
+
+
+def test_hybrid_asearch_does_not_block_event_loop():
+    index = ThreadRecordingIndex([])
+    docs = asyncio.run(HybridSearchProvider(Web(), index, min_hits=1).asearch("запрос", 3))
+    assert [doc["title"] for doc in docs] == ["web"]
+    assert len(index.threads) == 2 and threading.main_thread() not in index.threads
+
+
+def test_embed_texts_records_llm_event():
+    class Client:
+        def embeddings(self, texts, model):
+            usage = SimpleNamespace(prompt_tokens=5)
+            return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[1.0], usage=usage) for i in range(len(texts))])
+
+    def node(state):
+        assert llm.embed_texts(["а", "б"]) == [[1.0], [1.0]]
+        return {}
+
+    previous = llm.set_client(Client())
+    try:
+        update = instrument(node, "index_node")({})
+    finally:
+        llm.set_client(previous)
+    [event] = [event for event in update["metrics"] if event["kind"] == "llm"]
+    assert event["node"] == "embeddings" and event["prompt_tokens"] == 10
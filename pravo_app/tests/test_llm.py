@@ -0,0 +1,48 @@
+"""Кэш ответов GigaChat в async-вызовах."""
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from pravo_app import llm
+from pravo_app.cache import DiskCache
+
+
+class ThreadRecordingCache(DiskCache):
+    """DiskCache, запоминающий потоки обращений."""
+
+    def __init__(self, path):
+        super().__init__(path, table="llm")
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, value):
+        self.threads.append(threading.current_thread())
+        super().set(key, value)
+
+
+class AsyncClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def achat(self, payload):
+        self.calls += 1
+        data = {"choices": [{"message": {"content": "ответ"}}]}
+        return SimpleNamespace(usage=None, model_dump=lambda: data)
+
+
+def test_async_cache_access_off_event_loop(tmp_path, monkeypatch):
+    cache = ThreadRecordingCache(str(tmp_path / "llm.sqlite"))
+    client = AsyncClient()
+    monkeypatch.setattr(llm, "LLM_CACHE", True)
+    monkeypatch.setattr(llm, "_llm_cache", cache)
+    previous = llm.set_client(client)
+    try:
+        assert asyncio.run(llm.aask_giga("вопрос", "GigaChat", node="answer_node")) == "ответ"
+        assert asyncio.run(llm.aask_giga("вопрос", "GigaChat", node="answer_node")) == "ответ"
+    finally:
+        llm.set_client(previous)
+    assert client.calls == 1
+    assert len(cache.threads) == 3 and threading.main_thread() not in cache.threads
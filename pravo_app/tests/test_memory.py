@@ -0,0 +1,70 @@
+"""Память диалога: окно сообщений со сводкой и ссылки на документы и черновые ответы."""
+import pytest
+
+from pravo_app import memory
+from pravo_app.formatters import format_dialog
+from pravo_app.memory import SUMMARY_ROLE, answer_ref, docs_ref, resolve_ref, window_messages
+
+DOCS = [
+    {"title": "ГК РФ ст. 15", "href": "https://example.ru/gk15", "doc_text": "Возмещение убытков"},
+    {"title": "ГК РФ ст. 1064", "href": "https://example.ru/gk1064", "doc_text": "Ответственность за вред"},
+]
+
+
+@pytest.fixture
+def window(monkeypatch):
+    monkeypatch.setattr(memory, "MESSAGES_WINDOW", 4)
+    monkeypatch.setattr(memory, "MESSAGES_SUMMARY_CHARS", 200)
+
+
+def run_cycles(cycles):
+    """Сообщения и черновики так, как их пишут узлы: по циклу — фраза, документы, ответ."""
+    messages, answers = [("user", "Сосед залил квартиру, как взыскать ущерб?")], []
+    for cycle in range(cycles):
+        update = [
+            ("tool_rewrite", f"взыскание ущерба от залива, цикл {cycle}"),
+            ("result_search_npa", docs_ref(DOCS)),
+            ("tool_rag", answer_ref(len(answers))),
+        ]
+        answers.append({"title": f"цикл {cycle}", "doc_text": f"Черновой ответ {cycle}"})
+        messages = window_messages(messages, update)
+    return messages, answers
+
+
+def test_window_folds_older_messages(window):
+    messages, _ = run_cycles(5)
+    assert len(messages) == 5
+    role, summary = messages[0]
+    assert role == SUMMARY_ROLE
+    # Реплика пользователя и поисковые фразы — в сводке, выводы инструментов — нет
+    assert summary.startswith("Пользователь: Сосед залил квартиру")
+    assert "@answers" not in summary and "@docs" not in summary
+    assert len(summary) <= 200
+
+
+def test_refs_resolve_after_windowing(window):
+    messages, answers = run_cycles(5)
+    dialog = format_dialog(messages, DOCS, answers)
+    # В окне — ответы последних циклов, ссылки раскрыты в их тексты
+    assert "[tool_rag]: Черновой ответ 4" in dialog
+    assert "[tool_rag]: Черновой ответ 3" in dialog
+    assert "Черновой ответ 0" not in dialog
+    assert "ГК РФ ст. 1064 [https://example.ru/gk1064]" in dialog
+    assert "@answers" not in dialog and "@docs" not in dialog
+
+
+def test_window_disabled(monkeypatch):
+    monkeypatch.setattr(memory, "MESSAGES_WINDOW", 0)
+    messages, _ = run_cycles(5)
+    assert len(messages) == 16
+
+
+def test_unresolved_refs_stay_as_is():
+    assert resolve_ref(answer_ref(3), DOCS, []) == "@answers:3"
+    assert resolve_ref("@docs:0123456789ab", DOCS) == "@docs:0123456789ab"
+    assert resolve_ref("обычный текст", DOCS) == "обычный текст"
+
+
+def test_docs_ref_for_docs_without_hash():
+    # Ключ документа без doc_hash — хэш его текста
+    assert resolve_ref(docs_ref(DOCS[:1]), DOCS) == "ГК РФ ст. 15 [https://example.ru/gk15]"
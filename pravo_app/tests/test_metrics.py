@@ -0,0 +1,35 @@
+"""Сводка прогона: run_summary внутри узла и поле metrics_summary итогового состояния."""
+from pravo_app.checkpoint import thread_config
+from pravo_app.metrics import instrument, record, run_summary, summarize
+
+
+def test_run_summary_includes_current_node():
+    previous = [{"kind": "node", "name": "старт", "seconds": 0.5}]
+
+    def node(state):
+        record("llm", node="node", seconds=0.25, prompt_tokens=10, completion_tokens=5)
+        return {"metrics_summary": run_summary(state["metrics"])}
+
+    update = instrument(node, "финал")({"metrics": previous})
+    summary = update["metrics_summary"]
+    assert set(summary["nodes"]) == {"старт", "финал"}
+    assert summary["llm"]["calls"] == 1
+    assert summary["llm"]["prompt_tokens"] == 10
+    # Событие узла добавляет и обёртка: сводка узла строится до него и его не дублирует
+    assert summary["nodes"]["финал"]["calls"] == 1
+
+
+def test_run_summary_outside_graph():
+    assert run_summary([])["nodes"] == {}
+
+
+def test_final_state_has_summary(offline):
+    from pravo_app.graph import graph
+
+    query = offline.items[0]["запрос"]
+    state = graph.invoke({"query": query, "batch_mode": True, "verbose": False}, thread_config("test-summary"))
+    summary = state["metrics_summary"]
+    assert "final_answer_node" in summary["nodes"]
+    # Сводка построена в последнем узле: вызовы GigaChat совпадают со сводкой по всем событиям прогона
+    assert summary["llm"]["calls"] == summarize(state["metrics"])["llm"]["calls"]
+    assert set(summary["nodes"]) == set(summarize(state["metrics"])["nodes"])
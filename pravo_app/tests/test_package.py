@@ -0,0 +1,23 @@
+"""Ленивый экспорт графа из пакета: pravo_app.graph — скомпилированный граф, а не подмодуль."""
+import subprocess
+import sys
+
+from .offline import ROOT
+
+
+def _run(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_graph_after_submodule_import():
+    code = "import pravo_app.graph\nfrom pravo_app import graph\nprint(type(graph).__name__)"
+    assert _run(code) == "CompiledStateGraph"
+
+
+def test_graph_lazy_attribute():
+    code = (
+        "import sys, pravo_app\n"
+        "print('pravo_app.graph' in sys.modules)\n"
+        "print(type(pravo_app.graph).__name__)"
+    )
+    assert _run(code).splitlines() == ["False", "CompiledStateGraph"]
@@ -0,0 +1,56 @@
+"""Режим PRAVO_SEARCH_MODE=parallel: оба поиска в одном шаге графа и один черновой ответ по их объединению."""
+import pytest
+
+from pravo_app import decisions, nodes
+from pravo_app.checkpoint import thread_config
+from pravo_app.graph import graph
+
+
+@pytest.fixture
+def parallel(monkeypatch):
+    monkeypatch.setattr(decisions, "SEARCH_MODE", "parallel")
+    monkeypatch.setattr(nodes, "SEARCH_MODE", "parallel")
+
+
+def node_calls(state, name):
+    return sum(1 for event in state["metrics"] if event["kind"] == "node" and event["name"] == name)
+
+
+def test_route_mode_picks_one_search():
+    assert decisions.check_search_type({"category": "Судебное"}) == "поиск судебки"
+    assert decisions.check_search_type({"category": "НПА"}) == "поиск нпа"
+
+
+def test_parallel_mode_fans_out(parallel):
+    assert decisions.check_search_type({"category": "НПА"}) == ["поиск нпа", "поиск судебки"]
+
+
+def test_branches_join_into_one_answer(offline, parallel):
+    item = offline.items[0]
+    state = graph.invoke({"query": item["запрос"], "batch_mode": True, "verbose": False}, thread_config("test-parallel"))
+    assert node_calls(state, "search_npa_node") == node_calls(state, "search_court_node") == 1
+    # Черновой ответ выполняется один раз — после обеих веток
+    assert node_calls(state, "answer_node") == 1
+    assert len(state["answers"]) == 1
+    roles = [role for role, _ in state["messages"]]
+    assert "result_search_npa" in roles and "result_search_court" in roles
+    # Ответ построен по документам обеих веток
+    assert state["answers"][0]["docs_count"] == len(state["docs"])
+    assert state["retrieved_total"] >= len(state["docs"])
+    # Без взвешивания категория не нужна: классификация не вызывает GigaChat
+    assert not any(event["kind"] == "llm" and event.get("node") == "classify_node" for event in state["metrics"])
+
+
+def test_weighting_splits_results(parallel, monkeypatch):
+    monkeypatch.setattr(nodes, "SEARCH_RESULTS", 3)
+    monkeypatch.setattr(nodes, "SEARCH_RESULTS_SECONDARY", 1)
+    state = {"category": "Судебное"}
+    assert nodes._max_results(state, court=True) == 3
+    assert nodes._max_results(state, court=False) == 1
+    assert nodes._max_results({"category": None}, court=True) is None
+
+
+def test_skip_classification_only_without_weighting(parallel, monkeypatch):
+    assert nodes._skip_classification()
+    monkeypatch.setattr(nodes, "CLASSIFY_WEIGHTING", True)
+    assert not nodes._skip_classification()
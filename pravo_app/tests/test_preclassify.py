@@ -0,0 +1,93 @@
+"""Предклассификатор: правила категории, калибровка порога и загрузка обученной заранее модели."""
+import pytest
+
+from pravo_app import preclassify
+from pravo_app.preclassify import CLARIFY_OK, ClarifyModel, calibrate, classify_category, precision_lower_bound
+
+LONG_QUERY = "сосед сверху залил квартиру водой из трубы и отказывается возместить ущерб за ремонт потолка"
+
+
+@pytest.fixture
+def clarify_model(monkeypatch):
+    """Подставляет модель уточнений вместо прочитанной из файла."""
+
+    def install(model):
+        monkeypatch.setattr(preclassify, "_model", model)
+        monkeypatch.setattr(preclassify, "_model_loaded", True)
+        return model
+
+    return install
+
+
+def trained_model() -> ClarifyModel:
+    texts = [LONG_QUERY, "подскажите пожалуйста что делать в ситуации когда непонятно что случилось и кто виноват"]
+    return ClarifyModel(epochs=50).fit(texts, [1, 0])
+
+
+def test_category_rules():
+    assert classify_category("Какова судебная практика по взысканию неустойки с застройщика?").label == "Судебное"
+    assert classify_category("Что говорит статья 15 ГК РФ о возмещении убытков?").label == "НПА"
+    assert classify_category("Как быть?").confidence == 0.5
+
+
+def test_precision_lower_bound():
+    assert precision_lower_bound(0, 0) == 0.0
+    # Малая выборка без ошибок не даёт высокой гарантированной точности
+    assert precision_lower_bound(6, 6) < 0.8
+    assert precision_lower_bound(990, 1000) > 0.98
+
+
+def test_calibrate_picks_lowest_reliable_threshold():
+    scores = [(0.99, 1)] * 200 + [(0.7, 1)] * 50 + [(0.7, 0)] * 50 + [(0.2, 0)] * 10
+    assert calibrate(scores, min_precision=0.95) == 0.99
+    assert calibrate(scores, min_precision=0.6) == 0.7
+
+
+def test_calibrate_none_without_lift():
+    # Точность «ок» на уровне доли «ок» в корпусе: порога нет
+    scores = [(0.9, 1)] * 85 + [(0.9, 0)] * 15
+    assert calibrate(scores, min_precision=0.95) is None
+
+
+def test_model_round_trip(tmp_path):
+    model = trained_model()
+    model.threshold = 0.8
+    path = str(tmp_path / "model.json")
+    preclassify.save_model(model, path)
+    loaded = preclassify.load_model(path)
+    assert loaded.threshold == 0.8
+    assert loaded.predict(LONG_QUERY) == pytest.approx(model.predict(LONG_QUERY))
+
+
+def test_missing_model_file(tmp_path):
+    assert preclassify.load_model(str(tmp_path / "missing.json")) is None
+
+
+def test_uncalibrated_model_makes_no_decisions(clarify_model):
+    clarify_model(trained_model())
+    assert local_ok(None) is None
+
+
+def test_calibrated_threshold_is_used(clarify_model):
+    model = clarify_model(trained_model())
+    model.threshold = 0.5
+    assert local_ok(None) == CLARIFY_OK
+    model.threshold = 1.0
+    assert local_ok(None) is None
+
+
+def test_shipped_model_is_loaded_not_fitted(monkeypatch):
+    monkeypatch.setattr(preclassify, "_model", None)
+    monkeypatch.setattr(preclassify, "_model_loaded", False)
+
+    def fail_fit(self, texts, labels):
+        raise AssertionError("модель не обучается на пути запроса")
+
+    monkeypatch.setattr(ClarifyModel, "fit", fail_fit)
+    model = preclassify._clarify_model()
+    assert model is not None and model.weights
+    preclassify.local_clarification(LONG_QUERY)
+
+
+def local_ok(threshold):
+    return preclassify.local_clarification(LONG_QUERY, threshold)
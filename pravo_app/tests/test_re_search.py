@@ -0,0 +1,112 @@
+"""Адаптивная остановка повторного поиска: причины limit, budget, no_new_sources и not_novel."""
+import pytest
+
+from pravo_app import nodes, re_search
+from pravo_app.metrics import instrument
+from pravo_app.re_search import novelty, query_stop_reason, stop_reason
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(re_search, "RE_SEARCH_MAX", 2)
+    monkeypatch.setattr(re_search, "RE_SEARCH_BUDGET_SECONDS", 10.0)
+    monkeypatch.setattr(re_search, "RE_SEARCH_BUDGET_TOKENS", 0)
+    monkeypatch.setattr(re_search, "RE_SEARCH_MIN_NEW_SOURCES", 0.25)
+    monkeypatch.setattr(re_search, "RE_SEARCH_MIN_NOVELTY", 0.25)
+
+
+def make_state(re_search_cnt=0, seconds=1.0, answers=None):
+    answers = answers or [{"title": "залив квартиры соседом", "doc_text": "Ответ", "docs_count": 4, "retrieved_total": 4}]
+    return {
+        "query": "Сосед залил квартиру, как взыскать ущерб?",
+        "search_query": "залив квартиры соседом",
+        "re_search_cnt": re_search_cnt,
+        "answers": answers,
+        "metrics": [{"kind": "node", "name": "answer_node", "seconds": seconds}],
+        "verbose": False,
+    }
+
+
+def test_continue_when_nothing_stops(limits):
+    assert stop_reason(make_state()) is None
+
+
+def test_limit(limits):
+    # Лимит проверяется первым — даже при исчерпанном бюджете
+    assert stop_reason(make_state(re_search_cnt=2, seconds=100.0)) == "limit"
+
+
+def test_budget_seconds(limits):
+    # 6 с за один цикл: ещё один — 12 с при бюджете 10 с
+    assert stop_reason(make_state(seconds=6.0)) == "budget"
+    assert stop_reason(make_state(seconds=4.0)) is None
+
+
+def test_budget_tokens(limits, monkeypatch):
+    monkeypatch.setattr(re_search, "RE_SEARCH_BUDGET_SECONDS", 0.0)
+    monkeypatch.setattr(re_search, "RE_SEARCH_BUDGET_TOKENS", 1000)
+    state = make_state(seconds=100.0)
+    state["metrics"].append({"kind": "llm", "prompt_tokens": 500, "completion_tokens": 100})
+    assert stop_reason(state) == "budget"
+    state["metrics"][-1]["prompt_tokens"] = 300
+    assert stop_reason(state) is None
+
+
+def test_no_new_sources(limits):
+    first = {"title": "залив квартиры", "docs_count": 4, "retrieved_total": 4}
+    # Второй цикл нашёл 4 документа, новый из них один — доля 0.25 не ниже порога
+    enough = {"title": "ущерб от залива", "docs_count": 5, "retrieved_total": 8}
+    assert stop_reason(make_state(answers=[first, enough])) is None
+    poor = {"title": "ущерб от залива", "docs_count": 4, "retrieved_total": 8}
+    assert stop_reason(make_state(answers=[first, poor])) == "no_new_sources"
+
+
+def test_novelty():
+    assert novelty("залив квартиры", ["Залив КВАРТИРЫ соседом"]) == 0.0
+    assert novelty("упущенная выгода", ["залив квартиры"]) == 1.0
+    assert novelty("и в на", []) == 0.0
+
+
+def test_query_stop_reason(limits):
+    state = make_state()
+    assert query_stop_reason(state, "соседом залив квартиры") == "not_novel"
+    # Один новый терм из четырёх — доля 0.25 не ниже порога
+    assert query_stop_reason(state, "залив квартиры соседом сверху") is None
+    assert query_stop_reason(state, "судебная практика по упущенной выгоде") is None
+
+
+def reflect(state, monkeypatch, reply="ок"):
+    """reflect_node в обёртке instrument: (обновление, события re_search, число вызовов LLM)."""
+    calls = []
+
+    def ask_giga(prompt, model, node=None):
+        calls.append(prompt)
+        return reply
+
+    monkeypatch.setattr(nodes, "REWRITE_CLASSIFY", False)
+    monkeypatch.setattr(nodes, "ask_giga", ask_giga)
+    update = instrument(nodes.reflect_node)(state)
+    events = [event for event in update["metrics"] if event["kind"] == "re_search"]
+    return update, events, len(calls)
+
+
+def test_reflect_stops_without_llm(limits, monkeypatch):
+    update, events, calls = reflect(make_state(re_search_cnt=2), monkeypatch)
+    assert calls == 0
+    assert not update["need_re_search"]
+    assert update["messages"] == [("tool_reflect", "ок (limit)")]
+    assert [(e["decision"], e["reason"]) for e in events] == [("stop", "limit")]
+
+
+def test_reflect_rejects_repeated_query(limits, monkeypatch):
+    update, events, calls = reflect(make_state(), monkeypatch, reply="залив квартиры соседом")
+    assert calls == 1
+    assert not update["need_re_search"]
+    assert [(e["decision"], e["reason"]) for e in events] == [("stop", "not_novel")]
+
+
+def test_reflect_continues_with_new_query(limits, monkeypatch):
+    update, events, _ = reflect(make_state(), monkeypatch, reply="упущенная выгода при заливе")
+    assert update["need_re_search"]
+    assert update["search_query"] == "упущенная выгода при заливе"
+    assert [(e["decision"], e["reason"]) for e in events] == [("continue", "verdict")]
@@ -0,0 +1,19 @@
+"""run_graph: потоковый вывод в режимах debug и simple на стендах bench."""
+import pytest
+
+from pravo_app.graph import graph
+from pravo_app.run import run_graph
+
+
+@pytest.mark.parametrize("mode", ["debug", "simple"])
+def test_run_graph_prints_final_answer(offline, capsys, mode):
+    item = offline.items[0]
+    run_graph(graph, {"query": item["запрос"], "batch_mode": True}, mode=mode)
+    out = capsys.readouterr().out
+    assert "=== FINAL ANSWER ===" in out
+    if mode == "debug":
+        assert "Выполнен узел: старт" in out
+        assert "Последние сообщения:" in out
+        assert "=== МЕТРИКИ ===" in out
+    else:
+        assert "оцениваю" in out
@@ -0,0 +1,120 @@
+"""Кэш поиска: запросы, тексты документов и перепроверка страниц по ETag / Last-Modified."""
+import pytest
+
+from pravo_app import search_cache
+from pravo_app.cache import DiskCache
+
+HREF = "https://example.ru/gk/st15"
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Server:
+    """Ответы на HEAD-запросы: заголовки headers или ошибка соединения (headers=None)."""
+
+    def __init__(self):
+        self.headers = None
+        self.requests = []
+
+    def urlopen(self, request, timeout):
+        self.requests.append(request.get_method())
+        if self.headers is None:
+            raise OSError("нет соединения")
+        return FakeResponse(self.headers)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Кэш включён и хранится во временном каталоге, страницы перепроверяются при каждом обращении."""
+    path = str(tmp_path / "search.sqlite")
+    monkeypatch.setattr(search_cache, "SEARCH_CACHE", True)
+    monkeypatch.setattr(search_cache, "_query_cache", DiskCache(path, table="queries", ttl=3600, max_bytes=1 << 20))
+    monkeypatch.setattr(search_cache, "_page_cache", DiskCache(path, table="pages", ttl=3600, max_bytes=1 << 20))
+    monkeypatch.setattr(search_cache, "PAGE_REVALIDATE", 0)
+    server = Server()
+    monkeypatch.setattr(search_cache.urllib.request, "urlopen", server.urlopen)
+    return server
+
+
+def test_query_cache_hit_and_empty_not_cached(server):
+    calls = []
+
+    def search():
+        calls.append(1)
+        return [{"title": "ГК РФ"}]
+
+    assert search_cache.cached_results("ddgs", "ущерб", 3, search) == [{"title": "ГК РФ"}]
+    assert search_cache.cached_results("ddgs", "ущерб", 3, search) == [{"title": "ГК РФ"}]
+    assert len(calls) == 1
+
+    def empty():
+        calls.append(1)
+        return []
+
+    search_cache.cached_results("ddgs", "пусто", 3, empty)
+    search_cache.cached_results("ddgs", "пусто", 3, empty)
+    assert len(calls) == 3
+
+
+def test_matching_etag_keeps_text(server):
+    search_cache.put_page_text(HREF, "текст статьи", {"ETag": '"v1"'})
+    server.headers = {"ETag": '"v1"'}
+    assert search_cache.get_page_text(HREF, timeout=1) == "текст статьи"
+    assert server.requests == ["HEAD"]
+
+
+def test_changed_etag_drops_text(server):
+    search_cache.put_page_text(HREF, "текст статьи", {"ETag": '"v1"'})
+    server.headers = {"ETag": '"v2"'}
+    assert search_cache.get_page_text(HREF, timeout=1) is None
+    # Запись удалена: следующее обращение — промах без HEAD-запроса
+    assert search_cache.get_page_text(HREF, timeout=1) is None
+    assert server.requests == ["HEAD"]
+
+
+def test_last_modified_revalidation(server):
+    search_cache.put_page_text(HREF, "текст статьи", {"Last-Modified": "Mon, 02 Feb 2026 10:00:00 GMT"})
+    server.headers = {"Last-Modified": "Mon, 02 Feb 2026 10:00:00 GMT"}
+    assert search_cache.get_page_text(HREF, timeout=1) == "текст статьи"
+    server.headers = {"Last-Modified": "Tue, 03 Feb 2026 10:00:00 GMT"}
+    assert search_cache.get_page_text(HREF, timeout=1) is None
+
+
+def test_without_validators_or_on_error_page_is_refetched(server):
+    search_cache.put_page_text(HREF, "текст статьи", {})
+    server.headers = {"ETag": '"v1"'}
+    assert search_cache.get_page_text(HREF, timeout=1) is None
+    assert server.requests == []
+    search_cache.put_page_text(HREF, "текст статьи", {"ETag": '"v1"'})
+    server.headers = None
+    assert search_cache.get_page_text(HREF, timeout=1) is None
+
+
+def test_fresh_entry_is_not_revalidated(server, monkeypatch):
+    monkeypatch.setattr(search_cache, "PAGE_REVALIDATE", 3600)
+    search_cache.put_page_text(HREF, "текст статьи", {"ETag": '"v1"'})
+    server.headers = {"ETag": '"v2"'}
+    assert search_cache.get_page_text(HREF, timeout=1) == "текст статьи"
+    assert server.requests == []
+
+
+def test_document_text_cached_by_key(server):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return "текст документа"
+
+    assert search_cache.cached_document_text(("garant", 12345, "2026-01-01"), fetch) == "текст документа"
+    assert search_cache.cached_document_text(("garant", 12345, "2026-01-01"), fetch) == "текст документа"
+    assert search_cache.cached_document_text(("garant", 12345, "2026-02-01"), fetch) == "текст документа"
+    assert len(calls) == 2
@@ -0,0 +1,54 @@
+"""Сервис: заявка проходит POST /jobs, /stream и /result в рабочем процессе со стендами bench."""
+import json
+import threading
+import urllib.request
+
+import pytest
+
+from pravo_app.service import AgentService, serve
+
+from .offline import load_corpus
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    service = AgentService(workers=1, threads=1, initializer="pravo_app.tests.offline:install").start()
+    server = serve(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _request(url: str, data: dict | None = None):
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    return urllib.request.urlopen(urllib.request.Request(url, data=body, method="POST" if body else "GET"), timeout=120)
+
+
+def test_job_submit_stream_result(base_url):
+    query = load_corpus().items[0]["запрос"]
+    with _request(f"{base_url}/jobs", {"query": query}) as response:
+        assert response.status == 202
+        job_id = json.load(response)["id"]
+
+    with _request(f"{base_url}/jobs/{job_id}/stream") as response:
+        events = [json.loads(line) for line in response.read().decode("utf-8").splitlines() if line]
+    types = [event["type"] for event in events]
+    assert types[-1] == "done"
+    assert "stage" in types
+    assert any(event.get("node") == "старт" for event in events if event["type"] == "stage")
+
+    with _request(f"{base_url}/jobs/{job_id}/result?timeout=60") as response:
+        assert response.status == 200
+        job = json.load(response)
+    assert job["status"] == "done"
+    assert job["result"]["final_answer"]
+    assert job["result"]["metrics"]["nodes"]
+
+
+def test_bad_request(base_url):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _request(f"{base_url}/jobs", {"query": " "})
+    assert error.value.code == 400
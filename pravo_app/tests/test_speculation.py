@@ -0,0 +1,47 @@
+"""Спекулятивная ветка clarify_node: отмена между шагами."""
+import threading
+
+from pravo_app import nodes
+
+
+def test_cancelled_speculation_skips_remaining_calls(monkeypatch):
+    cancelled = threading.Event()
+    calls = []
+
+    def rewrite(query):
+        # Уточнение понадобилось, пока шла переформулировка
+        cancelled.set()
+        return "переформулированный запрос", None
+
+    monkeypatch.setattr(nodes, "_rewrite", rewrite)
+    monkeypatch.setattr(nodes, "ask_giga", lambda *args, **kwargs: calls.append("llm") or "НПА")
+    monkeypatch.setattr(nodes, "call_npa_api", lambda *args: calls.append("npa") or [])
+    monkeypatch.setattr(nodes, "call_court_api", lambda *args: calls.append("court") or [])
+
+    assert nodes._speculate("вопрос", cancelled) is None
+    assert calls == []
+
+
+def test_speculation_runs_to_completion(monkeypatch):
+    monkeypatch.setattr(nodes, "_rewrite", lambda query: ("запрос", "НПА"))
+    monkeypatch.setattr(nodes, "call_npa_api", lambda *args: [{"title": "npa"}])
+    monkeypatch.setattr(nodes, "call_court_api", lambda *args: [{"title": "court"}])
+
+    spec = nodes._speculate("вопрос", threading.Event())
+    assert spec["search_query"] == "запрос"
+    assert spec["docs"]["npa"] == [{"title": "npa"}]
+
+
+def test_cancelled_before_start_skips_rewrite(monkeypatch):
+    cancelled = threading.Event()
+    cancelled.set()
+    monkeypatch.setattr(nodes, "_rewrite", lambda query: (_ for _ in ()).throw(AssertionError("вызов после отмены")))
+    assert nodes._speculate("вопрос", cancelled) is None
+
+
+def test_clarify_ok_matches_reflection():
+    state = {"clarification_cnt": 0, "verbose": False}
+    for gen in ("ок", "Ок.", "OK", "Окей", "Ок, данных достаточно для поиска"):
+        assert nodes._clarify_update(state, gen)["need_clarify_question"] is False, gen
+    for gen in ("Окончательная сумма ущерба известна?", "Уточните регион", "Всё ок"):
+        assert nodes._clarify_update(state, gen)["need_clarify_question"] is True, gen
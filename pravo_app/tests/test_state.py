@@ -0,0 +1,55 @@
+"""Редукторы состояния графа: нарастающие счётчики и сброс при новом прогоне (setup_node)."""
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from pravo_app.metrics import instrument
+from pravo_app.nodes import setup_node
+from pravo_app.re_search import new_source_share
+from pravo_app.state import MyState
+
+
+def search_stub(state):
+    doc = {"title": state["query"], "href": f"https://example.ru/{len(state['query'])}", "doc_text": state["query"]}
+    return {
+        "retrieved_total": 3,
+        "docs": [doc],
+        "answers": [{"title": state["query"], "doc_text": "ответ"}],
+        "messages": [("tool_rag", "ответ")],
+    }
+
+
+def build_graph(checkpointer=None):
+    builder = StateGraph(MyState)
+    builder.add_node("setup_node", instrument(setup_node))
+    builder.add_node("search_stub", instrument(search_stub))
+    builder.add_edge(START, "setup_node")
+    builder.add_edge("setup_node", "search_stub")
+    builder.add_edge("search_stub", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_retrieved_total_is_reset_by_setup():
+    state = build_graph().invoke({"query": "вопрос", "retrieved_total": 5})
+    assert state["retrieved_total"] == 3
+
+
+def test_new_source_share_uses_totals():
+    answers = [
+        {"docs_count": 4, "retrieved_total": 4},
+        {"docs_count": 5, "retrieved_total": 8},
+    ]
+    assert new_source_share(answers) == 0.25
+    assert new_source_share(answers[:1]) is None
+    assert new_source_share([answers[0], answers[0]]) == 0.0
+
+
+def test_new_query_in_same_thread_starts_clean():
+    graph = build_graph(InMemorySaver())
+    config = {"configurable": {"thread_id": "t"}}
+    graph.invoke({"query": "первый вопрос"}, config)
+    state = graph.invoke({"query": "второй вопрос"}, config)
+    assert [doc["title"] for doc in state["docs"]] == ["второй вопрос"]
+    assert [answer["title"] for answer in state["answers"]] == ["второй вопрос"]
+    assert state["messages"] == [("user", "второй вопрос"), ("tool_rag", "ответ")]
+    assert state["retrieved_total"] == 3
+    assert [event["name"] for event in state["metrics"]] == ["setup_node", "search_stub"]
@@ -0,0 +1,54 @@
+"""Потоковый вывод: фрагменты ответов в stream_mode="custom" и stream_giga вне графа."""
+import asyncio
+
+from pravo_app import llm
+from pravo_app.checkpoint import thread_config
+from pravo_app.graph import graph
+
+
+def collect(chunks):
+    """(фрагменты по узлам, узлы в порядке обновлений, итоговые поля) из graph.stream."""
+    tokens, order, final = {}, [], {}
+    for mode, chunk in chunks:
+        if mode == "custom":
+            tokens.setdefault(chunk["node"], []).append(chunk["token"])
+            order.append(("token", chunk["node"]))
+            continue
+        for node_name, update in chunk.items():
+            order.append(("update", node_name))
+            if hasattr(update, "get"):
+                final.update({k: v for k, v in update.items() if k in ("answers", "final_answer")})
+    return tokens, order, final
+
+
+def state_for(corpus):
+    return {"query": corpus.items[0]["запрос"], "batch_mode": True, "verbose": False}
+
+
+def check(tokens, order, final):
+    assert len(tokens["answer_node"]) > 1
+    assert "".join(tokens["answer_node"]).strip() == final["answers"][0]["doc_text"]
+    # Фрагменты чернового ответа приходят до обновления его узла
+    assert order.index(("token", "answer_node")) < order.index(("update", "черновой ответ"))
+
+
+def test_stream_tokens(offline):
+    chunks = graph.stream(state_for(offline), thread_config("test-stream"), stream_mode=["updates", "custom"])
+    check(*collect(chunks))
+
+
+def test_astream_tokens(offline):
+    async def run():
+        config = thread_config("test-astream")
+        return [chunk async for chunk in graph.astream(state_for(offline), config, stream_mode=["updates", "custom"])]
+
+    check(*collect(asyncio.run(run())))
+
+
+def test_stream_giga_outside_graph(offline):
+    prompt = "[Вопрос]: " + offline.items[0]["запрос"]
+    parts = []
+    text = llm.stream_giga(prompt, "GigaChat", on_token=parts.append)
+    assert len(parts) > 1
+    assert "".join(parts).strip() == text
+    assert llm.stream_giga(prompt, "GigaChat") == text
@@ -0,0 +1,88 @@
+"""Структурированные (JSON) ответы переформулировки и самопроверки: строгий разбор и возврат к обычным промптам."""
+import pytest
+
+from pravo_app import nodes
+
+
+@pytest.mark.parametrize(
+    "gen, expected",
+    [
+        ('{"search_query": "залив квартиры", "category": "НПА"}', ("залив квартиры", "НПА")),
+        ('```json\n{"search_query": " залив ", "category": "судебное"}\n```', ("залив", "Судебное")),
+        ('{"search_query": "залив", "category": "Закон"}', None),
+        ('{"search_query": "", "category": "НПА"}', None),
+        ('{"search_query": "залив", "category": "НПА", "comment": "..."}', None),
+        ('["залив", "НПА"]', None),
+        ("Поисковая фраза: залив квартиры", None),
+    ],
+)
+def test_parse_rewrite_classify(gen, expected):
+    assert nodes._parse_rewrite_classify(gen) == expected
+
+
+@pytest.mark.parametrize(
+    "gen, expected",
+    [
+        ('{"verdict": "ок", "search_query": "", "category": ""}', (None, None)),
+        ('{"verdict": "Поиск", "search_query": "практика ВС", "category": "Судебное"}', ("практика ВС", "Судебное")),
+        ('{"verdict": "поиск", "search_query": "", "category": "НПА"}', None),
+        ('{"verdict": "поиск", "search_query": "практика", "category": null}', None),
+        ('{"verdict": "не знаю", "search_query": "", "category": ""}', None),
+        ('{"verdict": 1, "search_query": "", "category": ""}', None),
+        ("ок", None),
+    ],
+)
+def test_parse_reflection(gen, expected):
+    assert nodes._parse_reflection(gen) == expected
+
+
+class ScriptedLLM:
+    """ask_giga, отвечающий по очереди заданными строками; prompts — полученные промпты."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.prompts = []
+
+    def __call__(self, prompt, model, node=None):
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+def test_rewrite_falls_back_to_plain_prompt(monkeypatch):
+    llm = ScriptedLLM("Конечно! Вот запрос: залив", "залив квартиры соседом")
+    monkeypatch.setattr(nodes, "REWRITE_CLASSIFY", True)
+    monkeypatch.setattr(nodes, "ask_giga", llm)
+    assert nodes._rewrite("Сосед залил квартиру") == ("залив квартиры соседом", None)
+    assert llm.prompts[1].startswith(nodes.query_rewrite_prompt.template.split("{")[0])
+
+
+def test_rewrite_uses_structured_answer(monkeypatch):
+    llm = ScriptedLLM('{"search_query": "залив квартиры", "category": "НПА"}')
+    monkeypatch.setattr(nodes, "REWRITE_CLASSIFY", True)
+    monkeypatch.setattr(nodes, "ask_giga", llm)
+    assert nodes._rewrite("Сосед залил квартиру") == ("залив квартиры", "НПА")
+    assert len(llm.prompts) == 1
+
+
+@pytest.fixture
+def reflect(monkeypatch):
+    """reflect_node без состояния графа: возвращает (gen, parsed) из _reflect_update."""
+    monkeypatch.setattr(nodes, "REWRITE_CLASSIFY", True)
+    monkeypatch.setattr(nodes, "stop_reason", lambda state: None)
+    monkeypatch.setattr(nodes, "_reflect_prompt", lambda state, template=None: "промпт")
+    monkeypatch.setattr(nodes, "_reflect_update", lambda state, gen, parsed=None, reason=None: (gen, parsed))
+
+    def run(*replies):
+        llm = ScriptedLLM(*replies)
+        monkeypatch.setattr(nodes, "ask_giga", llm)
+        return nodes.reflect_node({}), len(llm.prompts)
+
+    return run
+
+
+def test_reflect_structured_ok(reflect):
+    assert reflect('{"verdict": "ок", "search_query": "", "category": ""}') == (("", (None, None)), 1)
+
+
+def test_reflect_falls_back_to_plain_prompt(reflect):
+    assert reflect("Ответ полный, но JSON не получился", "ок") == (("ок", None), 2)
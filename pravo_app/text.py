@@ -0,0 +1,107 @@
+"""
+Обработка текста для ранжирования: токенизация, нарезка на пассажи, BM25.
+
+Стемминг упрощённый — усечение слова до префикса фиксированной длины; для
+русского языка этого достаточно, чтобы «ущерба», «ущербом» и «ущерб» совпали.
+Числа (номера статей, законов) сохраняются целиком.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+# Длина префикса при усечении слов
+STEM_LEN = 6
+# Целевой размер пассажа, символов
+PASSAGE_CHARS = 800
+# Среднее число символов на токен GigaChat для русского юридического текста (оценка)
+CHARS_PER_TOKEN = 3.0
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+")
+
+_STOPWORDS = {
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она", "так", "его",
+    "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее", "мне", "было", "вот", "от",
+    "меня", "еще", "нет", "о", "из", "ему", "теперь", "когда", "даже", "ну", "ли", "если", "уже", "или",
+    "ни", "быть", "был", "него", "до", "вас", "нибудь", "опять", "уж", "вам", "ведь", "там", "потом",
+    "себя", "ничего", "ей", "может", "они", "тут", "где", "есть", "надо", "ней", "для", "мы", "тебя",
+    "их", "чем", "была", "сам", "чтоб", "без", "будто", "чего", "раз", "тоже", "себе", "под", "будет",
+    "ж", "тогда", "кто", "этот", "того", "потому", "этого", "какой", "совсем", "ним", "здесь", "этом",
+    "один", "почти", "мой", "тем", "чтобы", "нее", "были", "куда", "зачем", "всех", "никогда", "можно",
+    "при", "наконец", "два", "об", "другой", "хоть", "после", "над", "больше", "тот", "через", "эти",
+    "нас", "про", "всего", "них", "какая", "много", "разве", "три", "эту", "моя", "впрочем", "хорошо",
+    "свою", "этой", "перед", "иногда", "лучше", "чуть", "том", "нельзя", "такой", "им", "более",
+    "всегда", "конечно", "всю", "между", "это", "site",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Нормализованные термы текста: нижний регистр, без стоп-слов, усечённые до STEM_LEN."""
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in _STOPWORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(word if word.isdigit() else word[:STEM_LEN])
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа токенов текста без обращения к API."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_passages(text: str, size: int = PASSAGE_CHARS) -> List[str]:
+    """Делит текст на пассажи около size символов по границам абзацев и предложений."""
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n|\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= size:
+            pieces.append(paragraph)
+            continue
+        # Длинный абзац — по предложениям; слишком длинное предложение режем жёстко
+        for sentence in _SENTENCE_RE.split(paragraph):
+            for start in range(0, len(sentence), size):
+                pieces.append(sentence[start : start + size])
+
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > size:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25:
+    """Okapi BM25 по набору документов, представленных списками термов."""
+
+    def __init__(self, corpus: Sequence[List[str]], k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.tf = [Counter(terms) for terms in corpus]
+        self.lengths = [len(terms) for terms in corpus]
+        self.avg_len = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        df: Dict[str, int] = Counter()
+        for tf in self.tf:
+            df.update(tf.keys())
+        n = len(self.tf)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def scores(self, query_terms: List[str]) -> List[float]:
+        """Оценка BM25 каждого документа корпуса для запроса."""
+        result = []
+        for tf, length in zip(self.tf, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_len) if self.avg_len else self.k1
+            for term in set(query_terms):
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            result.append(score)
+        return result